@@ -0,0 +1,230 @@
+﻿# Adf Cache
+# ---------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script with shared functions to cache adf files extracted once into local directories
+# with protection bits and comments preserved in UAE fsdb files and to stage files from cached adf
+# directories in local directories.
+
+"""Adf Cache"""
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import shared
+
+# uae fsdb filename and size of version 1 nodes used by hst imager to store amiga names, protection bits
+# and comments of files in local directories
+uae_fsdb_filename = '_UAEFSDB.___'
+uae_fsdb_node_size = 600
+
+# adf cache version, cached adf directories of other versions are ignored
+adf_cache_version = 1
+
+# get adf cache path, shared by all example scripts on host
+def get_adf_cache_path():
+    """Get Adf Cache Path"""
+    if os.environ.get('HST_IMAGER_ADF_CACHE'):
+        return os.environ['HST_IMAGER_ADF_CACHE']
+    return os.path.join(os.path.dirname(shared.get_download_cache_path()), 'adfs')
+
+# is adf cache enabled, cache is disabled, if adf cache is set to off
+def is_adf_cache_enabled():
+    """Is Adf Cache Enabled"""
+    return os.environ.get('HST_IMAGER_ADF_CACHE', '').lower() != 'off'
+
+# get cached adf path, adf file is extracted with hst imager to cache directory named by hash of adf file,
+# if not cached. returns none, if adf file can't be extracted
+def get_cached_adf_path(hst_imager_path, adf_path):
+    """Get Cached Adf Path"""
+    cache_path = get_adf_cache_path()
+    cached_adf_path = os.path.join(cache_path, '{0}-v{1}'.format(shared.get_file_hash(adf_path), adf_cache_version))
+    if os.path.isdir(cached_adf_path):
+        return cached_adf_path
+
+    # extract adf file to temp directory in cache and rename it, so partial extracts are never used
+    print('Caching adf file \'{0}\''.format(adf_path))
+    os.makedirs(cache_path, exist_ok=True)
+    temp_path = tempfile.mkdtemp(prefix='.adf-', dir=cache_path)
+    (return_code, stdout, stderr) = shared.run_process(
+        [hst_imager_path, 'fs', 'extract', adf_path, temp_path, '--recursive', '--makedir', '--force'],
+        subprocess.PIPE, subprocess.STDOUT)
+    if return_code != 0:
+        print('Warning: Failed to cache adf file \'{0}\', adf file is used directly'.format(adf_path))
+        shutil.rmtree(temp_path)
+        return None
+    try:
+        os.rename(temp_path, cached_adf_path)
+    except OSError:
+        # adf file cached by other script running in parallel
+        shutil.rmtree(temp_path)
+    return cached_adf_path
+
+# read uae fsdb nodes in directory, nodes are indexed by lower case amiga name
+def read_uae_fsdb(dir_path):
+    """Read Uae Fsdb"""
+    nodes = {}
+    uae_fsdb_path = os.path.join(dir_path, uae_fsdb_filename)
+    if not os.path.isfile(uae_fsdb_path):
+        return nodes
+    with open(uae_fsdb_path, 'rb') as file:
+        data = file.read()
+    for offset in range(0, len(data) - uae_fsdb_node_size + 1, uae_fsdb_node_size):
+        node = data[offset:offset + uae_fsdb_node_size]
+        if node[0] == 0:
+            continue
+        amiga_name = node[5:262].split(b'\x00')[0].decode('latin-1')
+        normal_name = node[262:519].split(b'\x00')[0].decode('latin-1')
+        nodes[amiga_name.lower()] = { 'AmigaName': amiga_name, 'NormalName': normal_name, 'Node': node }
+    return nodes
+
+# write uae fsdb nodes in directory, if changed. uae fsdb file is removed, if directory has no nodes
+def write_uae_fsdb(dir_path, nodes):
+    """Write Uae Fsdb"""
+    if read_uae_fsdb(dir_path) == nodes:
+        return
+    uae_fsdb_path = os.path.join(dir_path, uae_fsdb_filename)
+    if os.path.isfile(uae_fsdb_path):
+        os.remove(uae_fsdb_path)
+    if len(nodes) == 0:
+        return
+    with open(uae_fsdb_path, 'wb') as file:
+        file.write(b''.join([x['Node'] for x in nodes.values()]))
+
+# get uae fsdb nodes in directory, nodes are read once and written when staging is done
+def get_uae_fsdb(uae_fsdbs, dir_path):
+    """Get Uae Fsdb"""
+    if not dir_path in uae_fsdbs:
+        uae_fsdbs[dir_path] = read_uae_fsdb(dir_path)
+    return uae_fsdbs[dir_path]
+
+# get local entries in directory with amiga names from uae fsdb nodes
+def get_local_entries(uae_fsdbs, dir_path):
+    """Get Local Entries"""
+    nodes = get_uae_fsdb(uae_fsdbs, dir_path)
+    normal_names = dict([(x['NormalName'], x) for x in nodes.values()])
+    entries = []
+    for name in sorted(os.listdir(dir_path)):
+        if name == uae_fsdb_filename:
+            continue
+        node = normal_names.get(name)
+        entries.append({
+            'AmigaName': node['AmigaName'] if node else name,
+            'NormalName': name,
+            'Path': os.path.join(dir_path, name),
+            'IsDir': os.path.isdir(os.path.join(dir_path, name)),
+            'Node': node
+        })
+    return entries
+
+# find local entry in directory by amiga name ignoring case like amiga file systems
+def find_local_entry(uae_fsdbs, dir_path, amiga_name):
+    """Find Local Entry"""
+    if not os.path.isdir(dir_path):
+        return None
+    for entry in get_local_entries(uae_fsdbs, dir_path):
+        if entry['AmigaName'].lower() == amiga_name.lower():
+            return entry
+    return None
+
+# resolve local path from amiga path components, returns none, if path doesn't exist
+def resolve_local_path(uae_fsdbs, path, parts):
+    """Resolve Local Path"""
+    for part in parts:
+        entry = find_local_entry(uae_fsdbs, path, part)
+        if entry is None:
+            return None
+        path = entry['Path']
+    return path
+
+# remove local entry and its uae fsdb node
+def remove_local_entry(uae_fsdbs, dir_path, entry):
+    """Remove Local Entry"""
+    if entry['IsDir']:
+        shutil.rmtree(entry['Path'])
+        for path in [x for x in uae_fsdbs if x == entry['Path'] or x.startswith(entry['Path'] + os.sep)]:
+            del uae_fsdbs[path]
+    else:
+        os.remove(entry['Path'])
+    get_uae_fsdb(uae_fsdbs, dir_path).pop(entry['AmigaName'].lower(), None)
+
+# stage local entry to directory, files are hard linked if link and possible as staging files are never
+# changed. otherwise files are copied. directories are merged and sub-directories are staged, if recursive
+def stage_local_entry(uae_fsdbs, entry, dest_dir_path, recursive, link):
+    """Stage Local Entry"""
+    dest_entry = find_local_entry(uae_fsdbs, dest_dir_path, entry['AmigaName'])
+    if dest_entry is not None and (not entry['IsDir'] or not dest_entry['IsDir']):
+        remove_local_entry(uae_fsdbs, dest_dir_path, dest_entry)
+        dest_entry = None
+
+    dest_path = dest_entry['Path'] if dest_entry else os.path.join(dest_dir_path, entry['NormalName'])
+    if entry['IsDir']:
+        os.makedirs(dest_path, exist_ok=True)
+    elif link:
+        try:
+            os.link(entry['Path'], dest_path)
+        except OSError:
+            shutil.copy2(entry['Path'], dest_path)
+    else:
+        shutil.copy2(entry['Path'], dest_path)
+
+    # copy uae fsdb node with amiga name, protection bits and comment
+    nodes = get_uae_fsdb(uae_fsdbs, dest_dir_path)
+    if entry['Node'] is not None and os.path.basename(dest_path) == entry['Node']['NormalName']:
+        nodes[entry['AmigaName'].lower()] = entry['Node']
+
+    if entry['IsDir'] and recursive:
+        for child_entry in get_local_entries(uae_fsdbs, entry['Path']):
+            stage_local_entry(uae_fsdbs, child_entry, dest_path, True, link)
+
+# make local directory from amiga path components, existing directories are matched ignoring case
+def make_local_dir(uae_fsdbs, path, parts):
+    """Make Local Dir"""
+    for part in parts:
+        entry = find_local_entry(uae_fsdbs, path, part)
+        if entry is not None and not entry['IsDir']:
+            return None
+        path = entry['Path'] if entry else os.path.join(path, part)
+        os.makedirs(path, exist_ok=True)
+    return path
+
+# stage step to local target directory, returns false, if step can't be staged.
+# files and directories are staged like hst imager extract and copy commands write them:
+# directory source writes entries in directory, file source writes file in target directory
+# and wildcard pattern writes matching entries in target directory
+def stage_step(uae_fsdbs, source, target_path, target_parts, options, target_exists, link):
+    """Stage Step"""
+    (source_path, source_parts) = source
+    pattern = source_parts[-1] if len(source_parts) > 0 and '*' in source_parts[-1] else None
+    source_dir_path = resolve_local_path(uae_fsdbs, source_path, source_parts[:-1] if pattern else source_parts)
+    if source_dir_path is None:
+        return False
+
+    if pattern is not None:
+        regex = re.compile('^{0}$'.format(re.escape(pattern.lower()).replace('\\*', '.*')))
+        entries = [x for x in get_local_entries(uae_fsdbs, source_dir_path) if regex.match(x['AmigaName'].lower())]
+        if len(entries) == 0 or (options['Recursive'] and any([x['IsDir'] for x in entries])):
+            return False
+    elif os.path.isdir(source_dir_path):
+        entries = get_local_entries(uae_fsdbs, source_dir_path)
+    else:
+        entry = find_local_entry(uae_fsdbs, os.path.dirname(source_dir_path), source_parts[-1]) \
+            if len(source_parts) > 0 else None
+        if entry is None:
+            return False
+        entries = [entry]
+
+        # file source is renamed to target, if target doesn't exist. not staged as target may exist in image file
+        if not target_exists and not options['MakeDir']:
+            return False
+
+    dest_dir_path = make_local_dir(uae_fsdbs, target_path, target_parts)
+    if dest_dir_path is None:
+        return False
+    for entry in entries:
+        stage_local_entry(uae_fsdbs, entry, dest_dir_path, options['Recursive'], link)
+    return True
@@ -0,0 +1,307 @@
+﻿# Artifacts
+# ---------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script with shared functions to optimize image files built by example scripts and create
+# .zip, .gz and .xz distribution artifacts with sha256 sums and a json artifact manifest.
+#
+# Image files are read once in chunks and each chunk is compressed in parallel for all formats, so
+# image files are never held in memory. Deflate chunks are primed with the last 32kb of previous chunk
+# and joined to one deflate stream like pigz and xz chunks are written as concatenated xz streams
+# like xz multi-threaded compression, which are decompressed by gzip, unzip and xz as usual.
+
+"""Artifacts"""
+
+import datetime
+import hashlib
+import json
+import lzma
+import os
+import struct
+import time
+import zlib
+import concurrent.futures
+import shared
+
+# artifact formats and file extensions
+artifact_formats = ['zip', 'gz', 'xz']
+
+# artifact manifest version, artifacts are created again, if manifest is created by other version
+artifact_manifest_version = 1
+
+# deflate window size used to prime deflate chunks with end of previous chunk
+deflate_window_size = 32 * 1024
+
+# zip signatures and size, which requires zip64 extensions
+zip_local_file_header_signature = 0x04034b50
+zip_data_descriptor_signature = 0x08074b50
+zip_central_directory_signature = 0x02014b50
+zip64_end_of_central_directory_signature = 0x06064b50
+zip64_end_of_central_directory_locator_signature = 0x07064b50
+zip_end_of_central_directory_signature = 0x06054b50
+zip64_limit = (1 << 31) - 1
+
+# add artifact arguments to argument parser of example script
+def add_artifact_arguments(parser):
+    """Add Artifact Arguments"""
+    parser.add_argument('--optimize', action='store_true',
+                        help='Optimize image file to size of rigid disk block when image file is built.')
+    parser.add_argument('--compress', nargs='+', choices=artifact_formats, default=[],
+                        help='Create compressed artifacts of image file with sha256 sums and json artifact manifest.')
+    parser.add_argument('--artifacts-dir',
+                        help='Directory artifacts are created in (default = directory of image file).')
+    parser.add_argument('--compress-jobs', type=int, default=os.cpu_count() or 1,
+                        help='Number of chunks compressed in parallel (default = number of cpus).')
+
+# get artifacts path for image file
+def get_artifacts_path(image_path, artifacts_dir):
+    """Get Artifacts Path"""
+    return os.path.abspath(artifacts_dir) if artifacts_dir else os.path.dirname(os.path.abspath(image_path))
+
+# get artifact manifest path of image file
+def get_artifact_manifest_path(image_path, artifacts_path):
+    """Get Artifact Manifest Path"""
+    return os.path.join(artifacts_path, '{0}.artifacts.json'.format(os.path.basename(image_path)))
+
+# get artifact sums path of image file
+def get_artifact_sums_path(image_path, artifacts_path):
+    """Get Artifact Sums Path"""
+    return os.path.join(artifacts_path, '{0}.sha256'.format(os.path.basename(image_path)))
+
+# read artifact manifest, returns none, if manifest doesn't exist or is created by other version
+def read_artifact_manifest(manifest_path):
+    """Read Artifact Manifest"""
+    if not os.path.isfile(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+    except ValueError:
+        return None
+    return manifest if manifest.get('Version') == artifact_manifest_version else None
+
+# is image published, artifacts of all formats exist for image file with same size and modified time as in manifest
+def is_image_published(image_path, artifacts_path, formats, optimize):
+    """Is Image Published"""
+    manifest = read_artifact_manifest(get_artifact_manifest_path(image_path, artifacts_path))
+    if manifest is None or (optimize and not manifest['Image']['Optimized']) or \
+            manifest['Image']['Size'] != os.path.getsize(image_path) or \
+            manifest['Image']['Mtime'] != os.path.getmtime(image_path):
+        return False
+    published_formats = dict([(x['Format'], x) for x in manifest['Artifacts']])
+    return all([x in published_formats and os.path.isfile(os.path.join(artifacts_path, published_formats[x]['Filename']))
+                for x in formats])
+
+# optimize image file to size of rigid disk block with hst imager
+def optimize_image(hst_imager_path, image_path):
+    """Optimize Image"""
+    print('Optimizing image file \'{0}\''.format(image_path))
+    shared.run_command([hst_imager_path, 'optimize', image_path, '--partition-table', 'Rdb'])
+
+# compress deflate chunk to raw deflate data primed with dictionary. chunks are flushed to byte boundary,
+# so compressed chunks can be joined and last chunk ends deflate stream
+def compress_deflate_chunk(chunk, dictionary, last, level):
+    """Compress Deflate Chunk"""
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(chunk) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+# compress xz chunk to xz stream
+def compress_xz_chunk(chunk, dictionary, last, level):
+    """Compress Xz Chunk"""
+    return lzma.compress(chunk, format=lzma.FORMAT_XZ, check=lzma.CHECK_CRC64, preset=level)
+
+# get dos date and time of timestamp used in zip headers
+def get_dos_date_time(timestamp):
+    """Get Dos Date Time"""
+    date_time = datetime.datetime.fromtimestamp(max(timestamp, 315532800))
+    return ((date_time.year - 1980) << 9 | date_time.month << 5 | date_time.day,
+            date_time.hour << 11 | date_time.minute << 5 | date_time.second // 2)
+
+# write artifact data and update sha256 of artifact
+def write_artifact_data(artifact, data):
+    """Write Artifact Data"""
+    artifact['File'].write(data)
+    artifact['Hash'].update(data)
+    artifact['CompressedSize'] = artifact['CompressedSize'] + len(data)
+
+# open artifact, artifact is written to temp file and header is written
+def open_artifact(artifact_format, image_path, artifacts_path, level):
+    """Open Artifact"""
+    filename = '{0}.{1}'.format(os.path.basename(image_path), artifact_format)
+    artifact = {
+        'Format': artifact_format,
+        'Filename': filename,
+        'Path': os.path.join(artifacts_path, filename),
+        'TempPath': os.path.join(artifacts_path, '.{0}.tmp'.format(filename)),
+        'Compress': compress_xz_chunk if artifact_format == 'xz' else compress_deflate_chunk,
+        'Level': level,
+        'Hash': hashlib.sha256(),
+        'Crc32': 0,
+        'Size': os.path.getsize(image_path),
+        'CompressedSize': 0,
+        'Mtime': os.path.getmtime(image_path)
+    }
+    artifact['File'] = open(artifact['TempPath'], 'wb')
+
+    if artifact_format == 'gz':
+        # gzip header with image filename
+        write_artifact_data(artifact, struct.pack('<BBBBIBB', 0x1f, 0x8b, 8, 8, int(artifact['Mtime']) & 0xffffffff,
+                                                  0, 255) + os.path.basename(image_path).encode('latin-1', 'replace') + b'\x00')
+    elif artifact_format == 'zip':
+        # zip local file header with crc32 and sizes written in data descriptor, zip64 extra field
+        # is added, if image file may exceed zip limits
+        name = os.path.basename(image_path).encode('utf-8')
+        artifact['ZipName'] = name
+        artifact['Zip64'] = artifact['Size'] * 1.05 > zip64_limit
+        (artifact['DosDate'], artifact['DosTime']) = get_dos_date_time(artifact['Mtime'])
+        extra = struct.pack('<HHQQ', 1, 16, 0, 0) if artifact['Zip64'] else b''
+        artifact['ZipHeaderSize'] = 30 + len(name) + len(extra)
+        write_artifact_data(artifact, struct.pack(
+            '<IHHHHHIIIHH', zip_local_file_header_signature, 45 if artifact['Zip64'] else 20, 0x0808, 8,
+            artifact['DosTime'], artifact['DosDate'], 0, 0xffffffff if artifact['Zip64'] else 0,
+            0xffffffff if artifact['Zip64'] else 0, len(name), len(extra)) + name + extra)
+    return artifact
+
+# write compressed chunk of image file to artifact
+def write_artifact_chunk(artifact, chunk, compressed_chunk):
+    """Write Artifact Chunk"""
+    if artifact['Format'] != 'xz':
+        artifact['Crc32'] = zlib.crc32(chunk, artifact['Crc32'])
+    write_artifact_data(artifact, compressed_chunk)
+
+# close artifact, trailer is written and temp file is renamed to artifact path
+def close_artifact(artifact):
+    """Close Artifact"""
+    if artifact['Format'] == 'gz':
+        write_artifact_data(artifact, struct.pack('<II', artifact['Crc32'], artifact['Size'] & 0xffffffff))
+    elif artifact['Format'] == 'zip':
+        name = artifact['ZipName']
+        compressed_size = artifact['CompressedSize'] - artifact['ZipHeaderSize']
+        zip64 = artifact['Zip64']
+
+        # data descriptor with crc32 and sizes
+        write_artifact_data(artifact, struct.pack('<IIQQ' if zip64 else '<IIII', zip_data_descriptor_signature,
+                                                  artifact['Crc32'], compressed_size, artifact['Size']))
+
+        # central directory with zip64 extra field, if zip64
+        central_directory_offset = artifact['CompressedSize']
+        extra = struct.pack('<HHQQ', 1, 16, artifact['Size'], compressed_size) if zip64 else b''
+        write_artifact_data(artifact, struct.pack(
+            '<IHHHHHHIIIHHHHHII', zip_central_directory_signature, 45 if zip64 else 20, 45 if zip64 else 20,
+            0x0808, 8, artifact['DosTime'], artifact['DosDate'], artifact['Crc32'],
+            0xffffffff if zip64 else compressed_size, 0xffffffff if zip64 else artifact['Size'], len(name),
+            len(extra), 0, 0, 0, 0, 0) + name + extra)
+        central_directory_size = artifact['CompressedSize'] - central_directory_offset
+
+        # zip64 end of central directory record and locator, if zip64
+        if zip64:
+            zip64_end_offset = artifact['CompressedSize']
+            write_artifact_data(artifact, struct.pack(
+                '<IQHHIIQQQQ', zip64_end_of_central_directory_signature, 44, 45, 45, 0, 0, 1, 1,
+                central_directory_size, central_directory_offset))
+            write_artifact_data(artifact, struct.pack(
+                '<IIQI', zip64_end_of_central_directory_locator_signature, 0, zip64_end_offset, 1))
+        write_artifact_data(artifact, struct.pack(
+            '<IHHHHIIH', zip_end_of_central_directory_signature, 0, 0, 1, 1, central_directory_size,
+            min(central_directory_offset, 0xffffffff), 0))
+
+    artifact['File'].close()
+    os.replace(artifact['TempPath'], artifact['Path'])
+
+# create artifacts of image file in formats. image file is read once in chunks, which are compressed in parallel
+# for all formats and written in order. number of chunks in memory is limited to twice the number of jobs.
+# returns sha256 of image file and artifacts
+def create_artifacts(image_path, artifacts_path, formats, jobs, chunk_size = 4 * 1024 * 1024, level = 6):
+    """Create Artifacts"""
+    os.makedirs(artifacts_path, exist_ok=True)
+    artifacts = [open_artifact(x, image_path, artifacts_path, level) for x in formats]
+    image_hash = hashlib.sha256()
+    try:
+        with open(image_path, 'rb') as image_file, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            pending = []
+            dictionary = b''
+            chunk = image_file.read(chunk_size)
+            while True:
+                # read next chunk ahead, so last chunk is known and ends compressed streams
+                next_chunk = image_file.read(chunk_size) if chunk else b''
+                last = len(next_chunk) == 0
+                image_hash.update(chunk)
+                pending.append((chunk, [executor.submit(x['Compress'], chunk, dictionary, last, x['Level'])
+                                        for x in artifacts]))
+                dictionary = (dictionary + chunk)[-deflate_window_size:]
+
+                # write compressed chunks in order, when enough chunks are compressing or last chunk is read
+                while len(pending) > jobs * 2 or (last and pending):
+                    (written_chunk, futures) = pending.pop(0)
+                    for artifact, future in zip(artifacts, futures):
+                        write_artifact_chunk(artifact, written_chunk, future.result())
+                if last:
+                    break
+                chunk = next_chunk
+        for artifact in artifacts:
+            close_artifact(artifact)
+    finally:
+        for artifact in artifacts:
+            if not artifact['File'].closed:
+                artifact['File'].close()
+            if os.path.isfile(artifact['TempPath']):
+                os.remove(artifact['TempPath'])
+    return (image_hash.hexdigest(), artifacts)
+
+# publish image file, image file is optimized, if optimize and artifacts are created with sha256 sums file
+# and json artifact manifest. image files already published with same formats are skipped
+def publish_image(hst_imager_path, image_path, artifacts_dir, formats, optimize, jobs):
+    """Publish Image"""
+    if len(formats) == 0 and not optimize:
+        return
+    artifacts_path = get_artifacts_path(image_path, artifacts_dir)
+    if is_image_published(image_path, artifacts_path, formats, optimize):
+        print('Artifacts of image file \'{0}\' are up to date'.format(image_path))
+        return
+
+    if optimize:
+        optimize_image(hst_imager_path, image_path)
+
+    print('Creating {0} artifacts of image file \'{1}\' using {2} jobs'.format(', '.join(formats), image_path, jobs))
+    start_time = time.monotonic()
+    (image_sha256, artifacts) = create_artifacts(image_path, artifacts_path, formats, jobs)
+
+    # write sha256 sums of image file and artifacts in sha256sum format
+    sums = [(image_sha256, os.path.relpath(image_path, artifacts_path).replace('\\', '/'))] + \
+        [(x['Hash'].hexdigest(), x['Filename']) for x in artifacts]
+    with open(get_artifact_sums_path(image_path, artifacts_path), 'w', encoding='utf-8', newline='\n') as file:
+        file.write(''.join(['{0}  {1}\n'.format(x[0], x[1]) for x in sums]))
+
+    # write artifact manifest
+    manifest = {
+        'Version': artifact_manifest_version,
+        'Created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'Image': {
+            'Filename': os.path.basename(image_path),
+            'Size': os.path.getsize(image_path),
+            'Mtime': os.path.getmtime(image_path),
+            'Sha256': image_sha256,
+            'Optimized': optimize
+        },
+        'Artifacts': [{
+            'Format': x['Format'],
+            'Filename': x['Filename'],
+            'Size': x['CompressedSize'],
+            'Sha256': x['Hash'].hexdigest()
+        } for x in artifacts]
+    }
+    manifest_path = get_artifact_manifest_path(image_path, artifacts_path)
+    with open('{0}.tmp'.format(manifest_path), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace('{0}.tmp'.format(manifest_path), manifest_path)
+
+    for artifact in artifacts:
+        print('- {0}: {1} bytes, {2:.1f}%'.format(artifact['Filename'], artifact['CompressedSize'],
+                                                  100.0 * artifact['CompressedSize'] / max(artifact['Size'], 1)))
+    print('Created artifacts in {0:.1f} seconds'.format(time.monotonic() - start_time))
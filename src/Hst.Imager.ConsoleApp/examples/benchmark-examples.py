@@ -0,0 +1,605 @@
+﻿#!/usr/bin/env python3
+# Benchmark Examples
+# ------------------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script to benchmark orchestration of example scripts using stub Hst Imager and Hst Amiga
+# console executables, which record commands and simulate latency, and a synthetic corpus of WHDLoad
+# .lha and .zip files and fake adf files. Benchmark runs on Linux without Hst Imager .NET binaries.
+#
+# Usage:
+# - benchmark-examples.py: Run all scenarios and write report to benchmark.json.
+# - benchmark-examples.py --count 500 --size 1mb --latency 0.02: Run scenarios with 500 WHDLoads of 1mb
+#   and 20ms latency per command.
+# - benchmark-examples.py --scenarios install-amigaos-3.2 --compare baseline.json: Run scenario and
+#   compare with report from previous benchmark.
+
+"""Benchmark Examples"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+import shared
+
+# stub hst imager and hst amiga executable. each operation is logged with time, duration and latency
+# simulated by sleeping. process startup latency is simulated once per process. archives are read
+# from .lha and .zip files in corpus and fake adf files, which are zip files with adf extension.
+# image files are not written, except empty files created by blank and files copied from image files
+stub_source = r'''#!/usr/bin/env python3
+import json, os, resource, shlex, struct, sys, time, zipfile
+
+log_path = os.environ['BENCHMARK_STUB_LOG']
+startup_latency = float(os.environ.get('BENCHMARK_STARTUP_LATENCY', '0'))
+latency = float(os.environ.get('BENCHMARK_LATENCY', '0'))
+icon_files = ['Devs.info', 'Prefs.info', 'Storage.info', 'Storage/Printers.info', 'Storage/Monitors.info']
+records = []
+
+# drawer disk object with drawer data, which has new window and current x and y of drawer
+disk_object = struct.pack('>HH44sBxIIiiIII', 0xe310, 1, bytes(44), 2, 0, 0, 0, 0, 1, 0, 0) + bytes(56)
+
+def split_container(path):
+    parts = path.replace('\\', '/').split('/')
+    for i in range(1, len(parts)):
+        prefix = '/'.join(parts[:i])
+        if prefix and os.path.isfile(prefix):
+            return (prefix, '/'.join(parts[i:]))
+    return (path, '') if os.path.isfile(path) else (None, None)
+
+def read_lha(path):
+    entries = []
+    with open(path, 'rb') as f:
+        data = f.read()
+    position = 0
+    while position + 26 <= len(data) and data[position:position + 2] != b'\x00\x00' and data[position] != 0:
+        header_size = struct.unpack_from('<H', data, position)[0]
+        method = data[position + 2:position + 7]
+        (packed_size, size) = struct.unpack_from('<II', data, position + 7)
+        (name, directory) = ('', '')
+        ext = position + 24
+        ext_size = struct.unpack_from('<H', data, ext)[0]
+        ext = ext + 2
+        while ext_size > 0:
+            ext_type = data[ext]
+            ext_data = data[ext + 1:ext + ext_size - 2]
+            if ext_type == 1:
+                name = ext_data.decode('latin-1')
+            elif ext_type == 2:
+                directory = ext_data.replace(b'\xff', b'/').decode('latin-1').strip('/')
+            ext = ext + ext_size
+            ext_size = struct.unpack_from('<H', data, ext - 2)[0]
+        full_name = '/'.join([x for x in [directory, name] if x])
+        offset = position + header_size
+        entries.append((full_name, size, method == b'-lhd-', data[offset:offset + packed_size]))
+        position = offset + packed_size
+    return entries
+
+def read_archive(path):
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as z:
+            return [(x.filename.rstrip('/'), x.file_size, x.is_dir(), z.read(x)) for x in z.infolist()]
+    return read_lha(path)
+
+def list_entries(path, recursive):
+    (container, sub_path) = split_container(path)
+    entries = []
+    if container is None:
+        return entries
+    names = set()
+    for (name, size, is_dir, content) in read_archive(container):
+        if sub_path and not name.lower().startswith(sub_path.lower() + '/'):
+            continue
+        name = name[len(sub_path) + 1:] if sub_path else name
+        parts = name.split('/')
+        for i in range(1, len(parts)):
+            names.add(('/'.join(parts[:i]), 0, True))
+        names.add((name, size, is_dir))
+    for (name, size, is_dir) in sorted(names):
+        if recursive or '/' not in name:
+            entries.append({ 'name': name, 'size': size, 'type': 0 if is_dir else 1,
+                             'relativePathComponents': name.split('/') })
+    return entries
+
+def extract_entries(path, dest_path):
+    (container, sub_path) = split_container(path)
+    for (name, size, is_dir, content) in read_archive(container):
+        if sub_path and not (name.lower() + '/').startswith(sub_path.lower().rstrip('*').rstrip('/') + '/') and \
+                not (sub_path.endswith('*') and name.lower().startswith(sub_path.lower()[:-1])):
+            continue
+        relative_name = name[len(sub_path.rstrip('*').rstrip('/')):].lstrip('/') if sub_path else name
+        target = os.path.join(dest_path, relative_name or os.path.basename(name))
+        if is_dir:
+            os.makedirs(target, exist_ok=True)
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+
+def is_image_path(path):
+    (container, sub_path) = split_container(path)
+    return container is not None and sub_path != '' and \
+        os.path.splitext(container)[1].lower() in ['.vhd', '.hdf', '.img']
+
+def handle(args):
+    start_time = time.time()
+    time.sleep(latency)
+    if args[:2] == ['fs', 'dir'] and '--format' in args:
+        print(json.dumps({ 'path': args[2], 'entries': list_entries(args[2], '--recursive' in args) }))
+    elif args[:2] == ['fs', 'extract'] and not is_image_path(args[3]):
+        extract_entries(args[2], args[3])
+    elif args[:2] == ['fs', 'copy'] and is_image_path(args[2]) and not is_image_path(args[3]):
+        names = icon_files if '*' in args[2] else [os.path.basename(args[2].replace('\\', '/'))]
+        for name in names:
+            target = os.path.join(args[3], name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(disk_object if name.endswith('.info') else b'Echo stub\n')
+    elif args and args[0] == 'blank':
+        open(args[1], 'wb').close()
+    records.append({ 'Type': 'Operation', 'Executable': os.path.basename(sys.argv[0]), 'Commands': args,
+                     'Time': start_time, 'Duration': time.time() - start_time, 'Latency': latency })
+    return 0
+
+start_time = time.time()
+time.sleep(startup_latency)
+args = sys.argv[1:]
+return_code = 0
+if 'json' not in args:
+    print('[00:00:00 INF] Hst stub')
+if args and args[0] == 'script':
+    with open(args[1], encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.strip().startswith('#'):
+                continue
+            script_args = shlex.split(line)
+            print('[00:00:00 INF] [CMD] ' + ' '.join(script_args), flush=True)
+            return_code = handle(script_args)
+            if return_code:
+                break
+else:
+    if 'json' not in args:
+        print('[00:00:00 INF] [CMD] ' + ' '.join(args))
+    return_code = handle(args)
+usage = resource.getrusage(resource.RUSAGE_SELF)
+records.append({ 'Type': 'Process', 'Executable': os.path.basename(sys.argv[0]), 'Commands': args,
+                 'Time': start_time, 'Duration': time.time() - start_time, 'Latency': startup_latency,
+                 'CpuTime': usage.ru_utime + usage.ru_stime })
+with open(log_path, 'a', encoding='utf-8') as f:
+    f.write(''.join([json.dumps(x) + '\n' for x in records]))
+sys.exit(return_code)
+'''
+
+# fake adf files used by install scripts with paths of files in adf
+fake_adf_files = {
+    'amiga-os-310-workbench.adf': ['C/Dir', 'Devs/system-configuration', 'Prefs/Printer', 'S/Startup-Sequence',
+                                   'Utilities/Clock', 'Disk.info', 'Prefs.info', 'Utilities.info'],
+    'amiga-os-310-install.adf': ['HDTools/BRU', 'HDTools/HDBackup', 'HDTools/HDBackup.help', 'HDTools/HDToolBox',
+                                 'HDTools/HDBackup.info', 'HDTools/HDToolBox.info', 'HDTools/S/BRUtab',
+                                 'HDTools/S/HDBackup.config', 'L/FastFileSystem', 'Libs/workbench.library',
+                                 'Libs/icon.library', 'Update/Disk.info'],
+    'amiga-os-310-extras.adf': ['Tools/IconEdit', 'Tools.info', 'System/Intellifont'],
+    'amiga-os-310-locale.adf': ['Catalogs/deutsch/sys/workbench.catalog', 'Countries/danmark.country'],
+    'amiga-os-310-fonts.adf': ['topaz/11', 'topaz.font'],
+    'amiga-os-310-storage.adf': ['Monitors/PAL', 'Printers/Generic', 'Monitors.info', 'Printers.info'],
+    'Install3.2.adf': ['C/Version', 'HDTools/hdtoolbox', 'HDTools/hdtoolbox.info', 'Installer',
+                       'Libs/workbench.library', 'Libs/icon.library', 'L/FastFileSystem', 'Update/disk.info',
+                       'Update/Startup-HardDrive', 'Update/Release/3.2'],
+    'Workbench3.2.adf': ['C/Dir', 'Devs/system-configuration', 'Prefs/Printer', 'Utilities/Clock', 'Disk.info'],
+    'Extras3.2.adf': ['L/Port-Handler', 'Prefs/Font', 'System/Format', 'Tools/IconEdit', 'S/User-startup',
+                      'S/Startup-Sequence', 'Prefs.info', 'Tools.info'],
+    'Classes3.2.adf': ['Classes/Gadgets/button.gadget', 'Classes/Images/bevel.image'],
+    'Fonts.adf': ['topaz/11', 'topaz.font'],
+    'Storage3.2.adf': ['DataTypes.info', 'DOSDrivers.info', 'Keymaps.info', 'Monitors.info', 'Printers.info',
+                       'Classes/DataTypes/png.datatype', 'C/AddDataTypes', 'DefIcons/def_ilbm.info',
+                       'Presets/Pointers/Busy', 'Monitors/PAL', 'DOSDrivers/PIPE', 'WBStartup/MenuTools',
+                       'Env-Archive/deficons.prefs', 'Env-Archive/Pointer.prefs', 'Printers/Generic',
+                       'Keymaps/dk', 'LIBS/datatypes.library'],
+    'DiskDoctor.adf': ['C/DAControl', 'Devs/trackfile.device'],
+    'MMULibs.adf': ['C/MuForce', 'Libs/mmu.library', 'Locale/Catalogs/deutsch/mmu.catalog']
+}
+
+# fake files in downloads used by minimal whdload install
+fake_download_files = {
+    'skick': ['Kickstarts/kick34005.A500.RTB', 'Kickstarts/kick40068.A1200.RTB'],
+    'whdload': ['WHDLoad/C/WHDLoad', 'WHDLoad/S/WHDLoad.prefs'],
+    'iconlib': ['IconLib_46.4/Libs/68000/icon.library', 'IconLib_46.4/ThirdParty/RemLib/RemLib',
+                'IconLib_46.4/ThirdParty/LoadResident/LoadResident']
+}
+
+# get crc16 used by lha
+def get_lha_crc16(data):
+    """Get Lha Crc16"""
+    crc = 0
+    for byte in data:
+        crc = crc ^ byte
+        for i in range(8):
+            crc = (crc >> 1) ^ 0xa001 if crc & 1 else crc >> 1
+    return crc
+
+# create lha header level 2 with filename and directory extended headers
+def create_lha_header(name, size, is_dir, crc, timestamp):
+    """Create Lha Header"""
+    parts = name.split('/')
+    (directory, filename) = ('/'.join(parts), '') if is_dir else ('/'.join(parts[:-1]), parts[-1])
+
+    # extended headers are linked by size of next extended header including type and next size
+    headers = []
+    if filename:
+        headers.append(b'\x01' + filename.encode('latin-1'))
+    if directory:
+        headers.append(b'\x02' + directory.encode('latin-1').replace(b'/', b'\xff') + b'\xff')
+    extended_headers = b''.join([header + struct.pack('<H', len(headers[i + 1]) + 2 if i + 1 < len(headers) else 0)
+                                 for i, header in enumerate(headers)])
+    first_size = len(headers[0]) + 2 if headers else 0
+
+    header_size = 26 + len(extended_headers)
+    padding = b'\x00' if header_size % 256 == 0 else b''
+    header = struct.pack('<H5sIIIBBHBH', header_size + len(padding), b'-lhd-' if is_dir else b'-lh0-', size, size,
+                         timestamp, 0x20, 2, crc, ord('A'), first_size)
+    return header + extended_headers + padding
+
+# write lha file with stored files, directories are added before their files
+def write_lha_file(path, files):
+    """Write Lha File"""
+    timestamp = int(time.time())
+    with open(path, 'wb') as file:
+        directories = set()
+        for (name, data) in files:
+            parts = name.split('/')
+            for i in range(1, len(parts)):
+                directory = '/'.join(parts[:i])
+                if directory in directories:
+                    continue
+                directories.add(directory)
+                file.write(create_lha_header(directory, 0, True, 0, timestamp))
+            file.write(create_lha_header(name, len(data), False, get_lha_crc16(data), timestamp))
+            file.write(data)
+        file.write(b'\x00')
+
+# write zip file with stored files
+def write_zip_file(path, files):
+    """Write Zip File"""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as file:
+        for (name, data) in files:
+            file.writestr(name, data)
+
+# create whdload corpus with whdload shaped .lha and .zip files of size with slave, icons and data files.
+# every tenth title has an older version and every other file is a .zip file
+def create_whdload_corpus(corpus_path, count, size, files):
+    """Create WHDLoad Corpus"""
+    os.makedirs(corpus_path, exist_ok=True)
+    generator = random.Random(count)
+    chipsets = ['', '_AGA', '_CD32', '']
+    archives = []
+    for index in range(count):
+        title = '{0}Game{1:04d}'.format(chr(ord('A') + index % 26), index)
+        version = 2 if index % 10 == 0 else 1
+        for version_index in range(version):
+            filename = '{0}_v1.{1}{2}{3}'.format(title, version_index, chipsets[index % len(chipsets)],
+                                                 '.zip' if len(archives) % 2 else '.lha')
+            data_size = max(0, size // max(1, files))
+            archive_files = [
+                ('{0}.info'.format(title), generator.randbytes(512)),
+                ('{0}/{0}.slave'.format(title), generator.randbytes(2048)),
+                ('{0}/{0}.info'.format(title), generator.randbytes(512)),
+                ('{0}/ReadMe'.format(title), 'WHDLoad install of {0}\n'.format(title).encode('ascii'))
+            ] + [('{0}/data/file{1:03d}'.format(title, x), generator.randbytes(data_size)) for x in range(files)]
+            path = os.path.join(corpus_path, filename)
+            if filename.endswith('.zip'):
+                write_zip_file(path, archive_files)
+            else:
+                write_lha_file(path, archive_files)
+            archives.append(path)
+    return archives
+
+# create fake adf, download and kickstart rom files in path
+def create_fake_files(path):
+    """Create Fake Files"""
+    os.makedirs(path, exist_ok=True)
+    for (filename, names) in fake_adf_files.items():
+        write_zip_file(os.path.join(path, filename), [(x, b'\x00' * 1024) for x in names])
+    for kickstart_rom_file in shared.kickstart_rom_files:
+        with open(os.path.join(path, kickstart_rom_file['DestFilename']), 'wb') as file:
+            file.write(b'\x00' * 512 * 1024)
+
+# create fake downloads in mirror path
+def create_fake_downloads(mirror_path):
+    """Create Fake Downloads"""
+    os.makedirs(mirror_path, exist_ok=True)
+    for (name, names) in fake_download_files.items():
+        write_lha_file(os.path.join(mirror_path, shared.download_files[name]['Filename']),
+                       [(x, b'\x00' * 1024) for x in names])
+
+# install stub executables and example scripts in bin path, scripts find stubs next to them
+def install_stubs(bin_path, examples_path):
+    """Install Stubs"""
+    os.makedirs(bin_path, exist_ok=True)
+    for (filename, source) in [('hst.imager', stub_source), ('hst.amiga', stub_source)]:
+        stub_path = os.path.join(bin_path, filename)
+        with open(stub_path, 'w', encoding='utf-8') as file:
+            file.write(source)
+        os.chmod(stub_path, 0o755)
+    for filename in os.listdir(examples_path):
+        if filename.endswith('.py') and filename != os.path.basename(__file__):
+            shutil.copyfile(os.path.join(examples_path, filename), os.path.join(bin_path, filename))
+
+# get answer arguments to run example script headless with answers to prompts
+def get_answer_arguments(answers):
+    """Get Answer Arguments"""
+    return ['--headless'] + [x for answer in answers.items() for x in ['--set', '{0}={1}'.format(*answer)]]
+
+# get scenarios with arguments and answer arguments for each run. runs of a scenario share working directory
+def get_scenarios(corpus_path, jobs):
+    """Get Scenarios"""
+    extract_answers = { 'whdloads': corpus_path, 'target_dir': '', 'create_image': 'yes',
+                        'install_minimal_whdload': 'yes', 'use_pfs3': 'yes' }
+    extract_arguments = get_answer_arguments(extract_answers)
+    sync_arguments = get_answer_arguments(dict(extract_answers, create_image='no', image_path='whdloads.vhd',
+                                               install_minimal_whdload='no'))
+    convert_arguments = get_answer_arguments({ 'use_amigaos_31': 'yes', 'use_pfs3': 'yes' })
+    install_arguments = get_answer_arguments({ 'create_image': 'yes', 'use_pfs3': 'yes' })
+    return [
+        {
+            'Name': 'extract-whdloads',
+            'Script': 'extract-whdloads.py',
+            'Args': [],
+            'Runs': [extract_arguments],
+            'Items': 'WHDLoads'
+        },
+        {
+            'Name': 'extract-whdloads-staged',
+            'Script': 'extract-whdloads.py',
+            'Args': ['--staged', '--staging-dir', 'staging', '--jobs', str(jobs)],
+            'Runs': [extract_arguments],
+            'Items': 'WHDLoads'
+        },
+        {
+            'Name': 'extract-whdloads-sync',
+            'Script': 'extract-whdloads.py',
+            'Args': ['--sync', '--jobs', str(jobs)],
+            'Runs': [extract_arguments, sync_arguments],
+            'Items': 'WHDLoads'
+        },
+        {
+            'Name': 'whdload-to-hdf-batch',
+            'Script': 'whdload-to-hdf.py',
+            'Args': ['--batch', corpus_path, '--output-dir', '.', '--jobs', str(jobs)],
+            'Runs': [convert_arguments, convert_arguments],
+            'Items': 'WHDLoads'
+        },
+        {
+            'Name': 'install-amigaos-3.1',
+            'Script': 'install-amigaos-3.1.py',
+            'Args': [],
+            'Runs': [install_arguments],
+            'Items': 'Adfs'
+        },
+        {
+            'Name': 'install-amigaos-3.2',
+            'Script': 'install-amigaos-3.2.py',
+            'Args': [],
+            'Runs': [install_arguments],
+            'Items': 'Adfs'
+        }
+    ]
+
+# get command type, executable name and sub commands, e.g. hst.imager fs extract
+def get_command_type(executable, commands):
+    """Get Command Type"""
+    command_type = [executable]
+    for command in commands[:3]:
+        if not re.search(r'^[a-z]+$', command):
+            break
+        command_type.append(command)
+    return ' '.join(command_type)
+
+# read stub log records
+def read_stub_log(log_path):
+    """Read Stub Log"""
+    if not os.path.isfile(log_path):
+        return []
+    with open(log_path, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+# run scenario run, example script is run headless in scenario path with run arguments.
+# cpu time of example script is cpu time of process and children minus cpu time reported by stubs
+def run_scenario_run(scenario, run_arguments, scenario_path, bin_path, env, items):
+    """Run Scenario Run"""
+    log_path = os.path.join(scenario_path, 'stub-log.jsonl')
+    if os.path.isfile(log_path):
+        os.remove(log_path)
+    env = dict(env, BENCHMARK_STUB_LOG=log_path)
+
+    output_path = os.path.join(scenario_path, 'run-{0}.log'.format(len(scenario['Results']) + 1))
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start_time = time.monotonic()
+    with open(output_path, 'w', encoding='utf-8') as output_file:
+        process = subprocess.run([sys.executable, os.path.join(bin_path, scenario['Script'])] + scenario['Args'] +
+                                 run_arguments, stdin=subprocess.DEVNULL, cwd=scenario_path, env=env,
+                                 stdout=output_file, stderr=subprocess.STDOUT)
+    wall_time = time.monotonic() - start_time
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_time = (usage.ru_utime - children_usage.ru_utime) + (usage.ru_stime - children_usage.ru_stime)
+
+    records = read_stub_log(log_path)
+    processes = [x for x in records if x['Type'] == 'Process']
+    operations = [x for x in records if x['Type'] == 'Operation']
+    command_types = {}
+    for operation in operations:
+        command_type = get_command_type(operation['Executable'], operation['Commands'])
+        command_types[command_type] = command_types.get(command_type, 0) + 1
+    stub_cpu_time = sum([x['CpuTime'] for x in processes])
+
+    return {
+        'ExitCode': process.returncode,
+        'WallTime': round(wall_time, 3),
+        'CpuTime': round(cpu_time, 3),
+        'OrchestrationCpuTime': round(max(0.0, cpu_time - stub_cpu_time), 3),
+        'Processes': len(processes),
+        'Operations': len(operations),
+        'SimulatedLatency': round(sum([x['Latency'] for x in records]), 3),
+        'CommandTypes': dict(sorted(command_types.items())),
+        'Items': items,
+        'Throughput': round(items / wall_time, 3) if wall_time > 0 else 0,
+        'Output': output_path
+    }
+
+# run scenario in new scenario path with fake files and caches isolated from host caches
+def run_scenario(scenario, work_path, bin_path, fake_path, mirror_path, args, items):
+    """Run Scenario"""
+    scenario_path = os.path.join(work_path, 'scenarios', scenario['Name'])
+    if os.path.exists(scenario_path):
+        shutil.rmtree(scenario_path)
+    shutil.copytree(fake_path, scenario_path)
+
+    cache_path = os.path.join(scenario_path, '.cache')
+    env = dict(os.environ,
+               PATH='{0}{1}{2}'.format(bin_path, os.pathsep, os.environ.get('PATH', '')),
+               BENCHMARK_STARTUP_LATENCY=str(args.startup_latency),
+               BENCHMARK_LATENCY=str(args.latency),
+               HST_IMAGER_DOWNLOAD_CACHE=os.path.join(cache_path, 'downloads'),
+               HST_IMAGER_DOWNLOAD_MIRROR=mirror_path,
+               HST_IMAGER_BASE_IMAGE_CACHE=os.path.join(cache_path, 'base-images'),
+               HST_IMAGER_ADF_CACHE=os.path.join(cache_path, 'adfs'),
+               HST_IMAGER_IDENTIFY_INDEX=os.path.join(cache_path, 'identify-index.json'),
+               HST_IMAGER_IDENTIFY_PATH='',
+               HST_IMAGER_WHDLOAD_INDEX=os.path.join(cache_path, 'whdload-index.sqlite'),
+               HST_IMAGER_PLAN_CACHE=os.path.join(cache_path, 'plans'),
+               HST_IMAGER_TIMINGS=os.path.join(cache_path, 'timings.sqlite'))
+    env.pop('HST_IMAGER_TRACE', None)
+
+    scenario['Results'] = []
+    for run_arguments in scenario['Runs']:
+        result = run_scenario_run(scenario, run_arguments, scenario_path, bin_path, env, items)
+        scenario['Results'].append(result)
+        print('{0} run {1}: {2}, {3:.2f}s, {4} processes, {5} operations, {6:.1f} {7}/s{8}'.format(
+            scenario['Name'], len(scenario['Results']), 'ok' if result['ExitCode'] == 0 else 'failed',
+            result['WallTime'], result['Processes'], result['Operations'], result['Throughput'],
+            scenario['Items'].lower(), '' if result['ExitCode'] == 0 else ', see \'{0}\''.format(result['Output'])))
+    return scenario['Results']
+
+# compare report with baseline report, differences in wall time, processes and operations are printed
+def compare_reports(report, baseline):
+    """Compare Reports"""
+    print('Comparison with baseline:')
+    for (name, runs) in report['Scenarios'].items():
+        baseline_runs = baseline.get('Scenarios', {}).get(name)
+        if not baseline_runs:
+            print('- {0}: not in baseline'.format(name))
+            continue
+        for index, (run, baseline_run) in enumerate(zip(runs, baseline_runs), start=1):
+            wall_time_change = (run['WallTime'] - baseline_run['WallTime']) / baseline_run['WallTime'] * 100 \
+                if baseline_run['WallTime'] > 0 else 0.0
+            print('- {0} run {1}: wall time {2:.2f}s -> {3:.2f}s ({4:+.1f}%), processes {5} -> {6}, '
+                  'operations {7} -> {8}'.format(name, index, baseline_run['WallTime'], run['WallTime'],
+                                                 wall_time_change, baseline_run['Processes'], run['Processes'],
+                                                 baseline_run['Operations'], run['Operations']))
+
+# arguments
+parser = argparse.ArgumentParser(description='Benchmark Examples')
+parser.add_argument('--count', type=int, default=100,
+                    help='Number of WHDLoad titles in synthetic corpus (default = 100).')
+parser.add_argument('--size', default='256kb',
+                    help='Size of data files in each WHDLoad file (default = 256kb).')
+parser.add_argument('--files', type=int, default=8,
+                    help='Number of data files in each WHDLoad file (default = 8).')
+parser.add_argument('--startup-latency', type=float, default=0.1,
+                    help='Simulated startup latency in seconds of each stub process (default = 0.1).')
+parser.add_argument('--latency', type=float, default=0.01,
+                    help='Simulated latency in seconds of each stub operation (default = 0.01).')
+parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                    help='Number of jobs used by scenarios running in parallel (default = number of cpus).')
+parser.add_argument('--scenarios', nargs='+',
+                    help='Names of scenarios to run (default = all).')
+parser.add_argument('--work-dir',
+                    help='Working directory for corpus and scenarios, kept after benchmark (default = temp directory).')
+parser.add_argument('--output', default='benchmark.json',
+                    help='Path to write benchmark report json (default = benchmark.json).')
+parser.add_argument('--compare',
+                    help='Path to benchmark report json to compare with.')
+args = parser.parse_args()
+
+# error, if not linux as stubs rely on posix executables
+if platform.system() != 'Linux':
+    print('Error: Benchmark requires Linux')
+    exit(1)
+
+# paths
+examples_path = os.path.dirname(os.path.abspath(__file__))
+work_path = os.path.abspath(args.work_dir) if args.work_dir else tempfile.mkdtemp(prefix='hst-imager-benchmark-')
+corpus_path = os.path.join(work_path, 'corpus')
+bin_path = os.path.join(work_path, 'bin')
+fake_path = os.path.join(work_path, 'fake')
+mirror_path = os.path.join(work_path, 'mirror')
+
+# select scenarios to run
+scenarios = get_scenarios(corpus_path, args.jobs)
+if args.scenarios:
+    unknown_scenarios = [x for x in args.scenarios if not x in [y['Name'] for y in scenarios]]
+    if len(unknown_scenarios) > 0:
+        print('Error: Unknown scenarios {0}, valid scenarios are {1}'.format(
+            ', '.join(unknown_scenarios), ', '.join([x['Name'] for x in scenarios])))
+        exit(1)
+    scenarios = [x for x in scenarios if x['Name'] in args.scenarios]
+
+# create corpus, fake files and stubs
+print('Creating corpus of {0} WHDLoads in \'{1}\''.format(args.count, work_path))
+if os.path.exists(corpus_path):
+    shutil.rmtree(corpus_path)
+whdload_archives = create_whdload_corpus(corpus_path, args.count, shared.parse_size(args.size), args.files)
+create_fake_files(fake_path)
+create_fake_downloads(mirror_path)
+install_stubs(bin_path, examples_path)
+
+# run scenarios
+report = {
+    'Version': 1,
+    'Python': platform.python_version(),
+    'Platform': platform.platform(),
+    'Cpus': os.cpu_count(),
+    'Config': {
+        'Count': args.count,
+        'Archives': len(whdload_archives),
+        'Size': shared.parse_size(args.size),
+        'Files': args.files,
+        'StartupLatency': args.startup_latency,
+        'Latency': args.latency,
+        'Jobs': args.jobs
+    },
+    'Scenarios': {}
+}
+for scenario in scenarios:
+    items = len(whdload_archives) if scenario['Items'] == 'WHDLoads' else \
+        len([x for x in fake_adf_files if (x.startswith('amiga-os-310')) == scenario['Name'].endswith('3.1')])
+    report['Scenarios'][scenario['Name']] = run_scenario(scenario, work_path, bin_path, fake_path, mirror_path,
+                                                         args, items)
+
+# write report
+with open(args.output, 'w', encoding='utf-8') as file:
+    json.dump(report, file, indent=2)
+print('Benchmark report written to \'{0}\''.format(args.output))
+
+# compare with baseline report
+if args.compare:
+    with open(args.compare, 'r', encoding='utf-8') as file:
+        compare_reports(report, json.load(file))
+
+# remove temp working directory
+if not args.work_dir:
+    shutil.rmtree(work_path)
+
+# exit with error, if any scenario failed
+if any([x['ExitCode'] != 0 for runs in report['Scenarios'].values() for x in runs]):
+    exit(1)
@@ -12,15 +12,145 @@
 # Requirements:
 # - WHDload .lha and .zip files.
 # - AmigaOS 3.1.4+ install adf for DOS7, if creating new image with DOS7 dostype.
+#
+# Usage:
+# - extract-whdloads.py: Extract WHDLoads one at a time to image file.
+# - extract-whdloads.py --staged --staging-dir /dev/shm/whdloads: Decompress WHDLoads in
+#   parallel to staging directory and copy each index directory to image file.
+# - extract-whdloads.py --sync: Only extract new and changed WHDLoads since last sync using
+#   a manifest stored next to image file or in image file with --manifest-in-image.
+# - extract-whdloads.py --duplicates newest: Only extract newest version of each WHDLoad title.
+# - extract-whdloads.py --image-size 16gb: Create new image file of fixed size instead of smallest
+#   image file fitting WHDLoads. Smallest image file is calculated from entries of WHDLoads in
+#   WHDLoad index, see index-whdloads.py.
+# - extract-whdloads.py --headless --config whdloads.toml: Extract WHDLoads without prompts using answers
+#   in config file, e.g. whdloads = "whdloads", target_dir = "DH1/WHDLoads", create_image = true,
+#   install_minimal_whdload = true and use_pfs3 = true. Answers can also be set with --set, e.g.
+#   --set create_image=yes, or environment variables, e.g. HST_IMAGER_CREATE_IMAGE=yes.
+# - extract-whdloads.py --optimize --compress zip gz: Optimize image file and create .zip and .gz artifacts
+#   compressed in parallel with sha256 sums and json artifact manifest.
+# - extract-whdloads.py --verify --verify-sample 5% --verify-report verify.json: Verify names and sizes of
+#   extracted files against WHDLoads and compare content of a random sample of 5% of files.
+# - extract-whdloads.py --staged --continue-on-error --retries 2 --watchdog-timeout 120: Quarantine WHDLoads
+#   failing to extract after retries or hanging without progress instead of stopping. Quarantined WHDLoads
+#   and their output are written to image file path with .quarantine.json extension. Exit code is 0,
+#   if all WHDLoads are extracted, 2 if some are quarantined and 1 if all are quarantined.
+# - extract-whdloads.py --shards 4 --shard-by letters: Split WHDLoads into 4 image files by ranges of index
+#   directories, e.g. whdloads-1.vhd with A-F, or balanced by size with --shard-by size. Image files are created
+#   and filled in parallel by a process per shard. Shard ranges, WHDLoads and exit codes are written to
+#   whdloads.vhd.shards.json and output of each shard to log file next to it's image file.
+# - extract-whdloads.py --parallel-partitions: Create DH0 and DH1 partitions as separate image files, install
+#   minimal WHDLoad to DH0 while WHDLoads are extracted to DH1 and import both partitions into new image file.
+# - extract-whdloads.py --dry-run --dry-run-plan plan.json: Print plan of WHDLoads, bytes, files and directories
+#   to extract with time estimated from timings of previous runs without creating or changing image file and
+#   write commands of plan to json file. Timings are recorded in timings.sqlite next to download cache or
+#   HST_IMAGER_TIMINGS and used to print eta while WHDLoads are extracted.
+# - extract-whdloads.py --watch --watch-interval 2 --watch-settle 2: Extract WHDLoads and keep watching
+#   directory with WHDLoads using inotify or polling. New and changed WHDLoads are extracted in batches,
+#   when their size and modified time haven't changed for 2 seconds, until stopped with Ctrl+C.
+# - HST_IMAGER_TRACE=trace.json extract-whdloads.py: Trace commands run to chrome trace file, which can be
+#   opened in Perfetto, and print slowest commands and time per command type when done.
 
 """Extract WHDLoads"""
 
+import argparse
 import os
 import re
+import shutil
 import subprocess
+import sys
+import time
+import concurrent.futures
 import codecs
 import unicodedata
 import shared
+import artifacts
+import timings
+import verify
+import watch
+import whdload
+import whdloadindex
+
+# arguments
+parser = argparse.ArgumentParser(description='Extract WHDLoads')
+parser.add_argument('--staged', action='store_true',
+                    help='Decompress WHDLoads in parallel to a local staging directory and copy each index directory to image.')
+parser.add_argument('--staging-dir', default=os.path.join(os.getcwd(), 'staging'),
+                    help='Staging directory, e.g. on tmpfs (default = staging in current directory).')
+parser.add_argument('--staging-budget', default='4gb',
+                    help='Max disk space used by staging directory (default = 4gb).')
+parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                    help='Number of WHDLoads decompressed in parallel (default = number of cpus).')
+parser.add_argument('--sync', action='store_true',
+                    help='Only extract new and changed WHDLoads tracked in a manifest of previously extracted WHDLoads.')
+parser.add_argument('--manifest',
+                    help='Path to sync manifest (default = image file path with .whdloads.json extension).')
+parser.add_argument('--manifest-in-image', action='store_true',
+                    help='Store sync manifest in target directory of image file.')
+parser.add_argument('--duplicates', choices=whdload.whdload_duplicate_policies, default='all',
+                    help='Duplicate policy, all extracts all versions, newest extracts newest version of each title and '
+                    'per-chipset extracts newest version of each title per chipset. Identical WHDLoads are always '
+                    'extracted once (default = all).')
+parser.add_argument('--continue-on-error', action='store_true',
+                    help='Quarantine WHDLoads failing to extract and continue with next WHDLoad. Each WHDLoad is '
+                    'extracted by it\'s own Hst Imager process, if not staged.')
+parser.add_argument('--retries', type=int, default=2,
+                    help='Number of times a WHDLoad failing to extract is retried, when staged or continue on error '
+                    '(default = 2).')
+parser.add_argument('--watchdog-timeout', type=float, default=120,
+                    help='Seconds without progress before extraction of a WHDLoad is killed, increased by a second '
+                    'per 256kb of WHDLoad file. 0 disables watchdog (default = 120).')
+parser.add_argument('--quarantine',
+                    help='Path to quarantine of WHDLoads failed to extract (default = image file path with '
+                    '.quarantine.json extension).')
+parser.add_argument('--shards', type=int, default=1,
+                    help='Number of image files WHDLoads are split into and extracted to in parallel (default = 1).')
+parser.add_argument('--shard-by', choices=whdload.whdload_shard_policies, default='size',
+                    help='Shard policy, letters splits index directories into ranges and size balances size of image '
+                    'files (default = size).')
+parser.add_argument('--shard-manifest', help=argparse.SUPPRESS)
+parser.add_argument('--shard', type=int, help=argparse.SUPPRESS)
+parser.add_argument('--parallel-partitions', action='store_true',
+                    help='Fill DH0 and DH1 partitions of new image file in parallel as separate image files and import '
+                    'them into image file, when done.')
+parser.add_argument('--dry-run', action='store_true',
+                    help='Print plan of WHDLoads to extract with estimated time without creating or changing image file.')
+parser.add_argument('--dry-run-plan',
+                    help='Path to write json plan with commands of dry run to.')
+parser.add_argument('--watch', action='store_true',
+                    help='Keep watching directory with WHDLoads and extract new and changed WHDLoads in batches until '
+                    'stopped.')
+parser.add_argument('--watch-interval', type=float, default=2,
+                    help='Seconds changes are collected before new WHDLoads are extracted and between scans, when '
+                    'polling (default = 2).')
+parser.add_argument('--watch-settle', type=float, default=2,
+                    help='Seconds size and modified time of new WHDLoads must be unchanged before they are extracted, '
+                    'so WHDLoads still being copied are not extracted (default = 2).')
+parser.add_argument('--watch-poll', action='store_true',
+                    help='Poll directory with WHDLoads instead of using inotify.')
+parser.add_argument('--image-size', default='auto',
+                    help='Size of new image file, auto calculates smallest image file fitting WHDLoads to extract '
+                    '(default = auto).')
+artifacts.add_artifact_arguments(parser)
+verify.add_verify_arguments(parser)
+shared.add_config_arguments(parser)
+args = parser.parse_args()
+shared.configure(args)
+
+# read shard, if run as shard of sharded image files. paths set by arguments get shard number, so shards
+# running in parallel don't share files
+shard = None
+if args.shard is not None:
+    shard = whdload.read_whdload_shards(args.shard_manifest)['Shards'][args.shard - 1]
+    args.staging_dir = whdload.get_shard_path(args.staging_dir, args.shard)
+    for name in ['quarantine', 'verify_report']:
+        if getattr(args, name):
+            setattr(args, name, whdload.get_shard_path(getattr(args, name), args.shard))
+
+# error, if watch is combined with options extracting whdloads to other image files or publishing image file
+if args.watch and (args.shards > 1 or args.parallel_partitions or args.dry_run or args.optimize or args.compress):
+    print('Error: Watch can\'t be combined with shards, parallel partitions, dry run, optimize or compress')
+    exit(1)
 
 # paths
 current_path = os.getcwd()
@@ -28,26 +158,58 @@ script_path = os.path.dirname(__file__)
 hst_imager_path = shared.get_hst_imager_path(script_path)
 
 # select whdloads directory to extract
-whdloads_path = shared.select_folder_path('directory with WHDLoads to extract')
+whdloads_path = shared.select_folder_path('directory with WHDLoads to extract', 'whdloads')
 
 # error, if whdloads path is not found
 if not os.path.isdir(whdloads_path):
     print('Error: WHDLoads directory \'{0}\' doesn\'t exist'.format(whdloads_path))
     exit(1)
 
+# find .lha, .lzx and .zip files
+whdload_archives = whdload.find_whdload_archives(whdloads_path)
+found_archives = whdload_archives
+
+# select whdload files to extract using duplicate policy
+(whdload_archives, skipped_archives) = whdload.select_whdload_archives(whdload_archives, args.duplicates, args.jobs)
+if len(skipped_archives) > 0:
+    print('Skipping {0} duplicate WHDLoads'.format(len(skipped_archives)))
+    for (whdload_archive, reason) in skipped_archives:
+        print('- {0}: {1}'.format(whdload_archive['Filename'], reason))
+
+# only extract whdload files in shard, if run as shard
+if shard is not None:
+    shard_paths = set(shard['Archives'])
+    whdload_archives = [x for x in whdload_archives
+                        if os.path.relpath(x['Path'], whdloads_path).replace('\\', '/') in shard_paths]
+
+# quarantine whdload files, which can't be listed, if continue on error
+quarantined_archives = []
+if args.continue_on_error:
+    archives_entries = whdloadindex.get_whdload_archives_entries(hst_imager_path, whdload_archives, args.jobs)
+    quarantined_archives = [whdload.get_quarantined_whdload_archive(x, 'Failed to list WHDLoad file')
+                            for x in whdload_archives if archives_entries[x['Path']] is None]
+    whdload_archives = [x for x in whdload_archives if archives_entries[x['Path']] is not None]
+
+# selected whdload files expected in image file, when verified
+selected_archives = whdload_archives
+
+# enter target directory whdloads are extracted to
+target_dir = shared.input_box('Target directory WHDLoads are extracted to (enter = DH1/WHDLoads)', 'target_dir')
+
+# set default target directory, if not set or empty
+if target_dir is None or target_dir == '':
+    target_dir = 'DH1/WHDLoads'
+
 # confirm create image confirm 
-create_image = shared.confirm("Do you want to create a new hard disk image file?", "enter = yes")
+create_image = shared.confirm("Do you want to create a new hard disk image file?", "enter = yes", 'create_image')
 
 image_path = None
 if (create_image):
-    # set image path
-    image_path = os.path.join(current_path, 'whdloads.vhd')
-
-    # create 16gb image file
-    shared.create_image(hst_imager_path, image_path, '16gb')
+    # set image path, image path is set by shard, if run as shard
+    image_path = shard['ImagePath'] if shard is not None else os.path.join(current_path, 'whdloads.vhd')
 else:
     # select image path
-    image_path = shared.select_file_path('hard disk image file')
+    image_path = shared.select_file_path('hard disk image file', 'image_path')
     
     # error, if image path is not found
     if not os.path.isfile(image_path):
@@ -55,43 +217,577 @@ else:
         exit(1)
 
 # confirm install minimal whdload 
-if (shared.confirm("Do you want to install minimal WHDLoad (WHDLoad+SKick+Kickstarts+IconLib)?", "enter = yes")):
-    # install minimal whdload input 
-    shared.install_minimal_whdload(hst_imager_path, image_path)
+install_minimal_whdload = shared.confirm("Do you want to install minimal WHDLoad (WHDLoad+SKick+Kickstarts+IconLib)?", "enter = yes",
+                                         'install_minimal_whdload')
 
-# enter target directory whdloads are extracted to
-target_dir = shared.input_box('Target directory WHDLoads are extracted to (enter = DH1/WHDLoads)')
+# open timings of previous runs used to estimate time, timings of this run are recorded
+timings_connection = timings.open_timings()
 
-# set default target directory, if not set or empty
-if target_dir is None or target_dir == '':
-    target_dir = 'DH1/WHDLoads'
+# dry run, plan of whdload files to extract is printed with time estimated from timings of previous runs
+# without creating or changing image file. whdload files are listed to get their sizes, if not indexed
+if args.dry_run:
+    shared.set_trace_step('dry run')
+    archives_entries = whdloadindex.get_whdload_archives_entries(hst_imager_path, whdload_archives, args.jobs)
+    unlisted_archives = [x for x in whdload_archives if archives_entries[x['Path']] is None]
+    whdload_archives = [x for x in whdload_archives if archives_entries[x['Path']] is not None]
+    if len(unlisted_archives) > 0:
+        print('Warning: {0} WHDLoads can\'t be listed and are not planned:'.format(len(unlisted_archives)))
+        for whdload_archive in unlisted_archives:
+            print('- {0}'.format(whdload_archive['Filename']))
+
+    # only plan new and changed whdload files, if syncing existing image file
+    if args.sync and not create_image:
+        if args.manifest_in_image:
+            print('Warning: Sync manifest in image file is not read by dry run, all WHDLoads are planned')
+        else:
+            manifest = whdload.read_whdload_manifest(
+                args.manifest if args.manifest else '{0}.whdloads.json'.format(image_path))
+            if manifest.get('TargetDir', target_dir).lower() == target_dir.lower():
+                (whdload_archives, stale_directories, manifest) = whdload.sync_whdload_archives(
+                    hst_imager_path, whdload_archives, whdloads_path, manifest, args.jobs)
+
+    # error, if image size is auto and target directory is not in dh1 partition
+    target_dir_parts = target_dir.split('/')
+    if create_image and args.image_size == 'auto' and target_dir_parts[0].lower() != 'dh1':
+        print('Error: Image size auto requires target directory in DH1, use --image-size to set image size')
+        exit(1)
+    use_pfs3 = shared.confirm_use_pfs3() if create_image else None
+
+    # plan whdload files extracted to image file, image file is created first, if creating new image file
+    def get_dry_run_plan(plan_image_path, plan_archives, jobs, staging_path):
+        plan = []
+        if create_image:
+            entries = [dict(x, name='{0}/{1}/{2}'.format('/'.join(target_dir_parts[1:]), whdload_archive['IndexDir'],
+                                                         x['name']))
+                       for whdload_archive in plan_archives for x in archives_entries[whdload_archive['Path']]]
+            image_size = shared.get_create_image_size(args.image_size, entries, use_pfs3)
+            plan.append(timings.plan_operation('create image', None, 1, shared.parse_size(image_size)))
+        plan += whdload.get_whdload_extract_plan(
+            hst_imager_path, plan_archives, archives_sizes, os.path.join(*[plan_image_path, 'rdb'] + target_dir_parts),
+            args.continue_on_error and not args.staged, staging_path, jobs)
+        return plan
+
+    # plan each shard, if sharded, as shards are extracted in parallel
+    archives_sizes = whdload.get_whdload_archives_sizes(whdload_archives, archives_entries)
+    dry_run_plans = []
+    if args.shards > 1:
+        shards = whdload.get_whdload_shards(whdload_archives, archives_entries, args.shards, args.shard_by)
+        shard_jobs = max(1, args.jobs // max(1, len(shards)))
+        for whdload_shard in shards:
+            shard_image_path = whdload.get_shard_path(image_path, whdload_shard['Shard'])
+            dry_run_plans.append({ 'Shard': whdload_shard['Shard'], 'ImagePath': shard_image_path,
+                                   'Archives': whdload_shard['Archives'], 'Operations': get_dry_run_plan(
+                                       shard_image_path, whdload_shard['Archives'], shard_jobs,
+                                       os.path.abspath(whdload.get_shard_path(args.staging_dir, whdload_shard['Shard']))
+                                       if args.staged else None) })
+    else:
+        dry_run_plans.append({ 'Shard': None, 'ImagePath': image_path, 'Archives': whdload_archives,
+                               'Operations': get_dry_run_plan(image_path, whdload_archives, args.jobs,
+                                                              os.path.abspath(args.staging_dir) if args.staged else None) })
+
+    # print plan of each shard with estimated time
+    models = {}
+    index_dirs = set([x['IndexDir'].lower() for x in whdload_archives])
+    print('Dry run, image file \'{0}\' is not {1}'.format(image_path, 'created' if create_image else 'changed'))
+    print('Plan of {0} WHDLoads, {1} bytes, {2} files and {3} directories in {4} index directories to extract to '
+          '\'{5}\''.format(len(whdload_archives), sum([archives_sizes[x['Path']]['Size'] for x in whdload_archives]),
+                            sum([archives_sizes[x['Path']]['Files'] for x in whdload_archives]),
+                            sum([archives_sizes[x['Path']]['Directories'] for x in whdload_archives]) + len(index_dirs),
+                            len(index_dirs), target_dir))
+    for dry_run_plan in dry_run_plans:
+        timings.estimate_plan(timings_connection, dry_run_plan['Operations'], models)
+        dry_run_plan['Estimate'] = sum([x['Estimate'] for x in dry_run_plan['Operations']])
+        if dry_run_plan['Shard'] is not None:
+            print('Shard {0}: {1} WHDLoads to \'{2}\''.format(dry_run_plan['Shard'], len(dry_run_plan['Archives']),
+                                                              dry_run_plan['ImagePath']))
+        timings.print_plan(dry_run_plan['Operations'], models)
+        dry_run_plan['Archives'] = [x['Filename'] for x in dry_run_plan['Archives']]
+    if len(dry_run_plans) > 1:
+        print('Estimated time of {0} shards in parallel {1}'.format(
+            len(dry_run_plans), timings.format_duration(max([x['Estimate'] for x in dry_run_plans]))))
+
+    # write plan with commands
+    if args.dry_run_plan:
+        whdload.write_whdload_manifest(args.dry_run_plan, { 'Version': 1, 'ImagePath': image_path,
+                                                            'TargetDir': target_dir, 'Plans': dry_run_plans })
+        print('Plan written to \'{0}\''.format(args.dry_run_plan))
+    exit(0)
+
+# fetch minimal whdload downloads in background while image is created
+downloads = None
+if install_minimal_whdload:
+    downloads = shared.fetch_downloads(shared.minimal_whdload_downloads, os.path.dirname(image_path) or '.')
+
+# split whdload files into shards and run this script for each shard in parallel, each shard creates and
+# extracts whdload files to it's own image file
+if args.shards > 1 and shard is None:
+    # error, if not creating new image files or syncing
+    if not create_image or args.sync:
+        print('Error: Shards require creating new image files and can\'t be synced')
+        exit(1)
+
+    # get answers, amiga os adf, kickstart rom and download files used by shards, so shards don't prompt for them
+    # or download them at the same time
+    use_pfs3 = shared.confirm_use_pfs3()
+    if install_minimal_whdload:
+        image_dir = os.path.dirname(image_path)
+        if not use_pfs3:
+            shared.get_amigaos_install_adf_path(image_dir, False)
+        shared.get_rom_files(shared.kickstart_rom_files, image_dir)
+        for name in shared.minimal_whdload_downloads:
+            downloads[name].result()
+
+    # split whdload files into shards using sizes from whdload index
+    shared.set_trace_step('shard whdloads')
+    archives_entries = whdloadindex.get_whdload_archives_entries(hst_imager_path, whdload_archives, args.jobs)
+    shards = whdload.get_whdload_shards(whdload_archives, archives_entries, args.shards, args.shard_by)
+    if len(shards) == 0:
+        print('Error: No WHDLoads to extract to shards')
+        exit(1)
+    for whdload_shard in shards:
+        whdload_shard['ImagePath'] = whdload.get_shard_path(image_path, whdload_shard['Shard'])
+        whdload_shard['LogPath'] = '{0}.log'.format(whdload_shard['ImagePath'])
+        whdload_shard['Archives'] = [os.path.relpath(x['Path'], whdloads_path).replace('\\', '/')
+                                     for x in whdload_shard['Archives']]
+    shards_path = '{0}.shards.json'.format(image_path)
+    shards_manifest = { 'Version': 1, 'ShardBy': args.shard_by, 'TargetDir': target_dir, 'Shards': shards }
+    whdload.write_whdload_manifest(shards_path, shards_manifest)
+
+    # arguments for shards, answers are set and jobs are split between shards
+    shard_arguments = sys.argv[1:] + ['--headless', '--jobs', str(max(1, args.jobs // len(shards))),
+                                      '--shard-manifest', shards_path]
+    for (key, value) in [('whdloads', whdloads_path), ('target_dir', target_dir), ('create_image', 'yes'),
+                         ('install_minimal_whdload', 'yes' if install_minimal_whdload else 'no'),
+                         ('use_pfs3', 'yes' if use_pfs3 else 'no')]:
+        shard_arguments += ['--set', '{0}={1}'.format(key, value)]
+
+    # run shard, output is written to log file and trace file gets shard number
+    def run_shard(whdload_shard):
+        env = dict(os.environ)
+        if env.get('HST_IMAGER_TRACE'):
+            env['HST_IMAGER_TRACE'] = whdload.get_shard_path(env['HST_IMAGER_TRACE'], whdload_shard['Shard'])
+        with open(whdload_shard['LogPath'], 'w', encoding='utf-8') as log_file:
+            return subprocess.run([sys.executable, os.path.abspath(__file__)] + shard_arguments +
+                                  ['--shard', str(whdload_shard['Shard'])], stdin=subprocess.DEVNULL,
+                                  stdout=log_file, stderr=subprocess.STDOUT, env=env).returncode
+
+    print('Extracting {0} WHDLoads to {1} shards in parallel'.format(len(whdload_archives), len(shards)))
+    for whdload_shard in shards:
+        print('- Shard {0}: {1}-{2}, {3} WHDLoads, {4} bytes to \'{5}\''.format(
+            whdload_shard['Shard'], whdload_shard['First'], whdload_shard['Last'], len(whdload_shard['Archives']),
+            whdload_shard['Size'], whdload_shard['ImagePath']))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        futures = dict([(executor.submit(run_shard, x), x) for x in shards])
+        for future in concurrent.futures.as_completed(futures):
+            whdload_shard = futures[future]
+            whdload_shard['ExitCode'] = future.result()
+            print('Shard {0}: {1}, see \'{2}\''.format(
+                whdload_shard['Shard'], 'done' if whdload_shard['ExitCode'] == 0 else
+                'exit code {0}'.format(whdload_shard['ExitCode']), whdload_shard['LogPath']))
+    whdload.write_whdload_manifest(shards_path, shards_manifest)
+
+    # write quarantine of whdload files, which can't be listed and are not in any shard
+    whdload.write_whdload_quarantine(args.quarantine if args.quarantine else '{0}.quarantine.json'.format(image_path),
+                                     quarantined_archives)
+
+    # exit with 0, if all shards are done, 1 if all shards failed and 2 for partial success
+    exit_codes = [x['ExitCode'] for x in shards] + ([2] if quarantined_archives else [])
+    if all([x == 0 for x in exit_codes]):
+        print('Done')
+        exit(0)
+    exit(1 if all([x not in [0, 2] for x in exit_codes]) else 2)
+
+# work path for temporary files, shards use their own work path as they run in parallel
+work_path = None
+if shard is not None:
+    work_path = os.path.join(current_path, '.shard-{0}'.format(args.shard))
+    os.makedirs(work_path, exist_ok=True)
+
+# error, if parallel partitions and not creating new image file with target directory in dh1 partition
+if args.parallel_partitions and (not create_image or target_dir.split('/')[0].lower() != 'dh1'):
+    print('Error: Parallel partitions require creating new image file and target directory in DH1')
+    exit(1)
+
+# create image file, image size is calculated from entries of whdload files, if auto
+extract_image_path = image_path
+partition_images = None
+dh0_future = None
+create_image_start_time = time.monotonic()
+if (create_image):
+    entries = None
+    if args.image_size == 'auto':
+        # error, if target directory is not in dh1 partition, which is sized to fit whdloads
+        target_dir_parts = target_dir.split('/')
+        if target_dir_parts[0].lower() != 'dh1':
+            print('Error: Image size auto requires target directory in DH1, use --image-size to set image size')
+            exit(1)
+        print('Calculating image size for {0} WHDLoads'.format(len(whdload_archives)))
+        shared.set_trace_step('calculate image size')
+        entries = whdload.get_whdload_archives_entries(hst_imager_path, whdload_archives,
+                                                       '/'.join(target_dir_parts[1:]), args.jobs)
+    use_pfs3 = shared.confirm_use_pfs3()
+    image_size = shared.get_create_image_size(args.image_size, entries, use_pfs3)
+
+    # get amiga os adf, kickstart rom and download files used by base image. files are resolved before dh0
+    # partition image is created in background, so it doesn't select files or wait for downloads
+    input_paths = []
+    if (install_minimal_whdload):
+        image_dir = os.path.dirname(image_path)
+        if not use_pfs3:
+            input_paths.append(shared.get_amigaos_install_adf_path(image_dir, False))
+        shared.get_rom_files(shared.kickstart_rom_files, image_dir)
+        input_paths += shared.get_kickstart_rom_paths(image_dir)
+        input_paths += [downloads[x].result() for x in shared.minimal_whdload_downloads]
+
+    if args.parallel_partitions:
+        (dh0_size, dh1_size) = shared.get_create_partition_sizes(args.image_size, entries, use_pfs3)
+        partition_images = [
+            { 'Path': shared.get_partition_image_path(image_path, 'DH0'), 'Name': 'DH0', 'Size': dh0_size,
+              'Bootable': True },
+            { 'Path': shared.get_partition_image_path(image_path, 'DH1'), 'Name': 'DH1', 'Size': dh1_size }
+        ]
+
+        # get file system adf path once before dh0 partition image is created in background, so dh0 and dh1
+        # partition images don't select it at the same time
+        file_system_adf_path = shared.get_file_system_adf_path(image_path, use_pfs3)
+
+        # build dh0 partition image with minimal whdload using it's own work path
+        def build_dh0_partition_image():
+            dh0_image_path = partition_images[0]['Path']
+            dh0_work_path = shared.get_partition_image_path(image_path, 'DH0', '.work')
+            os.makedirs(dh0_work_path, exist_ok=True)
+            try:
+                shared.create_partition_image(hst_imager_path, dh0_image_path, dh0_size, 'DH0', 'Workbench', use_pfs3,
+                                              file_system_adf_path, True)
+                if install_minimal_whdload:
+                    shared.install_minimal_whdload(hst_imager_path, dh0_image_path, downloads, dh0_work_path)
+            finally:
+                shutil.rmtree(dh0_work_path, ignore_errors=True)
+
+        # create dh0 partition image from cached base image in background, while whdloads are extracted to dh1
+        # partition image. returns time used to create dh0 partition image
+        def create_dh0_partition_image():
+            start_time = time.monotonic()
+            if not install_minimal_whdload:
+                build_dh0_partition_image()
+                return time.monotonic() - start_time
+            base_image_key = shared.get_base_image_key(['extract-whdloads-dh0', dh0_size, use_pfs3],
+                                                       input_paths + [os.path.abspath(__file__)])
+            shared.create_cached_image(partition_images[0]['Path'], base_image_key, build_dh0_partition_image)
+            return time.monotonic() - start_time
+        dh0_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        dh0_future = dh0_executor.submit(create_dh0_partition_image)
+        dh0_executor.shutdown(wait=False)
+
+        shared.create_partition_image(hst_imager_path, partition_images[1]['Path'], dh1_size, 'DH1', 'Work', use_pfs3,
+                                      file_system_adf_path)
+        extract_image_path = partition_images[1]['Path']
+    elif (install_minimal_whdload):
+        # build base image with minimal whdload
+        def build_base_image():
+            shared.create_image(hst_imager_path, image_path, image_size, None, use_pfs3)
+            shared.install_minimal_whdload(hst_imager_path, image_path, downloads, work_path)
+
+        # create image from cached base image with same size, file system and input files
+        base_image_key = shared.get_base_image_key(['extract-whdloads', image_size, use_pfs3],
+                                                   input_paths + [os.path.abspath(__file__)])
+        shared.create_cached_image(image_path, base_image_key, build_base_image)
+    else:
+        shared.create_image(hst_imager_path, image_path, image_size, None, use_pfs3)
+elif (install_minimal_whdload):
+    # install minimal whdload
+    shared.install_minimal_whdload(hst_imager_path, image_path, downloads, work_path)
+
+# record timing of image file or dh1 partition image created, dh0 partition image created in background is
+# recorded when it's done
+if (create_image):
+    timings.record_timings(timings_connection, 'create image', [(
+        1, shared.parse_size(image_size) if partition_images is None else dh1_size, 0,
+        time.monotonic() - create_image_start_time)])
+
+# remove work path used by shard
+if work_path is not None:
+    shutil.rmtree(work_path, ignore_errors=True)
+
+# check dh0 partition image created in background, exits if it failed, so whdloads are not extracted to dh1
+# partition image, which can't be imported
+def check_dh0_partition_image():
+    if dh0_future is None or not dh0_future.done() or dh0_future.exception() is None:
+        return
+    error = dh0_future.exception()
+    print('Error: Failed to create DH0 partition image{0}'.format(
+        '' if isinstance(error, SystemExit) else ': {0}'.format(error)))
+    exit(1)
+
+# target path whdloads are extracted to
+target_path = os.path.join(*[extract_image_path, 'rdb'] + target_dir.split('/'))
+
+if args.sync:
+    # sync manifest path, manifest stored in image file is copied to current path
+    manifest_path = args.manifest if args.manifest else '{0}.whdloads.json'.format(image_path)
+    if args.manifest_in_image:
+        manifest_path = os.path.join(current_path, whdload.manifest_filename)
+        if os.path.isfile(manifest_path):
+            os.remove(manifest_path)
+        if not create_image:
+            shared.run_command_capture_error_code([hst_imager_path, 'fs', 'copy', os.path.join(target_path, whdload.manifest_filename), current_path, '--force'])
+
+    # read manifest, manifest is empty for new image file or other target directory
+    manifest = whdload.read_whdload_manifest(manifest_path)
+    if create_image or manifest.get('TargetDir', target_dir).lower() != target_dir.lower():
+        manifest = { 'Version': 1, 'Archives': {} }
+
+    # get new and changed whdload files to extract
+    (whdload_archives, stale_directories, manifest) = whdload.sync_whdload_archives(
+        hst_imager_path, whdload_archives, whdloads_path, manifest, args.jobs)
+    manifest['TargetDir'] = target_dir
+    print('Sync found {0} new or changed WHDLoads'.format(len(whdload_archives)))
+
+    # stale directories can't be deleted by hst imager and are listed for manual deletion
+    if len(stale_directories) > 0:
+        print('Warning: Directories from removed or replaced WHDLoads in \'{0}\' must be deleted manually:'.format(target_dir))
+        for stale_directory in stale_directories:
+            print('- {0}'.format(stale_directory))
+
+# plan whdload files to extract with time estimated from timings of previous runs. timings of whdload files
+# extracted are recorded and used to print eta during extraction
+archives_sizes = whdload.get_whdload_archives_sizes(whdload_archives)
+plan = whdload.get_whdload_extract_plan(hst_imager_path, whdload_archives, archives_sizes, target_path,
+                                        args.continue_on_error and not args.staged,
+                                        os.path.abspath(args.staging_dir) if args.staged else None, args.jobs)
+run = timings.create_run(timings_connection, plan, timings.estimate_plan(timings_connection, plan))
+planned_archives = dict([(x['Path'], x) for x in plan if 'Path' in x])
+print('Estimated time {0}'.format(timings.format_duration(run['Estimate'])))
+
+# progress of whdload file extracted or staged index directory copied to image file, exits if dh0 partition
+# image failed
+def progress(operation, work):
+    check_dh0_partition_image()
+    if operation == 'copy staged':
+        timings.done_operation(run, timings.plan_operation(operation, None, 1, work['Size'], work['Files']),
+                               work['Time'])
+    else:
+        timings.done_operation(run, planned_archives[work['Path']], work['Time'])
+
+# progress of command in batch of commands from plan done, exits if dh0 partition image failed
+def batch_progress(index, result):
+    check_dh0_partition_image()
+    timings.done_operation(run, plan[index], result['Time'])
+
+check_dh0_partition_image()
+if args.staged:
+    # create target directory
+    shared.run_command([hst_imager_path, 'fs', 'mkdir', target_path])
+
+    # extract whdload files staged to local staging directory and copy each index directory to image
+    print('Extracting {0} WHDLoads staged using {1} jobs'.format(len(whdload_archives), args.jobs))
+    shared.set_trace_step('extract whdloads staged')
+    quarantined_archives += whdload.extract_whdload_archives_staged(
+        hst_imager_path, whdload_archives, target_path, os.path.abspath(args.staging_dir),
+        shared.parse_size(args.staging_budget), args.jobs, watchdog_timeout=args.watchdog_timeout,
+        retries=args.retries, continue_on_error=args.continue_on_error, progress=progress)
+elif args.continue_on_error:
+    # create target directory
+    shared.run_command([hst_imager_path, 'fs', 'mkdir', target_path])
+
+    # extract each whdload file by it's own hst imager process, so failed whdload files can be quarantined
+    print('Extracting {0} WHDLoads isolated'.format(len(whdload_archives)))
+    shared.set_trace_step('extract whdloads isolated')
+    quarantined_archives += whdload.extract_whdload_archives_isolated(
+        hst_imager_path, whdload_archives, target_path, args.watchdog_timeout, args.retries, progress)
+else:
+    # run batch of commands from plan creating target and index directories and extracting whdloads in one
+    # hst imager process
+    print('Extracting {0} WHDLoads'.format(len(whdload_archives)))
+    shared.set_trace_step('extract whdloads')
+    shared.run_batch_commands([x['Commands'] for x in plan], progress=batch_progress)
+
+# record timings of extraction
+timings.flush_run(run)
+if timings_connection is not None:
+    timings_connection.close()
+
+# write quarantine and remove quarantined whdload files from manifest and verify, so they are extracted again
+# by next sync
+quarantine_path = args.quarantine if args.quarantine else '{0}.quarantine.json'.format(image_path)
+whdload.write_whdload_quarantine(quarantine_path, quarantined_archives)
+quarantined_paths = set([x['Path'] for x in quarantined_archives])
+if args.sync:
+    for whdload_archive in [x for x in whdload_archives if x['Path'] in quarantined_paths]:
+        manifest['Archives'].pop(whdload_archive['RelativePath'], None)
+selected_archives = [x for x in selected_archives if not x['Path'] in quarantined_paths]
+
+# print quarantine summary, exit if all whdload files are quarantined
+extracted = len([x for x in whdload_archives if not x['Path'] in quarantined_paths])
+if len(quarantined_archives) > 0:
+    print('Extracted {0} WHDLoads, {1} quarantined in \'{2}\':'.format(
+        extracted, len(quarantined_archives), quarantine_path))
+    for quarantined_archive in quarantined_archives:
+        print('- {0}: {1} attempts{2}'.format(quarantined_archive['Filename'], quarantined_archive['Attempts'],
+                                              ', timed out' if quarantined_archive['TimedOut'] else ''))
+    if extracted == 0:
+        print('Error: All WHDLoads failed to extract')
+        if args.sync:
+            whdload.write_whdload_manifest(manifest_path, manifest)
+        exit(1)
+
+# write manifest of extracted whdload files
+if args.sync:
+    whdload.write_whdload_manifest(manifest_path, manifest)
+    if args.manifest_in_image:
+        shared.run_command([hst_imager_path, 'fs', 'copy', manifest_path, target_path, '--force'])
+
+# import dh0 and dh1 partition images into image file, when dh0 partition image is done. timing of dh0 partition
+# image is recorded
+if partition_images is not None:
+    concurrent.futures.wait([dh0_future])
+    check_dh0_partition_image()
+    timings_connection = timings.open_timings()
+    timings.record_timings(timings_connection, 'create dh0 partition image', [(1, dh0_size, 0, dh0_future.result())])
+    if timings_connection is not None:
+        timings_connection.close()
+    shared.import_partition_images(hst_imager_path, image_path, partition_images, use_pfs3, file_system_adf_path)
+    target_path = os.path.join(*[image_path, 'rdb'] + target_dir.split('/'))
+
+# verify extracted whdload files in image file
+if args.verify:
+    shared.set_trace_step('verify image')
+    report = verify.verify_whdload_archives(hst_imager_path, target_path, selected_archives, True,
+                                            args.verify_sample, args.jobs, args.verify_seed,
+                                            os.path.dirname(os.path.abspath(image_path)))
+    verify.print_verify_report(report)
+    if args.verify_report:
+        verify.write_verify_reports(args.verify_report, [report])
+    if not verify.is_verify_report_ok(report):
+        print('Error: Image file \'{0}\' doesn\'t match WHDLoads'.format(image_path))
+        exit(1)
+
+# optimize and compress image file
+if args.optimize or args.compress:
+    shared.set_trace_step('publish image')
+    artifacts.publish_image(hst_imager_path, image_path, args.artifacts_dir, args.compress, args.optimize,
+                            args.compress_jobs)
 
-# create target directory
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(*[image_path, 'rdb'] + target_dir.split('/'))])
+# watch whdloads directory and extract new and changed whdload files in batches until stopped. whdload files
+# found, when started, are known and index dirs extracted to are not created again. whdload files selected, when
+# started, are extracted and new whdload files are selected together with them using duplicate policy
+if args.watch:
+    known_archives = dict([(x['Path'], (x['Size'], x['Mtime'])) for x in found_archives])
+    extracted_archives = dict([(x['Path'], x) for x in selected_archives])
+    created_index_dirs = set([x['IndexDir'] for x in whdload_archives] +
+                             ([x['IndexDir'] for x in manifest['Archives'].values()] if args.sync else []))
+    observed_archives = {}
+    watcher = watch.open_watcher(whdloads_path, args.watch_poll)
+    print('Watching \'{0}\' for new WHDLoads {1}, press Ctrl+C to stop'.format(
+        whdloads_path, 'by polling' if watch.is_polling(watcher) else 'with inotify'))
+    shared.set_trace_step('watch whdloads')
+    try:
+        while True:
+            # wait for changes, directory is scanned again after settle seconds, if whdload files are not stable
+            watch.wait_for_changes(watcher, args.watch_settle if observed_archives else None, args.watch_interval)
+            try:
+                watched_archives = [x for x in whdload.find_whdload_archives(whdloads_path)
+                                    if known_archives.get(x['Path']) != (x['Size'], x['Mtime'])]
+            except OSError:
+                continue
+            watched_archives = watch.get_stable_files(watched_archives, observed_archives, args.watch_settle)
+            if len(watched_archives) == 0:
+                continue
+            for whdload_archive in watched_archives:
+                known_archives[whdload_archive['Path']] = (whdload_archive['Size'], whdload_archive['Mtime'])
 
-index_dirs_created = {}
+            # select new whdload files together with extracted whdload files using duplicate policy, so new
+            # whdload files identical to or superseded by extracted whdload files are skipped. extracted whdload
+            # files superseded by new whdload files are reported as their files are not deleted. extracted whdload
+            # files removed from whdloads directory can't be compared and are not selected
+            watched_paths = set([x['Path'] for x in watched_archives])
+            (selected_watched_archives, skipped_archives) = whdload.select_whdload_archives(
+                [x for x in extracted_archives.values() if not x['Path'] in watched_paths and
+                 os.path.isfile(x['Path'])] + watched_archives, args.duplicates, args.jobs)
+            watched_archives = [x for x in selected_watched_archives if x['Path'] in watched_paths]
+            for (whdload_archive, reason) in skipped_archives:
+                if whdload_archive['Path'] in watched_paths:
+                    print('Skipping duplicate WHDLoad {0}: {1}'.format(whdload_archive['Filename'], reason))
+                else:
+                    print('Warning: Extracted WHDLoad {0} is {1}, files not replaced must be deleted manually'.format(
+                        whdload_archive['Filename'], reason))
+                    del extracted_archives[whdload_archive['Path']]
+            watch_quarantined_archives = []
+            if args.continue_on_error:
+                archives_entries = whdloadindex.get_whdload_archives_entries(hst_imager_path, watched_archives,
+                                                                            args.jobs)
+                watch_quarantined_archives = [whdload.get_quarantined_whdload_archive(x, 'Failed to list WHDLoad file')
+                                              for x in watched_archives if archives_entries[x['Path']] is None]
+                watched_archives = [x for x in watched_archives if archives_entries[x['Path']] is not None]
 
-# find .lha and .zip files and extract each to image
-for root, directories, filenames in os.walk(whdloads_path):
-    for filename in filenames:
-        # skip, if filename doesn't end with .lha or .zip
-        if not (filename.endswith(".lha") or filename.endswith(".lzx") or filename.endswith(".zip")):
-            continue
+            # only extract whdload files changed since synced. watched whdload files are a subset of whdload files
+            # in manifest, so stale directories are not updated
+            if args.sync:
+                (watched_archives, watched_manifest_archives) = whdload.get_changed_whdload_archives(
+                    hst_imager_path, watched_archives, whdloads_path, manifest, args.jobs)
+                manifest['Archives'].update(watched_manifest_archives)
+            if len(watched_archives) + len(watch_quarantined_archives) == 0:
+                continue
 
-        index_dir = filename[0].upper()
-        if re.search(r'^[0-9]', index_dir):
-            index_dir = '0'
+            # extract new whdload files, timings are recorded
+            print('Extracting {0} new WHDLoads'.format(len(watched_archives)))
+            timings_connection = timings.open_timings()
+            plan = whdload.get_whdload_extract_plan(
+                hst_imager_path, watched_archives, whdload.get_whdload_archives_sizes(watched_archives), target_path,
+                args.continue_on_error, None, args.jobs, created_index_dirs)
+            run = timings.create_run(timings_connection, plan, timings.estimate_plan(timings_connection, plan))
+            planned_archives = dict([(x['Path'], x) for x in plan if 'Path' in x])
+            failed_paths = set()
+            if args.continue_on_error:
+                watch_quarantined_archives += whdload.extract_whdload_archives_isolated(
+                    hst_imager_path, watched_archives, target_path, args.watchdog_timeout, args.retries, progress)
+            else:
+                results = shared.run_batch_commands([x['Commands'] for x in plan], False, lambda index, result:
+                                                    timings.done_operation(run, plan[index], result['Time']))
 
-        whdload_file = os.path.join(root, filename)
+                # whdload files failed are extracted again, when changed, and skipped are extracted by next batch
+                for (operation, result) in zip(plan, results):
+                    if result['Status'] == 'Done':
+                        continue
+                    if 'Path' in operation:
+                        failed_paths.add(operation['Path'])
+                    if 'IndexDir' in operation:
+                        created_index_dirs.discard(operation['IndexDir'])
+                    if 'Path' in operation and result['Status'] == 'Skipped':
+                        del known_archives[operation['Path']]
+                    if 'Path' in operation and args.sync:
+                        manifest['Archives'].pop(os.path.relpath(operation['Path'], whdloads_path).replace('\\', '/'),
+                                                 None)
+            timings.flush_run(run)
+            if timings_connection is not None:
+                timings_connection.close()
 
-        print(filename)
+            # new whdload files extracted are selected together with whdload files found by next batch
+            failed_paths.update([x['Path'] for x in watch_quarantined_archives])
+            for whdload_archive in [x for x in watched_archives if not x['Path'] in failed_paths]:
+                extracted_archives[whdload_archive['Path']] = whdload_archive
 
-        # create index directory, if not created
-        if not index_dir in index_dirs_created:
-            shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(*[image_path, 'rdb'] + target_dir.split('/') + [index_dir])])
-            index_dirs_created[index_dir] = True
+            # write quarantine and manifest of extracted whdload files
+            if len(watch_quarantined_archives) > 0:
+                print('Quarantined {0} new WHDLoads in \'{1}\''.format(len(watch_quarantined_archives), quarantine_path))
+                quarantined_archives += watch_quarantined_archives
+                whdload.write_whdload_quarantine(quarantine_path, quarantined_archives)
+                if args.sync:
+                    for quarantined_archive in watch_quarantined_archives:
+                        manifest['Archives'].pop(os.path.relpath(quarantined_archive['Path'], whdloads_path)
+                                                 .replace('\\', '/'), None)
+            if args.sync:
+                whdload.write_whdload_manifest(manifest_path, manifest)
+                if args.manifest_in_image:
+                    shared.run_command([hst_imager_path, 'fs', 'copy', manifest_path, target_path, '--force'])
+    except KeyboardInterrupt:
+        print('Stopped watching \'{0}\''.format(whdloads_path))
+    finally:
+        watch.close_watcher(watcher)
 
-        # extract whdload file to image file
-        shared.run_command([hst_imager_path, 'fs', 'extract', whdload_file, os.path.join(*[image_path, 'rdb'] + target_dir.split('/') + [index_dir]), '--quiet', '--force'])
+# exit with partial success, if whdload files are quarantined
+if len(quarantined_archives) > 0:
+    print('Done with {0} quarantined WHDLoads'.format(len(quarantined_archives)))
+    exit(2)
 
 print('Done')
@@ -0,0 +1,124 @@
+﻿# Icon Layout
+# -----------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script with shared functions to update positions and drawer windows of AmigaOS icons
+# from an icon layout table in one pass. Icons are patched directly in .info files and Hst Amiga
+# is only used for icons, which can't be patched.
+
+"""Icon Layout"""
+
+import os
+import struct
+import shared
+
+# disk object magic and offsets of current x, current y, drawer data and drawer window
+# left edge, top edge, width and height in .info files
+disk_object_magic = 0xe310
+current_x_offset = 58
+current_y_offset = 62
+drawer_data_offset = 66
+drawer_window_offset = 78
+
+# icon layout options and hst amiga icon update arguments
+icon_layout_options = [
+    ('X', '-x'),
+    ('Y', '-y'),
+    ('DrawerX', '-dx'),
+    ('DrawerY', '-dy'),
+    ('DrawerWidth', '-dw'),
+    ('DrawerHeight', '-dh')
+]
+
+# amigaos icon layout shared by amigaos versions with icon paths relative to partition
+amigaos_icon_layout = {
+    'Prefs.info': { 'X': 12, 'Y': 20 },
+    'Prefs/Printer.info': { 'X': 160, 'Y': 48 },
+    'Utilities.info': { 'X': 98, 'Y': 4 },
+    'Utilities/Clock.info': { 'X': 91, 'Y': 11 },
+    'Tools.info': { 'X': 98, 'Y': 38 },
+    'System.info': { 'X': 184, 'Y': 4 },
+    'WBStartup.info': { 'X': 184, 'Y': 38 },
+    'Devs.info': { 'X': 270, 'Y': 4 },
+    'Storage.info': { 'X': 270, 'Y': 38, 'DrawerX': 480, 'DrawerY': 77, 'DrawerWidth': 107, 'DrawerHeight': 199 },
+    'Expansion.info': { 'X': 356, 'Y': 20 },
+    'Disk.info': { 'DrawerX': 28, 'DrawerY': 29, 'DrawerWidth': 452, 'DrawerHeight': 93 }
+}
+
+# amigaos icon layouts of amigaos versions, which are added to or replace shared amigaos icon layout
+amigaos_version_icon_layouts = {
+    '3.1': {
+        'Utilities/MultiView.info': { 'X': 7, 'Y': 4 },
+        'Tools/IconEdit.info': { 'X': 111, 'Y': 4 },
+        'Tools/Commodities/Blanker.info': { 'X': 8, 'Y': 84 },
+        'Tools/Commodities/ClickToFront.info': { 'X': 99, 'Y': 4 },
+        'Tools/Commodities/CrossDOS.info': { 'X': 99, 'Y': 44 },
+        'Tools/Commodities/Exchange.info': { 'X': 8, 'Y': 4 },
+        'Tools/Commodities/FKey.info': { 'X': 99, 'Y': 84 },
+        'Storage/Monitors.info': { 'X': 10, 'Y': 106, 'DrawerX': 480, 'DrawerY': 77, 'DrawerWidth': 107,
+                                   'DrawerHeight': 199 },
+        'Storage/Printers.info': { 'X': 10, 'Y': 140, 'DrawerX': 480, 'DrawerY': 77, 'DrawerWidth': 107,
+                                   'DrawerHeight': 199 }
+    },
+    '3.2': {
+        'Utilities/MultiView.info': { 'X': 11, 'Y': 11 },
+        'Tools/IconEdit.info': { 'X': 111, 'Y': 45 },
+        'Tools/HDToolBox.info': { 'X': 202, 'Y': 4 },
+        'System.info': { 'X': 184, 'Y': 4, 'DrawerHeight': 150 },
+        'Storage.info': { 'X': 270, 'Y': 38, 'DrawerX': 480, 'DrawerY': 77, 'DrawerWidth': 110, 'DrawerHeight': 199 },
+        'Storage/Monitors.info': { 'DrawerX': 156, 'DrawerY': 77, 'DrawerWidth': 270, 'DrawerHeight': 199 },
+        'Storage/Printers.info': { 'DrawerX': 480, 'DrawerY': 77, 'DrawerWidth': 107, 'DrawerHeight': 199 },
+        'Disk.info': { 'DrawerX': 28, 'DrawerY': 29, 'DrawerWidth': 462, 'DrawerHeight': 103 }
+    }
+}
+
+# get amigaos icon layout for amigaos version
+def get_amigaos_icon_layout(version):
+    """Get AmigaOS Icon Layout"""
+    icon_layout = dict(amigaos_icon_layout)
+    icon_layout.update(amigaos_version_icon_layouts.get(version, {}))
+    return icon_layout
+
+# patch icon, current x, current y and drawer window are updated in .info file.
+# returns false, if icon is not a disk object or has no drawer data to update drawer window
+def patch_icon(icon_path, layout):
+    """Patch Icon"""
+    if not os.path.isfile(icon_path):
+        return False
+    with open(icon_path, 'rb') as file:
+        data = bytearray(file.read())
+    if len(data) < drawer_window_offset or struct.unpack_from('>H', data, 0)[0] != disk_object_magic:
+        return False
+
+    has_drawer_data = struct.unpack_from('>I', data, drawer_data_offset)[0] != 0 and \
+        len(data) >= drawer_window_offset + 8
+    if not has_drawer_data and any([x.startswith('Drawer') for x in layout]):
+        return False
+
+    if 'X' in layout:
+        struct.pack_into('>i', data, current_x_offset, layout['X'])
+    if 'Y' in layout:
+        struct.pack_into('>i', data, current_y_offset, layout['Y'])
+    for index, option in enumerate(['DrawerX', 'DrawerY', 'DrawerWidth', 'DrawerHeight']):
+        if option in layout:
+            struct.pack_into('>h', data, drawer_window_offset + index * 2, layout[option])
+
+    with open(icon_path, 'wb') as file:
+        file.write(data)
+    return True
+
+# update icons in path from icon layout. icons, which can't be patched, are updated with hst amiga
+def update_icons(hst_amiga_path, icons_path, icon_layout):
+    """Update Icons"""
+    patched = 0
+    for (icon_relative_path, layout) in icon_layout.items():
+        icon_path = os.path.join(icons_path, *icon_relative_path.split('/'))
+        if patch_icon(icon_path, layout):
+            patched = patched + 1
+            continue
+        shared.run_command([hst_amiga_path, 'icon', 'update', icon_path] +
+                           [str(x) for option in icon_layout_options if option[0] in layout
+                            for x in [option[1], layout[option[0]]]])
+    print('Updated {0} icons, {1} patched directly'.format(len(icon_layout), patched))
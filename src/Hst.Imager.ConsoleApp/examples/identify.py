@@ -0,0 +1,345 @@
+﻿# Identify
+# --------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script with shared functions to identify Kickstart rom and AmigaOS adf files
+# in directories for example scripts. Roms are identified by crc32 and adfs by sha1 digests of known adf
+# files. Adfs only matching by volume name are candidates, which must be confirmed before used, unless
+# candidate is unambiguous and accepted without prompt.
+
+"""Identify"""
+
+import hashlib
+import json
+import mmap
+import os
+import platform
+import re
+import stat
+import sys
+import tempfile
+import threading
+import zlib
+import concurrent.futures
+
+# kickstart roms identified by crc32 of decrypted rom, id is filename used by example scripts
+kickstart_roms = [
+    {
+        'Id': 'amiga-os-120.rom',
+        'Name': 'Amiga 500 Kickstart 1.2',
+        'Crc32': 'a6ce1636'
+    },
+    {
+        'Id': 'amiga-os-130.rom',
+        'Name': 'Amiga 500 Kickstart 1.3',
+        'Crc32': 'c4f0f55f'
+    },
+    {
+        'Id': 'amiga-os-310-a600.rom',
+        'Name': 'Amiga 600 Kickstart 3.1',
+        'Crc32': 'fc24ae0d'
+    },
+    {
+        'Id': 'amiga-os-310-a1200.rom',
+        'Name': 'Amiga 1200 Kickstart 3.1',
+        'Crc32': '1483a091'
+    },
+    {
+        'Id': 'amiga-os-310-a4000.rom',
+        'Name': 'Amiga 4000 Kickstart 3.1',
+        'Crc32': 'd6bae334'
+    }
+]
+
+# amigaos adfs identified as candidates by volume name, id is filename used by example scripts and group is
+# amigaos version. amigaos 3.x adfs are used for amigaos 3.1.4 and 3.2+ install and workbench disks
+amigaos_adfs = [
+    { 'Id': 'amiga-os-310-install.adf', 'VolumeName': r'^Install3\.1$', 'Group': '3.1' },
+    { 'Id': 'amiga-os-310-workbench.adf', 'VolumeName': r'^Workbench3\.1$', 'Group': '3.1' },
+    { 'Id': 'amiga-os-310-extras.adf', 'VolumeName': r'^Extras3\.1$', 'Group': '3.1' },
+    { 'Id': 'amiga-os-310-locale.adf', 'VolumeName': r'^Locale$', 'Group': '3.1' },
+    { 'Id': 'amiga-os-310-fonts.adf', 'VolumeName': r'^Fonts$', 'Group': '3.1' },
+    { 'Id': 'amiga-os-310-storage.adf', 'VolumeName': r'^Storage3\.1$', 'Group': '3.1' },
+    { 'Id': 'amigaos-3.x-install.adf', 'VolumeName': r'^Install3\.(1\.4|2)', 'Group': '3.x' },
+    { 'Id': 'amigaos-3.x-workbench.adf', 'VolumeName': r'^Workbench3\.(1\.4|2)', 'Group': '3.x' },
+    { 'Id': 'Install3.2.adf', 'VolumeName': r'^Install3\.2', 'Group': '3.2' },
+    { 'Id': 'Workbench3.2.adf', 'VolumeName': r'^Workbench3\.2', 'Group': '3.2' },
+    { 'Id': 'Extras3.2.adf', 'VolumeName': r'^Extras3\.2', 'Group': '3.2' },
+    { 'Id': 'Classes3.2.adf', 'VolumeName': r'^Classes3\.2', 'Group': '3.2' },
+    { 'Id': 'Fonts.adf', 'VolumeName': r'^Fonts$', 'Group': '3.2' },
+    { 'Id': 'Storage3.2.adf', 'VolumeName': r'^Storage3\.2', 'Group': '3.2' },
+    { 'Id': 'DiskDoctor.adf', 'VolumeName': r'^DiskDoctor', 'Group': '3.2' },
+    { 'Id': 'MMULibs.adf', 'VolumeName': r'^MMULibs', 'Group': '3.2' }
+]
+
+# known adf sha1 digests read from file set in environment variable in sha1sum format, one sha1 digest and id
+# per line, e.g. created with 'sha1sum amiga-os-310-workbench.adf > known-adfs.sha1' of verified adf files.
+# adfs are also known, when candidate is confirmed by user
+known_adfs_environment_variable = 'HST_IMAGER_IDENTIFY_HASHES'
+
+# cloanto encrypted rom header, encrypted rom data is xor'ed with rom key
+cloanto_rom_header = b'AMIROMTYPE1'
+
+# rom, adf and rom key sizes
+rom_sizes = [262144, 524288]
+adf_sizes = [901120, 1802240]
+rom_key_filename = 'rom.key'
+
+# maximum depth of sub directories scanned in image and script directories. directories set in environment
+# variable are scanned recursively
+default_scan_depth = 2
+
+# index version, index is identified again, if created by other version
+index_version = 2
+
+# index of identified files, each scan path is scanned once per process
+index_lock = threading.Lock()
+identified_files = {}
+scanned_paths = set()
+known_adfs = None
+
+# get index path, stored in hst imager cache directory shared by all example scripts on host
+def get_index_path():
+    """Get Index Path"""
+    if os.environ.get('HST_IMAGER_IDENTIFY_INDEX'):
+        return os.environ['HST_IMAGER_IDENTIFY_INDEX']
+    if platform.system() == 'Windows' and os.environ.get('LOCALAPPDATA'):
+        return os.path.join(os.environ['LOCALAPPDATA'], 'hst-imager', 'identify-index.json')
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'hst-imager', 'identify-index.json')
+
+# get scan paths, image directory and script directory scanned to default scan depth and directories set in
+# environment variable separated by path separator scanned recursively. returns scan path and max depth
+def get_scan_paths(image_dir):
+    """Get Scan Paths"""
+    scan_paths = [(os.path.abspath(image_dir or '.'), default_scan_depth),
+                  (os.path.dirname(os.path.abspath(sys.argv[0] or __file__)), default_scan_depth)]
+    for scan_path in os.environ.get('HST_IMAGER_IDENTIFY_PATH', '').split(os.pathsep):
+        if scan_path and os.path.isdir(scan_path):
+            scan_paths.append((os.path.abspath(scan_path), None))
+
+    # scan path set more than once is scanned recursively, if set in environment variable
+    scan_depths = {}
+    for (scan_path, max_depth) in scan_paths:
+        scan_depths[scan_path] = None if scan_depths.get(scan_path, 0) is None else max_depth
+    return list(scan_depths.items())
+
+# get known adfs, sha1 digests of known adf files and their ids
+def get_known_adfs():
+    """Get Known Adfs"""
+    global known_adfs
+    if known_adfs is not None:
+        return known_adfs
+    known_adfs = {}
+    known_adfs_path = os.environ.get(known_adfs_environment_variable)
+    if known_adfs_path and os.path.isfile(known_adfs_path):
+        with open(known_adfs_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                match = re.match(r'^([0-9a-f]{40})\s+\*?(.+)$', line.strip(), re.I)
+                if match:
+                    known_adfs.setdefault(match.group(1).lower(), []).append(os.path.basename(match.group(2)))
+    return known_adfs
+
+# get ids of identified file, adfs are identified by known sha1 digests or confirmed candidates
+def get_identified_ids(identified_file):
+    """Get Identified Ids"""
+    return identified_file['Ids'] + get_known_adfs().get(identified_file.get('Sha1'), [])
+
+# read index, index created by other version is ignored
+def read_index(index_path):
+    """Read Index"""
+    if not os.path.isfile(index_path):
+        return {}
+    try:
+        with open(index_path, 'r', encoding='utf-8') as file:
+            index = json.load(file)
+    except ValueError:
+        return {}
+    return index.get('Files', {}) if index.get('Version') == index_version else {}
+
+# write index
+def write_index(index_path, files):
+    """Write Index"""
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    (file_handle, temp_index_path) = tempfile.mkstemp(prefix='.identify-', dir=os.path.dirname(index_path))
+    with os.fdopen(file_handle, 'w', encoding='utf-8') as file:
+        json.dump({ 'Version': index_version, 'Files': files }, file, indent=2, sort_keys=True)
+    os.replace(temp_index_path, index_path)
+
+# find candidate files, files with size of rom, encrypted rom or adf and rom key files. scan paths are scanned
+# to their max depth, if set
+def find_candidate_files(scan_paths):
+    """Find Candidate Files"""
+    candidate_sizes = set(rom_sizes + [x + len(cloanto_rom_header) for x in rom_sizes] + adf_sizes)
+    candidate_files = {}
+    for (scan_path, max_depth) in scan_paths:
+        for root, directories, filenames in os.walk(scan_path):
+            # skip hidden directories like work and cache directories and directories below max depth
+            depth = 0 if root == scan_path else len(os.path.relpath(root, scan_path).split(os.sep))
+            directories[:] = [x for x in directories if not x.startswith('.') and
+                              (max_depth is None or depth < max_depth)]
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                try:
+                    file_stat = os.stat(path)
+                except OSError:
+                    continue
+                if not stat.S_ISREG(file_stat.st_mode):
+                    continue
+                if file_stat.st_size in candidate_sizes or filename.lower() == rom_key_filename:
+                    candidate_files[path] = { 'Size': file_stat.st_size, 'Mtime': file_stat.st_mtime }
+    return candidate_files
+
+# decrypt cloanto rom data using rom key
+def decrypt_rom(data, rom_key):
+    """Decrypt Rom"""
+    key = (rom_key * (len(data) // len(rom_key) + 1))[:len(data)]
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(key, 'big')).to_bytes(len(data), 'big')
+
+# get adf volume name from root block in middle of disk, block 880 for dd and 1760 for hd adf.
+# name is bcpl string at offset 432
+def get_adf_volume_name(data):
+    """Get Adf Volume Name"""
+    root_block_offset = len(data) // 512 // 2 * 512
+    name_length = min(data[root_block_offset + 432], 30)
+    return data[root_block_offset + 433:root_block_offset + 433 + name_length].decode('iso-8859-1')
+
+# identify file, rom is identified by crc32 and adf by sha1. adf ids matching volume name are candidates,
+# which are identified, when sha1 is known or candidate is confirmed. large files are memory mapped
+def identify_file(path, rom_keys):
+    """Identify File"""
+    identified_file = { 'Type': None, 'Ids': [] }
+    if os.path.basename(path).lower() == rom_key_filename:
+        identified_file['Type'] = 'RomKey'
+        return identified_file
+
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if len(data) in adf_sizes:
+            if data[0:3] != b'DOS':
+                return identified_file
+            volume_name = get_adf_volume_name(data)
+            identified_file['Type'] = 'Adf'
+            identified_file['VolumeName'] = volume_name
+            identified_file['Sha1'] = hashlib.sha1(data).hexdigest()
+            identified_file['Candidates'] = [x['Id'] for x in amigaos_adfs if re.search(x['VolumeName'], volume_name, re.I)]
+            return identified_file
+
+        # decrypt cloanto rom with rom keys, until one matches a known kickstart rom
+        if data[0:len(cloanto_rom_header)] == cloanto_rom_header:
+            for rom_key_path in rom_keys:
+                with open(rom_key_path, 'rb') as rom_key_file:
+                    crc32 = '{0:08x}'.format(zlib.crc32(decrypt_rom(data[len(cloanto_rom_header):], rom_key_file.read())))
+                ids = [x['Id'] for x in kickstart_roms if x['Crc32'] == crc32]
+                if ids:
+                    identified_file.update({ 'Type': 'Rom', 'Ids': ids, 'Crc32': crc32, 'RomKey': rom_key_path })
+                    break
+            return identified_file
+
+        crc32 = '{0:08x}'.format(zlib.crc32(data))
+        identified_file['Crc32'] = crc32
+        identified_file['Ids'] = [x['Id'] for x in kickstart_roms if x['Crc32'] == crc32]
+        identified_file['Type'] = 'Rom' if identified_file['Ids'] else None
+    return identified_file
+
+# scan paths for roms and adfs in parallel and update index. files with unchanged size and modified time
+# are not identified again
+def scan(scan_paths, jobs = None):
+    """Scan"""
+    index_path = get_index_path()
+    index = read_index(index_path)
+    candidate_files = find_candidate_files(scan_paths)
+    rom_keys = [x for x in candidate_files if os.path.basename(x).lower() == rom_key_filename]
+
+    # identify new and changed files. encrypted roms are identified again, if no rom key was found before
+    files = {}
+    changed_paths = []
+    for path, candidate_file in candidate_files.items():
+        indexed_file = index.get(path)
+        if indexed_file and indexed_file['Size'] == candidate_file['Size'] and \
+                indexed_file['Mtime'] == candidate_file['Mtime'] and \
+                (indexed_file['Type'] is not None or not rom_keys):
+            files[path] = indexed_file
+            continue
+        changed_paths.append(path)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+        for path, identified_file in zip(changed_paths, executor.map(lambda x: identify_file(x, rom_keys), changed_paths)):
+            identified_file.update(candidate_files[path])
+            files[path] = identified_file
+
+    # keep indexed files outside scan paths
+    for path, indexed_file in index.items():
+        if not path in files and os.path.isfile(path):
+            files[path] = indexed_file
+
+    write_index(index_path, files)
+    return files
+
+# get identified files, scan paths not scanned before by process are scanned first
+def get_identified_files(scan_paths):
+    """Get Identified Files"""
+    with index_lock:
+        new_scan_paths = [x for x in scan_paths if not x[0] in scanned_paths]
+        if new_scan_paths:
+            identified_files.update(scan(new_scan_paths))
+            scanned_paths.update([x[0] for x in new_scan_paths])
+        return identified_files
+
+# confirm candidate file as id, confirmed id is recorded in index, so it's not confirmed again
+def confirm_candidate_file(path, id):
+    """Confirm Candidate File"""
+    with index_lock:
+        identified_files[path]['Ids'] = identified_files[path]['Ids'] + [id]
+        index_path = get_index_path()
+        index = read_index(index_path)
+        if path in index:
+            index[path] = identified_files[path]
+            write_index(index_path, index)
+
+# find identified file path for id in files identified or, if none, candidate files. if more files match id,
+# file in directory with most other files identified as same amigaos version is preferred.
+# returns path, true if path is identified and true if candidate files are copies of one adf file
+def find_identified_file(id, files):
+    """Find Identified File"""
+    paths = sorted([x for x in files if id in get_identified_ids(files[x]) and os.path.isfile(x)])
+    identified = len(paths) > 0
+    if not identified:
+        paths = sorted([x for x in files if id in files[x].get('Candidates', []) and os.path.isfile(x)])
+    unambiguous = identified or len(set([files[x].get('Sha1') for x in paths])) == 1
+    if len(paths) <= 1:
+        return (paths[0], identified, unambiguous) if paths else (None, False, False)
+
+    group_ids = [x['Id'] for x in amigaos_adfs if x['Group'] in [y['Group'] for y in amigaos_adfs if y['Id'] == id]]
+    def siblings(path):
+        return len([x for x in files if os.path.dirname(x) == os.path.dirname(path) and x != path and
+                    [y for y in get_identified_ids(files[x]) + files[x].get('Candidates', [])
+                     if y in group_ids and y != id]])
+    return (sorted(paths, key=lambda x: -siblings(x))[0], identified, unambiguous)
+
+# copy identified file for id to destination path, encrypted roms are decrypted. image directory of destination
+# path, script directory and directories set in environment variable are scanned. candidate file is only copied,
+# if accepted by confirm with path, id and true if candidate is unambiguous. confirm records candidates confirmed
+# by user with confirm candidate file. returns true if copied
+def copy_identified_file(id, dest_path, confirm = None):
+    """Copy Identified File"""
+    files = get_identified_files(get_scan_paths(os.path.dirname(dest_path)))
+    (path, identified, unambiguous) = find_identified_file(id, files)
+    if path is None:
+        return False
+    if not identified and (confirm is None or not confirm(path, id, unambiguous)):
+        return False
+
+    identified_file = files[path]
+    with open(path, 'rb') as file:
+        data = file.read()
+    if identified_file.get('RomKey'):
+        with open(identified_file['RomKey'], 'rb') as rom_key_file:
+            data = decrypt_rom(data[len(cloanto_rom_header):], rom_key_file.read())
+
+    print('Using identified file \'{0}\' for \'{1}\''.format(path, os.path.basename(dest_path)))
+    with open(dest_path, 'wb') as file:
+        file.write(data)
+    os.chmod(dest_path, os.stat(dest_path).st_mode | stat.S_IREAD | stat.S_IWRITE | stat.S_IEXEC)
+    return True
@@ -0,0 +1,210 @@
+﻿# Imager Client
+# -------------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script with asyncio clients to run Hst Imager and Hst Amiga commands from other python
+# programs. Clients have no global state, stream output of commands as events, raise exceptions
+# instead of exiting and limit number of commands run concurrently with a semaphore. Exit event with
+# return code and time is sent, when a command exits.
+#
+# Clients are a library for embedding Hst Imager in other python programs. Example scripts only use clients
+# to find Hst Imager and Hst Amiga and list entries. Example scripts run commands with run command and run
+# batch commands in shared.py, which batch Hst Imager commands in one script process, pass output and progress
+# directly to console, trace resource usage and exit on error. Other commands are run with run, stream or
+# capture using command line arguments of Hst Imager.
+#
+# Usage:
+# import asyncio, imagerclient
+# async def build():
+#     client = imagerclient.ImagerClient(imagerclient.find_hst_imager_path('/path/to/hst-imager'), 4)
+#     await client.run(['blank', 'amiga.vhd', '4gb', '--compatible'])
+#     async for event in client.stream(['fs', 'copy', 'files', 'amiga.vhd/rdb/dh0', '--recursive']):
+#         print(event)
+#     print(await client.fs_dir('amiga.vhd/rdb/dh0', recursive=True))
+# asyncio.run(build())
+
+"""Imager Client"""
+
+import asyncio
+import json
+import os
+import re
+import time
+
+# imager error, base of errors raised by clients
+class ImagerError(Exception):
+    """Imager Error"""
+
+# tool not found error, raised if hst imager or hst amiga executable is not found
+class ToolNotFoundError(ImagerError):
+    """Tool Not Found Error"""
+    def __init__(self, path):
+        super().__init__('Tool file \'{0}\' not found'.format(path))
+        self.path = path
+
+# command error, raised if command exits with return code other than 0
+class CommandError(ImagerError):
+    """Command Error"""
+    def __init__(self, commands, return_code, output):
+        super().__init__('Command \'{0}\' failed with exit code {1}'.format(' '.join(commands), return_code))
+        self.commands = commands
+        self.return_code = return_code
+        self.output = output
+
+# output error, raised if output of command can't be parsed
+class OutputError(ImagerError):
+    """Output Error"""
+    def __init__(self, commands, message):
+        super().__init__('Command \'{0}\' returned invalid output: {1}'.format(' '.join(commands), message))
+        self.commands = commands
+
+# find tool path, last existing filename in path is used like development apps are preferred by example scripts
+def find_tool_path(path, filenames):
+    """Find Tool Path"""
+    tool_path = os.path.join(path, filenames[0])
+    for filename in filenames[1:]:
+        if os.path.isfile(os.path.join(path, filename)):
+            tool_path = os.path.join(path, filename)
+    if not os.path.isfile(tool_path):
+        raise ToolNotFoundError(tool_path)
+    return tool_path
+
+# find hst imager path
+def find_hst_imager_path(path):
+    """Find Hst Imager Path"""
+    return find_tool_path(path, ['hst.imager', 'hst.imager.exe', 'Hst.Imager.ConsoleApp',
+                                 'Hst.Imager.ConsoleApp.exe'])
+
+# find hst amiga path
+def find_hst_amiga_path(path):
+    """Find Hst Amiga Path"""
+    return find_tool_path(path, ['hst.amiga', 'hst.amiga.exe', 'Hst.Amiga.ConsoleApp', 'Hst.Amiga.ConsoleApp.exe'])
+
+# parse output line to event. progress is written by hst imager as percent complete ending with carriage return
+# and log lines have time and level, e.g. [12:00:00 INF] [CMD] fs copy
+def parse_output_line(line):
+    """Parse Output Line"""
+    progress_match = re.search(r'^\s*(\d+(?:\.\d+)?)%\s', line)
+    if progress_match:
+        return { 'Type': 'Progress', 'Percent': float(progress_match.group(1)), 'Line': line.strip() }
+    log_match = re.search(r'^\[[\d:]+ ([A-Z]{3})\] (.*)$', line)
+    if log_match:
+        command_match = re.search(r'^\[CMD\] (.*)$', log_match.group(2))
+        if command_match:
+            return { 'Type': 'Command', 'Command': command_match.group(1), 'Line': line }
+        return { 'Type': 'Log', 'Level': log_match.group(1), 'Message': log_match.group(2), 'Line': line }
+    return { 'Type': 'Output', 'Line': line }
+
+# get exit event of command started at start time
+def get_exit_event(commands, return_code, start_time):
+    """Get Exit Event"""
+    return { 'Type': 'Exit', 'Commands': commands, 'ReturnCode': return_code, 'StartTime': start_time,
+             'EndTime': time.monotonic() }
+
+# tool client, runs commands with tool executable
+class ToolClient:
+    """Tool Client"""
+
+    def __init__(self, tool_path, concurrency = None, on_event = None):
+        self.tool_path = tool_path
+        self.on_event = on_event
+        self.semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    # acquire semaphore, if concurrency is limited
+    async def __aenter__(self):
+        if self.semaphore is not None:
+            await self.semaphore.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.semaphore is not None:
+            self.semaphore.release()
+
+    # get commands with tool path
+    def get_commands(self, args):
+        """Get Commands"""
+        return [self.tool_path] + [str(x) for x in args]
+
+    # start process with stdout piped, raises tool not found error, if tool executable doesn't exist
+    async def start_process(self, commands, stderr):
+        """Start Process"""
+        try:
+            return await asyncio.create_subprocess_exec(*commands, stdout=asyncio.subprocess.PIPE, stderr=stderr)
+        except FileNotFoundError:
+            raise ToolNotFoundError(commands[0])
+
+    # stream events of command, stdout and stderr are parsed to events line by line.
+    # process is killed, if stream is cancelled or closed before command exits
+    async def stream(self, args):
+        """Stream"""
+        commands = self.get_commands(args)
+        async with self:
+            start_time = time.monotonic()
+            process = await self.start_process(commands, asyncio.subprocess.STDOUT)
+            output = []
+            try:
+                buffer = ''
+                while chunk := await process.stdout.read(4096):
+                    buffer = buffer + chunk.decode('utf-8', errors='replace')
+                    lines = re.split(r'[\r\n]', buffer)
+                    buffer = lines.pop()
+                    for line in [x for x in lines if x.strip()]:
+                        output.append(line)
+                        yield parse_output_line(line)
+                if buffer.strip():
+                    output.append(buffer)
+                    yield parse_output_line(buffer)
+                return_code = await process.wait()
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+            yield get_exit_event(commands, return_code, start_time)
+            if return_code:
+                raise CommandError(commands, return_code, '\n'.join(output))
+
+    # run command, events are passed to on event callback and output lines are returned
+    async def run(self, args):
+        """Run"""
+        output = []
+        async for event in self.stream(args):
+            if 'Line' in event:
+                output.append(event['Line'])
+            if self.on_event is not None:
+                self.on_event(event)
+        return output
+
+    # run command and capture stdout, stderr is returned in command error
+    async def capture(self, args):
+        """Capture"""
+        commands = self.get_commands(args)
+        async with self:
+            start_time = time.monotonic()
+            process = await self.start_process(commands, asyncio.subprocess.PIPE)
+            try:
+                (stdout, stderr) = await process.communicate()
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+            if self.on_event is not None:
+                self.on_event(get_exit_event(commands, process.returncode, start_time))
+            if process.returncode:
+                raise CommandError(commands, process.returncode, stderr.decode('utf-8', errors='replace'))
+            return stdout.decode('utf-8', errors='replace')
+
+# imager client, runs hst imager commands
+class ImagerClient(ToolClient):
+    """Imager Client"""
+
+    # list entries in path, entries of sub-directories are listed, if recursive
+    async def fs_dir(self, path, recursive = False):
+        """Fs Dir"""
+        args = ['fs', 'dir', path, '--format', 'json'] + (['--recursive'] if recursive else [])
+        output = await self.capture(args)
+        try:
+            return json.loads(output)['entries']
+        except (ValueError, KeyError) as error:
+            raise OutputError(self.get_commands(args), str(error))
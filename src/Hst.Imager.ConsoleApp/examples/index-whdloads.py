@@ -0,0 +1,105 @@
+﻿#!/usr/bin/env python3
+# Index WHDLoads
+# --------------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script to index entries, hash and slaves of WHDLoad .lha, .lzx and .zip files
+# recursively from a directory in a SQLite database using Hst Imager console. Extract WHDLoads
+# and WHDLoad to HDF scripts use the index to get entries of WHDLoad files without listing them again.
+#
+# Usage:
+# - index-whdloads.py whdloads: Index new and changed WHDLoad files in directory in parallel.
+# - index-whdloads.py whdloads --query summary: Print number of WHDLoads, slaves, files and sizes.
+# - index-whdloads.py whdloads --query archives: Print files, slaves and uncompressed size per WHDLoad.
+# - index-whdloads.py whdloads --query slaves: Print slaves per WHDLoad.
+# - index-whdloads.py whdloads --query clashes: Print directories extracted to same index directory
+#   by more than one WHDLoad.
+# - index-whdloads.py whdloads --query archives --json --no-scan: Print query as json without
+#   indexing WHDLoad files first.
+# - HST_IMAGER_WHDLOAD_INDEX=whdloads.sqlite index-whdloads.py whdloads: Use other index file
+#   than default index file next to download cache.
+
+"""Index WHDLoads"""
+
+import argparse
+import json
+import os
+import shared
+import whdload
+import whdloadindex
+
+# arguments
+parser = argparse.ArgumentParser(description='Index WHDLoads')
+parser.add_argument('whdloads', nargs='?',
+                    help='Directory with WHDLoad files to index.')
+parser.add_argument('--query', choices=['summary', 'archives', 'slaves', 'clashes'],
+                    help='Query indexed WHDLoad files in directory.')
+parser.add_argument('--json', action='store_true',
+                    help='Print query as json.')
+parser.add_argument('--no-scan', action='store_true',
+                    help='Query index without indexing new and changed WHDLoad files first.')
+parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                    help='Number of WHDLoad files hashed and listed in parallel (default = number of cpus).')
+shared.add_config_arguments(parser)
+args = parser.parse_args()
+shared.configure(args)
+
+# paths
+script_path = os.path.dirname(__file__)
+hst_imager_path = shared.get_hst_imager_path(script_path)
+
+# error, if whdload index is disabled
+if not whdloadindex.is_whdload_index_enabled():
+    print('Error: WHDLoad index is disabled')
+    exit(1)
+
+# select whdloads directory to index, if not set
+whdloads_path = args.whdloads or shared.select_folder_path('directory with WHDLoads to index', 'whdloads')
+
+# error, if whdloads path is not found
+if not os.path.isdir(whdloads_path):
+    print('Error: WHDLoads directory \'{0}\' doesn\'t exist'.format(whdloads_path))
+    exit(1)
+
+index_path = whdloadindex.get_whdload_index_path()
+connection = whdloadindex.open_whdload_index(index_path)
+
+# index new and changed whdload files and remove whdload files no longer in directory
+if not args.no_scan:
+    whdload_archives = whdload.find_whdload_archives(whdloads_path)
+    indexed = whdloadindex.update_whdload_index(hst_imager_path, connection, whdload_archives, args.jobs)
+    removed = whdloadindex.remove_missing_whdload_archives(connection, whdloads_path, whdload_archives)
+    if not args.query:
+        print('{0} WHDLoads indexed, {1} unchanged, {2} removed in \'{3}\''.format(
+            indexed, len(whdload_archives) - indexed, removed, index_path))
+
+# query index
+if args.query == 'summary':
+    archives = whdloadindex.query_whdload_archives(connection, whdloads_path)
+    result = {
+        'Archives': len(archives),
+        'Size': sum([x['Size'] for x in archives]),
+        'UncompressedSize': sum([x['UncompressedSize'] for x in archives]),
+        'Files': sum([x['Files'] for x in archives]),
+        'Directories': sum([x['Directories'] for x in archives]),
+        'Slaves': sum([x['Slaves'] for x in archives]),
+        'WithoutSlaves': len([x for x in archives if x['Slaves'] == 0]),
+        'Clashes': len(whdloadindex.query_whdload_clashes(connection, whdloads_path))
+    }
+    lines = ['{0}: {1}'.format(x[0], x[1]) for x in result.items()]
+elif args.query == 'archives':
+    result = whdloadindex.query_whdload_archives(connection, whdloads_path)
+    lines = ['{0}: {1} files, {2} slaves, {3} bytes'.format(x['Filename'], x['Files'], x['Slaves'],
+                                                           x['UncompressedSize']) for x in result]
+elif args.query == 'slaves':
+    result = whdloadindex.query_whdload_slaves(connection, whdloads_path)
+    lines = ['{0}: {1}'.format(x['Filename'], x['Slave']) for x in result]
+elif args.query == 'clashes':
+    result = whdloadindex.query_whdload_clashes(connection, whdloads_path)
+    lines = ['{0}: {1}'.format(x['Name'], ', '.join(x['Filenames'])) for x in result]
+connection.close()
+
+if args.query:
+    print(json.dumps(result, indent=2) if args.json else '\n'.join(lines))
@@ -12,9 +12,16 @@
 # - Hst Amiga
 # - AmigaOS 3.1 adf files
 # - AmigaOS 3.1.4+ install adf for DOS7, if creating new image with DOS7 dostype.
+#
+# Usage:
+# - install-amigaos-3.1.py: Install AmigaOS 3.1 to new or selected image file.
+# - install-amigaos-3.1.py --headless --set create_image=yes --set use_pfs3=no: Install without prompts,
+#   e.g. in CI. Answers can also be set in a TOML or JSON config file with --config or environment
+#   variables, e.g. HST_IMAGER_CREATE_IMAGE=yes.
 
 """Install AmigaOS 3.1"""
 
+import argparse
 import os
 import platform
 import stat
@@ -22,7 +29,14 @@ import re
 import shutil
 import subprocess
 import shared
+import installplan
+import iconlayout
 
+# arguments
+parser = argparse.ArgumentParser(description='Install AmigaOS 3.1')
+shared.add_config_arguments(parser)
+args = parser.parse_args()
+shared.configure(args)
 
 # paths
 current_path = os.getcwd()
@@ -63,24 +77,28 @@ amigaos_31_files = [
 shared.get_adf_files(amigaos_31_files, current_path)
 
 # confirm create image confirm 
-create_image = shared.confirm("Do you want to create a new hard disk image file?", "enter = yes")
+create_image = shared.confirm("Do you want to create a new hard disk image file?", "enter = yes", 'create_image')
 
 image_path = None
 if (create_image):
     # set image path
     image_path = os.path.join(current_path, "amigaos-3.1.vhd")
-    
-    # create 16gb image file
-    shared.create_image(hst_imager_path, image_path, '16gb')
 else:
     # select image path
-    image_path = shared.select_file_path('hard disk image file')
+    image_path = shared.select_file_path('hard disk image file', 'image_path')
     
     # error, if image path is not found
     if not os.path.isfile(image_path):
         print('Error: Image path \'{0}\' doesn\'t exist'.format(image_path))
         exit(1)
 
+# confirm resume install, if previous install to image file failed
+resume = installplan.confirm_resume(image_path)
+
+# create 16gb image file, if not resuming install
+if (create_image and not resume):
+    shared.create_image(hst_imager_path, image_path, '16gb')
+
 # amigaos 3.1 adf paths
 workbench_adf_path = os.path.join(current_path, "amiga-os-310-workbench.adf")
 locale_adf_path = os.path.join(current_path, "amiga-os-310-locale.adf")
@@ -89,79 +107,68 @@ fonts_adf_path = os.path.join(current_path, "amiga-os-310-fonts.adf")
 install_adf_path = os.path.join(current_path, "amiga-os-310-install.adf")
 storage_adf_path = os.path.join(current_path, "amiga-os-310-storage.adf")
 
+# plan of steps to extract adfs
+plan = []
+
 # extract workbench adf to image file
-shared.run_command([hst_imager_path, 'fs', 'extract', workbench_adf_path, os.path.join(image_path, 'rdb', 'dh0'), '--force'])
+plan.append(installplan.extract_step(workbench_adf_path, os.path.join(image_path, 'rdb', 'dh0')))
 
 # extract locale adf to image file
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Locale')])
-shared.run_command([hst_imager_path, 'fs', 'extract', locale_adf_path, os.path.join(image_path, 'rdb', 'dh0', 'Locale'), '--force'])
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Locale')))
+plan.append(installplan.extract_step(locale_adf_path, os.path.join(image_path, 'rdb', 'dh0', 'Locale')))
 
 # extract extras adf to image file
-shared.run_command([hst_imager_path, 'fs', 'extract', extras_adf_path, os.path.join(image_path, 'rdb', 'dh0'), '--force'])
+plan.append(installplan.extract_step(extras_adf_path, os.path.join(image_path, 'rdb', 'dh0')))
 
 # extract fonts adf to image file
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Fonts')])
-shared.run_command([hst_imager_path, 'fs', 'extract', fonts_adf_path, os.path.join(image_path, 'rdb', 'dh0', 'Fonts'), '--force'])
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Fonts')))
+plan.append(installplan.extract_step(fonts_adf_path, os.path.join(image_path, 'rdb', 'dh0', 'Fonts')))
 
 # extract install adf to image file
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Tools')])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'HDTools', 'BRU'), os.path.join(image_path, 'rdb', 'dh0', 'Tools'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'HDTools', 'HDBackup'), os.path.join(image_path, 'rdb', 'dh0', 'Tools'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'HDTools', 'HDBackup.help'), os.path.join(image_path, 'rdb', 'dh0', 'Tools'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'HDTools', 'HDToolBox'), os.path.join(image_path, 'rdb', 'dh0', 'Tools'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'HDTools', 'HDBackup.info'), os.path.join(image_path, 'rdb', 'dh0', 'Tools'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'HDTools', 'HDToolBox.info'), os.path.join(image_path, 'rdb', 'dh0', 'Tools'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'S')])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'HDTools', 'S', 'BRUtab'), os.path.join(image_path, 'rdb', 'dh0', 'S'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'HDTools', 'S', 'HDBackup.config'), os.path.join(image_path, 'rdb', 'dh0', 'S'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'L')])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'L', 'FastFileSystem'), os.path.join(image_path, 'rdb', 'dh0', 'L'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Libs')])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'Libs', '*.library'), os.path.join(image_path, 'rdb', 'dh0', 'Libs'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'Update', 'Disk.info'), os.path.join(image_path, 'rdb', 'dh0'), '--force'])
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Tools')))
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'HDTools', 'BRU'), os.path.join(image_path, 'rdb', 'dh0', 'Tools')))
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'HDTools', 'HDBackup'), os.path.join(image_path, 'rdb', 'dh0', 'Tools')))
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'HDTools', 'HDBackup.help'), os.path.join(image_path, 'rdb', 'dh0', 'Tools')))
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'HDTools', 'HDToolBox'), os.path.join(image_path, 'rdb', 'dh0', 'Tools')))
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'HDTools', 'HDBackup.info'), os.path.join(image_path, 'rdb', 'dh0', 'Tools')))
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'HDTools', 'HDToolBox.info'), os.path.join(image_path, 'rdb', 'dh0', 'Tools')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'S')))
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'HDTools', 'S', 'BRUtab'), os.path.join(image_path, 'rdb', 'dh0', 'S')))
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'HDTools', 'S', 'HDBackup.config'), os.path.join(image_path, 'rdb', 'dh0', 'S')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'L')))
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'L', 'FastFileSystem'), os.path.join(image_path, 'rdb', 'dh0', 'L')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Libs')))
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'Libs', '*.library'), os.path.join(image_path, 'rdb', 'dh0', 'Libs')))
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'Update', 'Disk.info'), os.path.join(image_path, 'rdb', 'dh0')))
 
 # extract storage adf to image file
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Storage')])
-shared.run_command([hst_imager_path, 'fs', 'extract', storage_adf_path, os.path.join(image_path, 'rdb', 'dh0', 'Storage'), '--force'])
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Storage')))
+plan.append(installplan.extract_step(storage_adf_path, os.path.join(image_path, 'rdb', 'dh0', 'Storage')))
 
-# create temp directory
+# create temp directory, temp directory from previous install is used when resuming install
 temp_path = os.path.join(current_path, 'temp')
-if os.path.exists(temp_path):
+if os.path.exists(temp_path) and not resume:
     shutil.rmtree(temp_path)
 
-os.mkdir(temp_path)
+os.makedirs(temp_path, exist_ok=True)
 
 # copy icons from image file to local directory
 icons_path = os.path.join(temp_path, 'icons')
-shared.run_command([hst_imager_path, 'fs', 'copy', os.path.join(image_path, 'rdb', 'dh0', '*.info'), icons_path, '--recursive', '--makedir', '--force'])
+plan.append(installplan.copy_step(os.path.join(image_path, 'rdb', 'dh0', '*.info'), icons_path, ['--recursive', '--makedir', '--force']))
+
+# run plan, icons are copied to temp directory
+installplan.run_plan(hst_imager_path, image_path, 'AmigaOS 3.1', plan)
+
 shutil.copyfile(os.path.join(icons_path, 'Storage', 'Printers.info'), os.path.join(icons_path, 'Storage.info'))
 
-# update icons
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Prefs.info')] + '-x 12 -y 20'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Prefs', 'Printer.info')] + '-x 160 -y 48'.split(' '))
-
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Utilities.info')] + '-x 98 -y 4'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Utilities', 'Clock.info')] + '-x 91 -y 11'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Utilities', 'MultiView.info')] + '-x 7 -y 4'.split(' '))
-
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Tools.info')] + '-x 98 -y 38'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Tools', 'IconEdit.info')] + '-x 111 -y 4'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Tools', 'Commodities', 'Blanker.info')] + '-x 8 -y 84'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Tools', 'Commodities', 'ClickToFront.info')] + '-x 99 -y 4'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Tools', 'Commodities', 'CrossDOS.info')] + '-x 99 -y 44'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Tools', 'Commodities', 'Exchange.info')] + '-x 8 -y 4'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Tools', 'Commodities', 'FKey.info')] + '-x 99 -y 84'.split(' '))
-
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'System.info')] + '-x 184 -y 4'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'WBStartup.info')] + '-x 184 -y 38'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Devs.info')] + '-x 270 -y 4'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Storage.info')] + '-x 270 -y 38 -dx 480 -dy 77 -dw 107 -dh 199'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Storage', 'Monitors.info')] + '-x 10 -y 106 -dx 480 -dy 77 -dw 107 -dh 199'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Storage', 'Printers.info')] + '-x 10 -y 140 -dx 480 -dy 77 -dw 107 -dh 199'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Expansion.info')] + '-x 356 -y 20'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Disk.info')] + '-dx 28 -dy 29 -dw 452 -dh 93'.split(' '))
+# update icons from amigaos 3.1 icon layout
+iconlayout.update_icons(hst_amiga_path, icons_path, iconlayout.get_amigaos_icon_layout('3.1'))
 
 # copy icons from local directory to image file
-shared.run_command([hst_imager_path, 'fs', 'copy', icons_path, os.path.join(image_path, 'rdb', 'dh0'), '--recursive', '--force'])
+installplan.run_plan(hst_imager_path, image_path, 'icons', [
+    installplan.copy_step(icons_path, os.path.join(image_path, 'rdb', 'dh0'), ['--recursive', '--force'])])
+
+# remove install state, all plans are done
+installplan.finish(image_path)
 
 print('Done')
@@ -11,13 +11,27 @@
 # Requirements:
 # - Hst Amiga
 # - AmigaOS 3.2 adf files
+#
+# Usage:
+# - install-amigaos-3.2.py: Install AmigaOS 3.2 to new or selected image file.
+# - install-amigaos-3.2.py --headless --set create_image=yes --set use_pfs3=no: Install without prompts,
+#   e.g. in CI. Answers can also be set in a TOML or JSON config file with --config or environment
+#   variables, e.g. HST_IMAGER_CREATE_IMAGE=yes.
 
 """Install AmigaOS 3.2"""
 
+import argparse
 import os
 import shutil
 import shared
+import installplan
+import iconlayout
 
+# arguments
+parser = argparse.ArgumentParser(description='Install AmigaOS 3.2')
+shared.add_config_arguments(parser)
+args = parser.parse_args()
+shared.configure(args)
 
 # paths
 current_path = os.getcwd()
@@ -75,168 +89,183 @@ diskdoctor_adf_path = os.path.join(current_path, "DiskDoctor.adf")
 mmulibs_adf_path = os.path.join(current_path, "MMULibs.adf")
 
 # confirm create image confirm 
-create_image = shared.confirm("Do you want to create a new hard disk image file?", "enter = yes")
+create_image = shared.confirm("Do you want to create a new hard disk image file?", "enter = yes", 'create_image')
 
 image_path = None
 if (create_image):
     # set image path
     image_path = os.path.join(current_path, "amigaos-3.2.vhd")
-    
-    # create 16gb image file
-    shared.create_image(hst_imager_path, image_path, '16gb')
 else:
     # select image path
-    image_path = shared.select_file_path('hard disk image file')
+    image_path = shared.select_file_path('hard disk image file', 'image_path')
     
     # error, if image path is not found
     if not os.path.isfile(image_path):
         print('Error: Image path \'{0}\' doesn\'t exist'.format(image_path))
         exit(1)
 
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Prefs')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive', 'Sys')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive', 'Versions')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Presets')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Presets', 'Backdrops')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Presets', 'Pointers')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Fonts')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Expansion')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'WBStartup')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Locale')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Locale', 'Catalogs')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Locale', 'Languages')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Locale', 'Countries')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Locale', 'Help')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Classes')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Classes', 'Gadgets')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Classes', 'DataTypes')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Classes', 'Images')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Devs')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Monitors')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'DataTypes')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'DOSDrivers')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Printers')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Keymaps')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Storage')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'DOSDrivers')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'Printers')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'Monitors')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'Keymaps')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'DataTypes')])
-
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Libs')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Tools')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'System')])
-
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'C')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'L')])
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'S')])
-
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'C'), os.path.join(image_path, 'rdb', 'dh0', 'C'), '--force'])
-
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'HDTools', 'hd*'), os.path.join(image_path, 'rdb', 'dh0', 'Tools'), '--force'])
-
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'Installer'), os.path.join(image_path, 'rdb', 'dh0', 'System'), '--force'])
-
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'Libs', 'workbench.library'), os.path.join(image_path, 'rdb', 'dh0', 'Libs'), '--force'])
-
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'Libs', 'icon.library'), os.path.join(image_path, 'rdb', 'dh0', 'Libs'), '--force'])
-
-# create temp directory
+# confirm resume install, if previous install to image file failed
+resume = installplan.confirm_resume(image_path)
+
+# create 16gb image file, if not resuming install
+if (create_image and not resume):
+    shared.create_image(hst_imager_path, image_path, '16gb')
+
+# plan of steps to create directories and extract adfs
+plan = []
+
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Prefs')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive', 'Sys')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive', 'Versions')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Presets')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Presets', 'Backdrops')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Presets', 'Pointers')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Fonts')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Expansion')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'WBStartup')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Locale')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Locale', 'Catalogs')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Locale', 'Languages')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Locale', 'Countries')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Locale', 'Help')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Classes')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Classes', 'Gadgets')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Classes', 'DataTypes')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Classes', 'Images')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Devs')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Monitors')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'DataTypes')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'DOSDrivers')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Printers')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Keymaps')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Storage')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'DOSDrivers')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'Printers')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'Monitors')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'Keymaps')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'DataTypes')))
+
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Libs')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'Tools')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'System')))
+
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'C')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'L')))
+plan.append(installplan.mkdir_step(os.path.join(image_path, 'rdb', 'dh0', 'S')))
+
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'C'), os.path.join(image_path, 'rdb', 'dh0', 'C')))
+
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'HDTools', 'hd*'), os.path.join(image_path, 'rdb', 'dh0', 'Tools')))
+
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'Installer'), os.path.join(image_path, 'rdb', 'dh0', 'System')))
+
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'Libs', 'workbench.library'), os.path.join(image_path, 'rdb', 'dh0', 'Libs')))
+
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'Libs', 'icon.library'), os.path.join(image_path, 'rdb', 'dh0', 'Libs')))
+
+# create temp directory, temp directory from previous install is used when resuming install
 temp_path = os.path.join(current_path, 'temp')
-if os.path.exists(temp_path):
+if os.path.exists(temp_path) and not resume:
     shutil.rmtree(temp_path)
 
 update_path = os.path.join(temp_path, 'update')
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'Update'), update_path, '--makedir', '--force'])
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'Update'), update_path, ['--makedir', '--force']))
 
 # copy fastfilesystem
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(install_adf_path, 'L', 'FastFileSystem'), os.path.join(image_path, 'rdb', 'dh0', 'L'), '--force'])
+plan.append(installplan.extract_step(os.path.join(install_adf_path, 'L', 'FastFileSystem'), os.path.join(image_path, 'rdb', 'dh0', 'L')))
 
 
 # workbench
 # ---------
 
-shared.run_command([hst_imager_path, 'fs', 'extract', workbench_adf_path, os.path.join(image_path, 'rdb', 'dh0'), '--force'])
+plan.append(installplan.extract_step(workbench_adf_path, os.path.join(image_path, 'rdb', 'dh0')))
 
 # extras
 # ------
 
 #Copy >NIL: "$amigaosdisk:~(Disk.info|S)" "SYSTEMDIR:" ALL CLONE
 #Copy >NIL: "$amigaosdisk:S/~(user-startup)" "SYSTEMDIR:S" ALL CLONE
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(extras_adf_path, '*.info'), os.path.join(image_path, 'rdb', 'dh0'), '--recursive', 'false', '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(extras_adf_path, 'L'), os.path.join(image_path, 'rdb', 'dh0', 'L'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(extras_adf_path, 'Prefs'), os.path.join(image_path, 'rdb', 'dh0', 'Prefs'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(extras_adf_path, 'System'), os.path.join(image_path, 'rdb', 'dh0', 'System'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(extras_adf_path, 'Tools'), os.path.join(image_path, 'rdb', 'dh0', 'Tools'), '--force'])
+plan.append(installplan.extract_step(os.path.join(extras_adf_path, '*.info'), os.path.join(image_path, 'rdb', 'dh0'), ['--recursive', 'false', '--force']))
+plan.append(installplan.extract_step(os.path.join(extras_adf_path, 'L'), os.path.join(image_path, 'rdb', 'dh0', 'L')))
+plan.append(installplan.extract_step(os.path.join(extras_adf_path, 'Prefs'), os.path.join(image_path, 'rdb', 'dh0', 'Prefs')))
+plan.append(installplan.extract_step(os.path.join(extras_adf_path, 'System'), os.path.join(image_path, 'rdb', 'dh0', 'System')))
+plan.append(installplan.extract_step(os.path.join(extras_adf_path, 'Tools'), os.path.join(image_path, 'rdb', 'dh0', 'Tools')))
 
 s_path = os.path.join(temp_path, 's')
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(extras_adf_path, 'S'), s_path, '--makedir', '--force'])
-os.remove(os.path.join(s_path, 'User-startup'))
+plan.append(installplan.extract_step(os.path.join(extras_adf_path, 'S'), s_path, ['--makedir', '--force']))
+
+# run plan, update and s are extracted to temp directory
+installplan.run_plan(hst_imager_path, image_path, 'AmigaOS 3.2', plan)
+plan = []
 
-shared.run_command([hst_imager_path, 'fs', 'copy', s_path, os.path.join(image_path, 'rdb', 'dh0', 'S'), '--force'])
+# remove user-startup, if not removed by previous install
+if os.path.isfile(os.path.join(s_path, 'User-startup')):
+    os.remove(os.path.join(s_path, 'User-startup'))
+
+plan.append(installplan.copy_step(s_path, os.path.join(image_path, 'rdb', 'dh0', 'S')))
 
 # classes
 # -------
 
-shared.run_command([hst_imager_path, 'fs', 'extract', classes_adf_path, os.path.join(image_path, 'rdb', 'dh0'), '--force'])
+plan.append(installplan.extract_step(classes_adf_path, os.path.join(image_path, 'rdb', 'dh0')))
 
 # fonts
 # -----
 
-shared.run_command([hst_imager_path, 'fs', 'extract', fonts_adf_path, os.path.join(image_path, 'rdb', 'dh0', 'Fonts'), '--force'])
+plan.append(installplan.extract_step(fonts_adf_path, os.path.join(image_path, 'rdb', 'dh0', 'Fonts')))
 
 # storage
 # -------
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'DataTypes.info'), os.path.join(image_path, 'rdb', 'dh0', 'Storage'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'DOSDrivers.info'), os.path.join(image_path, 'rdb', 'dh0', 'Storage'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'Keymaps.info'), os.path.join(image_path, 'rdb', 'dh0', 'Storage'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'Monitors.info'), os.path.join(image_path, 'rdb', 'dh0', 'Storage'), '--force'])
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'Printers.info'), os.path.join(image_path, 'rdb', 'dh0', 'Storage'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'DataTypes.info'), os.path.join(image_path, 'rdb', 'dh0', 'Storage')))
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'DOSDrivers.info'), os.path.join(image_path, 'rdb', 'dh0', 'Storage')))
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'Keymaps.info'), os.path.join(image_path, 'rdb', 'dh0', 'Storage')))
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'Monitors.info'), os.path.join(image_path, 'rdb', 'dh0', 'Storage')))
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'Printers.info'), os.path.join(image_path, 'rdb', 'dh0', 'Storage')))
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'Classes', 'DataTypes'), os.path.join(image_path, 'rdb', 'dh0', 'Classes', 'DataTypes'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'Classes', 'DataTypes'), os.path.join(image_path, 'rdb', 'dh0', 'Classes', 'DataTypes')))
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'C'), os.path.join(image_path, 'rdb', 'dh0', 'C'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'C'), os.path.join(image_path, 'rdb', 'dh0', 'C')))
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'DefIcons', '*.info'), os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive', 'Sys'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'DefIcons', '*.info'), os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive', 'Sys')))
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'Presets', 'Pointers'), os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Presets', 'Pointers'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'Presets', 'Pointers'), os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Presets', 'Pointers')))
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'Monitors'), os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'Monitors'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'Monitors'), os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'Monitors')))
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'DOSDrivers'), os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'DOSDrivers'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'DOSDrivers'), os.path.join(image_path, 'rdb', 'dh0', 'Storage', 'DOSDrivers')))
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'WBStartup'), os.path.join(image_path, 'rdb', 'dh0', 'WBStartup'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'WBStartup'), os.path.join(image_path, 'rdb', 'dh0', 'WBStartup')))
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'Env-Archive', 'deficons.prefs'), os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'Env-Archive', 'deficons.prefs'), os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive')))
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'Env-Archive', 'Pointer.prefs'), os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive', 'Sys'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'Env-Archive', 'Pointer.prefs'), os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive', 'Sys')))
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'Printers'), os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Printers'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'Printers'), os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Printers')))
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'Keymaps'), os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Keymaps'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'Keymaps'), os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Keymaps')))
 
-shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(storage_adf_path, 'LIBS'), os.path.join(image_path, 'rdb', 'dh0', 'Libs'), '--force'])
+plan.append(installplan.extract_step(os.path.join(storage_adf_path, 'LIBS'), os.path.join(image_path, 'rdb', 'dh0', 'Libs')))
 
 
 # finalize
 # --------
 
 # copy disk.info
-shared.run_command([hst_imager_path, 'fs', 'copy', os.path.join(update_path, 'disk.info'), os.path.join(image_path, 'rdb', 'dh0'), '--force'])
+plan.append(installplan.copy_step(os.path.join(update_path, 'disk.info'), os.path.join(image_path, 'rdb', 'dh0')))
 
 # copy release to versions
-shared.run_command([hst_imager_path, 'fs', 'copy', os.path.join(update_path, 'Release'), os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive', 'Versions'), '--recursive', '--force'])
+plan.append(installplan.copy_step(os.path.join(update_path, 'Release'), os.path.join(image_path, 'rdb', 'dh0', 'Prefs', 'Env-Archive', 'Versions'), ['--recursive', '--force']))
 
 # copy startup-sequence
 startup_harddrive_path = os.path.join(update_path, 'Startup-HardDrive')
 startup_sequence_path = os.path.join(update_path, 'Startup-sequence')
-if os.path.isfile(startup_sequence_path):
-    os.remove(startup_sequence_path)
-os.rename(startup_harddrive_path, startup_sequence_path)
-shared.run_command([hst_imager_path, 'fs', 'copy', startup_sequence_path, os.path.join(image_path, 'rdb', 'dh0', 'S'), '--force'])
+if os.path.isfile(startup_harddrive_path):
+    if os.path.isfile(startup_sequence_path):
+        os.remove(startup_sequence_path)
+    os.rename(startup_harddrive_path, startup_sequence_path)
+plan.append(installplan.copy_step(startup_sequence_path, os.path.join(image_path, 'rdb', 'dh0', 'S')))
 
 
 # clean up
@@ -244,44 +273,36 @@ shared.run_command([hst_imager_path, 'fs', 'copy', startup_sequence_path, os.pat
 
 # copy icons from image file to local directory
 icons_path = os.path.join(temp_path, 'icons')
-shared.run_command([hst_imager_path, 'fs', 'copy', os.path.join(image_path, 'rdb', 'dh0', '*.info'), icons_path, '--recursive', '--makedir', '--force'])
-
-# update icons
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Prefs.info')] + '-x 12 -y 20'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Prefs', 'Printer.info')] + '-x 160 -y 48'.split(' '))
-
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Utilities.info')] + '-x 98 -y 4'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Utilities', 'Clock.info')] + '-x 91 -y 11'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Utilities', 'MultiView.info')] + '-x 11 -y 11'.split(' '))
+plan.append(installplan.copy_step(os.path.join(image_path, 'rdb', 'dh0', '*.info'), icons_path, ['--recursive', '--makedir', '--force']))
 
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Tools.info')] + '-x 98 -y 38'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Tools', 'IconEdit.info')] + '-x 111 -y 45'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Tools', 'HDToolBox.info')] + '-x 202 -y 4'.split(' '))
-
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'System.info')] + '-x 184 -y 4 -dh 150'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'WBStartup.info')] + '-x 184 -y 38'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Devs.info')] + '-x 270 -y 4'.split(' '))
+# run plan, icons are copied to temp directory
+installplan.run_plan(hst_imager_path, image_path, 'AmigaOS 3.2 finalize', plan)
 
+# create storage icon from devs icon
 shutil.copyfile(os.path.join(icons_path, 'Devs.info'), os.path.join(icons_path, 'Storage.info'))
 
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Storage.info')] + '-x 270 -y 38 -dx 480 -dy 77 -dw 110 -dh 199'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Storage', 'Monitors.info')] + '-dx 156 -dy 77 -dw 270 -dh 199'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Storage', 'Printers.info')] + '-dx 480 -dy 77 -dw 107 -dh 199'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Expansion.info')] + '-x 356 -y 20'.split(' '))
-shared.run_command([hst_amiga_path, 'icon', 'update', os.path.join(icons_path, 'Disk.info')] + '-dx 28 -dy 29 -dw 462 -dh 103'.split(' '))
+# update icons from amigaos 3.2 icon layout
+iconlayout.update_icons(hst_amiga_path, icons_path, iconlayout.get_amigaos_icon_layout('3.2'))
 
 # copy icons from local directory to image file
-shared.run_command([hst_imager_path, 'fs', 'copy', icons_path, os.path.join(image_path, 'rdb', 'dh0'), '--recursive', '--force'])
+plan = []
+plan.append(installplan.copy_step(icons_path, os.path.join(image_path, 'rdb', 'dh0'), ['--recursive', '--force']))
 
 # copy files from disk doctor for mounting adf in amigaos
 if os.path.exists(diskdoctor_adf_path):
-    shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(diskdoctor_adf_path, 'C', 'DAControl'), os.path.join(image_path, 'rdb', 'dh0', 'C'), '--force'])
-    shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(diskdoctor_adf_path, 'Devs', 'trackfile.device'), os.path.join(image_path, 'rdb', 'dh0', 'Devs'), '--force'])
+    plan.append(installplan.extract_step(os.path.join(diskdoctor_adf_path, 'C', 'DAControl'), os.path.join(image_path, 'rdb', 'dh0', 'C')))
+    plan.append(installplan.extract_step(os.path.join(diskdoctor_adf_path, 'Devs', 'trackfile.device'), os.path.join(image_path, 'rdb', 'dh0', 'Devs')))
 
 # copy files from mmulibs
 if os.path.exists(mmulibs_adf_path):
-    shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(mmulibs_adf_path, 'C'), os.path.join(image_path, 'rdb', 'dh0', 'C'), '--force'])
-    shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(mmulibs_adf_path, 'Libs'), os.path.join(image_path, 'rdb', 'dh0', 'Libs'), '--recursive', '--force'])
-    shared.run_command([hst_imager_path, 'fs', 'extract', os.path.join(mmulibs_adf_path, 'Locale'), os.path.join(image_path, 'rdb', 'dh0', 'Locale'), '--recursive', '--force'])
+    plan.append(installplan.extract_step(os.path.join(mmulibs_adf_path, 'C'), os.path.join(image_path, 'rdb', 'dh0', 'C')))
+    plan.append(installplan.extract_step(os.path.join(mmulibs_adf_path, 'Libs'), os.path.join(image_path, 'rdb', 'dh0', 'Libs'), ['--recursive', '--force']))
+    plan.append(installplan.extract_step(os.path.join(mmulibs_adf_path, 'Locale'), os.path.join(image_path, 'rdb', 'dh0', 'Locale'), ['--recursive', '--force']))
+
+# run plan to copy icons and optional files
+installplan.run_plan(hst_imager_path, image_path, 'icons', plan)
+
+# remove install state, all plans are done
+installplan.finish(image_path)
 
 print('Done')
@@ -0,0 +1,472 @@
+﻿# Install Plan
+# ------------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script with shared functions to run install plans of mkdir, extract and copy steps
+# for example scripts. Plans are optimized, cached and resumed at the step a previous run failed.
+# Extracts from adf files are staged from cached adf directories and copied to image file.
+
+"""Install Plan"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import shared
+import adfcache
+import timings
+
+# install plan version, cached plans and states of other versions are ignored
+install_plan_version = 1
+
+# create mkdir step
+def mkdir_step(target):
+    """Mkdir Step"""
+    return { 'Type': 'Mkdir', 'Target': target }
+
+# create extract step
+def extract_step(source, target, options = None):
+    """Extract Step"""
+    return { 'Type': 'Extract', 'Source': source, 'Target': target,
+             'Options': options if options is not None else ['--force'] }
+
+# create copy step
+def copy_step(source, target, options = None):
+    """Copy Step"""
+    return { 'Type': 'Copy', 'Source': source, 'Target': target,
+             'Options': options if options is not None else ['--force'] }
+
+# get step commands
+def get_step_commands(hst_imager_path, step):
+    """Get Step Commands"""
+    if step['Type'] == 'Mkdir':
+        return [hst_imager_path, 'fs', 'mkdir', step['Target']]
+    return [hst_imager_path, 'fs', step['Type'].lower(), step['Source'], step['Target']] + step['Options']
+
+# get image parts, lower case path components in image file or none, if path is not in image file
+def get_image_parts(image_path, path):
+    """Get Image Parts"""
+    if not path.startswith(image_path + os.sep):
+        return None
+    return tuple([x.lower() for x in path[len(image_path) + 1:].split(os.sep)])
+
+# split adf path into adf file path and path components in adf or none, if path is not in adf file
+def split_adf_path(path):
+    """Split Adf Path"""
+    parts = path.split(os.sep)
+    for i in range(len(parts) - 1):
+        if parts[i].lower().endswith('.adf'):
+            return (os.sep.join(parts[:i + 1]), parts[i + 1:])
+    return (None, None)
+
+# is parent or same path, if path components starts with parent path components
+def is_parent_or_same(parent_parts, parts):
+    """Is Parent Or Same"""
+    return parent_parts is not None and parts is not None and parts[:len(parent_parts)] == parent_parts
+
+# is overlapping path, if one path is parent or same as other path
+def is_overlapping(parts1, parts2):
+    """Is Overlapping"""
+    return is_parent_or_same(parts1, parts2) or is_parent_or_same(parts2, parts1)
+
+# is step writing to path components in image file
+def is_writing_to(image_path, step, parts):
+    """Is Writing To"""
+    return is_overlapping(get_image_parts(image_path, step['Target']), parts)
+
+# remove duplicate and subsumed extract steps.
+# extract is subsumed by previous extract of parent source to same parent target with same options,
+# if no steps in between write to target
+def remove_redundant_extract_steps(image_path, steps):
+    """Remove Redundant Extract Steps"""
+    optimized_steps = []
+    for step in steps:
+        target_parts = get_image_parts(image_path, step['Target'])
+        redundant = False
+        if step['Type'] == 'Extract' and target_parts is not None:
+            for previous_step in reversed(optimized_steps):
+                if previous_step['Type'] == 'Extract' and previous_step['Options'] == step['Options'] and \
+                        not '*' in previous_step['Source']:
+                    source_prefix = previous_step['Source'] + os.sep
+                    relative_source = '' if previous_step['Source'] == step['Source'] else \
+                        step['Source'][len(source_prefix):] if step['Source'].startswith(source_prefix) else None
+                    relative_parts = tuple([x.lower() for x in relative_source.split(os.sep) if x]) \
+                        if relative_source is not None and not '*' in relative_source else None
+                    previous_target_parts = get_image_parts(image_path, previous_step['Target'])
+                    if relative_parts is not None and previous_target_parts is not None and \
+                            previous_target_parts + relative_parts == target_parts:
+                        redundant = True
+                        break
+
+                # stop, if previous step writes to target
+                if is_writing_to(image_path, previous_step, target_parts):
+                    break
+        if not redundant:
+            optimized_steps.append(step)
+    return optimized_steps
+
+# get extract merge key, extracts of files in same adf directory to same target with same options can be merged
+def get_extract_merge_key(step):
+    """Get Extract Merge Key"""
+    if step['Type'] != 'Extract' or '*' in step['Source'] or '--recursive' in step['Options']:
+        return None
+    (adf_path, adf_parts) = split_adf_path(step['Source'])
+    if adf_path is None:
+        return None
+    return (adf_path, tuple(adf_parts[:-1]), step['Target'], tuple(step['Options']))
+
+# get merge pattern, common prefix and suffix of names with wildcard in between
+def get_merge_pattern(names):
+    """Get Merge Pattern"""
+    lower_names = [x.lower() for x in names]
+    prefix = os.path.commonprefix(lower_names)
+    suffix = os.path.commonprefix([x[::-1] for x in lower_names])[::-1]
+    suffix = suffix[max(0, len(prefix) + len(suffix) - min([len(x) for x in lower_names])):]
+    return names[0][:len(prefix)] + '*' + (names[0][len(names[0]) - len(suffix):] if suffix else '')
+
+# merge extract steps of files in same adf directory to same target into extract steps using wildcard patterns.
+# patterns are only used, if they match exactly the merged files in adf directory listed with hst imager
+def merge_extract_steps(hst_imager_path, steps):
+    """Merge Extract Steps"""
+    optimized_steps = []
+    position = 0
+    while position < len(steps):
+        merge_key = get_extract_merge_key(steps[position])
+        end = position + 1
+        while merge_key is not None and end < len(steps) and get_extract_merge_key(steps[end]) == merge_key:
+            end = end + 1
+
+        # add step, if no consecutive steps can be merged
+        if end - position < 2:
+            optimized_steps.append(steps[position])
+            position = end
+            continue
+
+        # list names in adf directory
+        run_steps = steps[position:end]
+        position = end
+        (adf_path, adf_parts) = split_adf_path(run_steps[0]['Source'])
+        entry_names = [re.split(r'[\\/]', x['name'])[-1].lower() for x in shared.get_entries(
+            hst_imager_path, os.path.join(*[adf_path] + adf_parts[:-1]), False)]
+
+        # group names by first letter and merge groups, where pattern matches exactly names in group
+        groups = {}
+        for step in run_steps:
+            name = os.path.basename(step['Source'])
+            groups.setdefault(name[0].lower(), []).append(step)
+        for group_steps in [[x for x in run_steps]] + list(groups.values()):
+            names = [os.path.basename(x['Source']) for x in group_steps]
+            if len(names) < 2 or not all([x in run_steps for x in group_steps]):
+                continue
+            pattern = get_merge_pattern(names)
+            regex = re.compile('^{0}$'.format(re.escape(pattern.lower()).replace('\\*', '.*')))
+            if sorted([x for x in entry_names if regex.match(x)]) != sorted(set([x.lower() for x in names])):
+                continue
+            optimized_steps.append(extract_step(os.path.join(os.path.dirname(group_steps[0]['Source']), pattern),
+                                                group_steps[0]['Target'], ['--recursive', 'false'] + group_steps[0]['Options']))
+            run_steps = [x for x in run_steps if not x in group_steps]
+        optimized_steps.extend(run_steps)
+    return optimized_steps
+
+# remove redundant mkdir steps. mkdir creates parent directories and directories created by mkdir are
+# created by first extract or copy to them using makedir, so only mkdir steps of empty directories are kept
+def remove_redundant_mkdir_steps(image_path, steps):
+    """Remove Redundant Mkdir Steps"""
+
+    # directories created by mkdir steps and their parent directories
+    mkdir_parts = set()
+    for step in steps:
+        parts = get_image_parts(image_path, step['Target'])
+        if step['Type'] == 'Mkdir' and parts is not None:
+            mkdir_parts.update([parts[:i] for i in range(1, len(parts) + 1)])
+
+    optimized_steps = []
+    existing_parts = set()
+    for index, step in enumerate(steps):
+        parts = get_image_parts(image_path, step['Target'])
+
+        # partition root directories, e.g. rdb/dh0 always exist
+        if parts is None or len(parts) <= 2:
+            optimized_steps.append(step)
+            continue
+
+        if step['Type'] == 'Mkdir':
+            # skip mkdir, if directory exists or is created by a following step
+            if parts in existing_parts or \
+                    any([is_parent_or_same(parts, get_image_parts(image_path, x['Target'])) and
+                         get_image_parts(image_path, x['Target']) in mkdir_parts for x in steps[index + 1:]]):
+                continue
+        elif parts in mkdir_parts and not parts in existing_parts and not '--makedir' in step['Options']:
+            # create directory with extract or copy using makedir
+            step = dict(step)
+            step['Options'] = step['Options'] + ['--makedir']
+
+        optimized_steps.append(step)
+        if step['Type'] == 'Mkdir' or '--makedir' in step['Options']:
+            existing_parts.update([parts[:i] for i in range(1, len(parts) + 1)])
+    return optimized_steps
+
+# optimize plan, steps are kept in order as extracts and copies overwrite files from previous steps
+def optimize_plan(hst_imager_path, image_path, steps):
+    """Optimize Plan"""
+    steps = remove_redundant_extract_steps(image_path, steps)
+    steps = merge_extract_steps(hst_imager_path, steps)
+    return remove_redundant_mkdir_steps(image_path, steps)
+
+# get plan cache path, shared by all example scripts on host
+def get_plan_cache_path():
+    """Get Plan Cache Path"""
+    if os.environ.get('HST_IMAGER_PLAN_CACHE'):
+        return os.environ['HST_IMAGER_PLAN_CACHE']
+    return os.path.join(os.path.dirname(shared.get_download_cache_path()), 'plans')
+
+# get plan key, hash of steps, adf files used by steps and install plan script optimizing steps
+def get_plan_key(steps):
+    """Get Plan Key"""
+    key = hashlib.sha256()
+    key.update('{0}|{1}'.format(install_plan_version, json.dumps(steps, sort_keys=True)).encode('utf-8'))
+    adf_paths = set([split_adf_path(x['Source'])[0] for x in steps if 'Source' in x])
+    for path in sorted([x for x in adf_paths if x is not None]) + [os.path.abspath(__file__)]:
+        if os.path.isfile(path):
+            key.update('|{0}|{1}|{2}'.format(path, os.path.getsize(path), os.stat(path).st_mtime_ns).encode('utf-8'))
+    return key.hexdigest()
+
+# write json file, json is written to temp file and replaced to avoid partial files
+def write_json_file(path, data):
+    """Write Json File"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    (file_handle, temp_path) = tempfile.mkstemp(prefix='.install-plan-', dir=directory)
+    with os.fdopen(file_handle, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=2)
+    os.replace(temp_path, path)
+
+# read json file, returns none, if file doesn't exist, is invalid or of other install plan version
+def read_json_file(path):
+    """Read Json File"""
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    except ValueError:
+        return None
+    return data if data.get('Version') == install_plan_version else None
+
+# get plan, optimized plan is read from plan cache, if cached. otherwise steps are optimized and cached
+def get_plan(hst_imager_path, image_path, steps):
+    """Get Plan"""
+    key = get_plan_key(steps)
+    cached_plan_path = os.path.join(get_plan_cache_path(), '{0}.json'.format(key))
+    cached_plan = read_json_file(cached_plan_path)
+    if cached_plan is not None:
+        return (key, cached_plan['Steps'])
+
+    optimized_steps = optimize_plan(hst_imager_path, image_path, steps)
+    write_json_file(cached_plan_path, { 'Version': install_plan_version, 'Steps': optimized_steps })
+    return (key, optimized_steps)
+
+# get options from step options
+def get_step_options(options):
+    """Get Step Options"""
+    step_options = { 'Recursive': False, 'MakeDir': False }
+    for index, option in enumerate(options):
+        value = options[index + 1].lower() != 'false' if index + 1 < len(options) and \
+            options[index + 1].lower() in ['true', 'false'] else True
+        if option == '--recursive':
+            step_options['Recursive'] = value
+        elif option == '--makedir':
+            step_options['MakeDir'] = value
+    return step_options
+
+# get local source of step, cached adf directory and amiga path components for adf sources and
+# local directory and path components for local sources. returns none, if source can't be staged
+def get_step_source(hst_imager_path, image_path, step, cached_adf_paths):
+    """Get Step Source"""
+    source = step['Source']
+    if get_image_parts(image_path, source) is not None:
+        return None
+
+    (adf_path, adf_parts) = split_adf_path(source)
+    if adf_path is None and source.lower().endswith('.adf') and os.path.isfile(source):
+        (adf_path, adf_parts) = (source, [])
+    if adf_path is not None:
+        if not adf_path in cached_adf_paths:
+            cached_adf_paths[adf_path] = adfcache.get_cached_adf_path(hst_imager_path, adf_path) \
+                if os.path.isfile(adf_path) else None
+        if cached_adf_paths[adf_path] is None:
+            return None
+        return (cached_adf_paths[adf_path], adf_parts)
+
+    if '*' in os.path.dirname(source) or not os.path.exists(os.path.dirname(source) if '*' in source else source):
+        return None
+    return (os.path.dirname(source), [os.path.basename(source)])
+
+# stage plan, runs of steps extracting adf files or copying local files to image file are staged
+# in local staging directory next to image file and replaced with a recursive copy to each partition.
+# extracts from adf files to local directories are done from cached adf directories without hst imager.
+# steps, which can't be staged, are kept and end staging of steps before them
+def stage_plan(hst_imager_path, image_path, steps):
+    """Stage Plan"""
+    remove_staging(image_path)
+    staging_path = get_staging_path(image_path)
+
+    staged_steps = []
+    cached_adf_paths = {}
+    uae_fsdbs = {}
+    partitions = []
+    local_written = False
+
+    def flush():
+        for partition in partitions:
+            staged_steps.append(copy_step(
+                partition['Path'], partition['Target'], ['--recursive', '--makedir', '--force']))
+        partitions.clear()
+
+    for step in steps:
+        target_parts = get_image_parts(image_path, step['Target'])
+        staged = False
+
+        # get partition staging directory, partition is first two path components in image file, e.g. rdb/dh0
+        partition = None
+        if target_parts is not None and len(target_parts) >= 2:
+            partition_target = os.sep.join([image_path] + step['Target'][len(image_path) + 1:].split(os.sep)[:2])
+            partition = next(iter([x for x in partitions if x['Target'].lower() == partition_target.lower()]), None)
+            if partition is None:
+                partition = { 'Path': os.path.join(staging_path, str(len(staged_steps) + len(partitions))),
+                              'Target': partition_target }
+            target_relative_parts = step['Target'][len(image_path) + 1:].split(os.sep)[2:]
+
+        if step['Type'] == 'Mkdir' and partition is not None:
+            os.makedirs(partition['Path'], exist_ok=True)
+            staged = adfcache.make_local_dir(uae_fsdbs, partition['Path'], target_relative_parts) is not None
+        elif step['Type'] in ['Extract', 'Copy'] and (target_parts is None or partition is not None):
+            source = get_step_source(hst_imager_path, image_path, step, cached_adf_paths)
+            is_local_source = source is not None and split_adf_path(step['Source'])[0] is None and \
+                not step['Source'].lower().endswith('.adf')
+            if source is not None and not (local_written and (is_local_source or target_parts is None)):
+                options = get_step_options(step['Options'])
+                if partition is not None:
+                    os.makedirs(partition['Path'], exist_ok=True)
+                    target_exists = len(target_relative_parts) == 0 or \
+                        adfcache.resolve_local_path(uae_fsdbs, partition['Path'], target_relative_parts) is not None
+                    staged = adfcache.stage_step(uae_fsdbs, source, partition['Path'], target_relative_parts,
+                                                 options, target_exists, True)
+                elif os.path.isdir(os.path.dirname(step['Target'])) or options['MakeDir']:
+                    staged = adfcache.stage_step(uae_fsdbs, source, os.path.dirname(step['Target']),
+                                                 [os.path.basename(step['Target'])], options,
+                                                 os.path.isdir(step['Target']), False)
+
+        if staged:
+            if partition is not None and not partition in partitions:
+                partitions.append(partition)
+            continue
+
+        # keep step, which can't be staged, after copies of staged partitions
+        flush()
+        staged_steps.append(step)
+        if target_parts is None:
+            local_written = True
+    flush()
+
+    # write changed uae fsdb files in staging and local directories
+    for (dir_path, nodes) in uae_fsdbs.items():
+        if os.path.isdir(dir_path):
+            adfcache.write_uae_fsdb(dir_path, nodes)
+    return staged_steps
+
+# get staging path, staging directory for image file is next to image file
+def get_staging_path(image_path):
+    """Get Staging Path"""
+    return '{0}.staging'.format(image_path)
+
+# remove staging directory for image file
+def remove_staging(image_path):
+    """Remove Staging"""
+    staging_path = get_staging_path(image_path)
+    if os.path.exists(staging_path):
+        shutil.rmtree(staging_path)
+
+# get state path, state of plans run for image file is stored next to image file
+def get_state_path(image_path):
+    """Get State Path"""
+    return '{0}.install-state.json'.format(image_path)
+
+# confirm resume install, if state from previous failed install of image file exists.
+# state is removed, if not resumed
+def confirm_resume(image_path):
+    """Confirm Resume"""
+    state_path = get_state_path(image_path)
+    if not os.path.isfile(state_path):
+        return False
+    if os.path.isfile(image_path) and read_json_file(state_path) is not None and \
+            shared.confirm("Do you want to resume install from previous run?", "enter = yes", 'resume'):
+        return True
+    os.remove(state_path)
+    return False
+
+# run plan, steps done by previous run of plan for image file are skipped.
+# number of steps done is stored in state and exits, if a step fails. time of plan is estimated and timings of
+# steps done are recorded by step type
+def run_plan(hst_imager_path, image_path, name, steps):
+    """Run Plan"""
+    shared.set_trace_step('{0} plan'.format(name))
+    (key, plan_steps) = get_plan(hst_imager_path, image_path, steps)
+
+    # stage plan, state of staged plan is stored separately as staged plan has other steps
+    if adfcache.is_adf_cache_enabled():
+        key = '{0}-staged'.format(key)
+        plan_steps = stage_plan(hst_imager_path, image_path, plan_steps)
+
+    state_path = get_state_path(image_path)
+    state = read_json_file(state_path) or { 'Version': install_plan_version, 'Plans': {} }
+    done = state['Plans'].get(key, 0)
+
+    if done >= len(plan_steps):
+        print('Skipping {0} plan, done in previous run'.format(name))
+        return
+    if done > 0:
+        print('Resuming {0} plan at step {1}/{2}'.format(name, done + 1, len(plan_steps)))
+    elif len(plan_steps) < len(steps):
+        print('Running {0} plan with {1} steps optimized from {2} steps'.format(name, len(plan_steps), len(steps)))
+    else:
+        print('Running {0} plan with {1} steps'.format(name, len(plan_steps)))
+
+    # estimate time of steps from timings of previous runs
+    timings_connection = timings.open_timings()
+    operations = [timings.plan_operation('install {0}'.format(x['Type'].lower()), get_step_commands(hst_imager_path, x))
+                  for x in plan_steps[done:]]
+    run = timings.create_run(timings_connection, operations, timings.estimate_plan(timings_connection, operations))
+    print('Estimated time {0}'.format(timings.format_duration(run['Estimate'])))
+
+    results = shared.run_batch_commands(
+        [x['Commands'] for x in operations], False,
+        lambda index, result: timings.done_operation(run, operations[index], result['Time']))
+    timings.flush_run(run)
+    if timings_connection is not None:
+        timings_connection.close()
+
+    # update state with number of steps done
+    for result in results:
+        if result['Status'] != 'Done':
+            break
+        done = done + 1
+    state['Plans'][key] = done
+    write_json_file(state_path, state)
+
+    # exit, if plan failed
+    if done < len(plan_steps):
+        print('Error: {0} plan failed, run again to resume at step {1}/{2}'.format(name, done + 1, len(plan_steps)))
+        exit(1)
+
+# finish plans, state is removed when all plans for image file are done
+def finish(image_path):
+    """Finish"""
+    state_path = get_state_path(image_path)
+    if os.path.isfile(state_path):
+        os.remove(state_path)
+    remove_staging(image_path)
@@ -8,6 +8,8 @@
 
 """Shared"""
 
+import asyncio
+import atexit
 import os
 import platform
 import re
@@ -15,15 +17,147 @@ import stat
 import shutil
 import subprocess
 import sys
+import tempfile
+import time
 import codecs
+import hashlib
+import json
+import threading
+import concurrent.futures
 import unicodedata
-from urllib.request import urlretrieve
+import identify
+import imagerclient
+from http.client import HTTPException
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+# fcntl is used to clone files using reflink and lock files and is not available on windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# msvcrt is used to lock files on windows
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# tomllib is used to read toml config files and is available from python 3.11
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
 
 # globals
 is_initialized = False
 use_dialog = False
 platform_system = ''
 
+# answers to prompts from config file and command line arguments and headless mode. answers are indexed by
+# prompt key, e.g. create_image, and can also be set with environment variables, e.g. HST_IMAGER_CREATE_IMAGE
+config_answers = {}
+argument_answers = {}
+config_headless = False
+
+# get answer key from name, lower case with words separated by underscore, e.g. Install3.2.adf = install3_2_adf
+def get_answer_key(name):
+    """Get Answer Key"""
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+# read config file, toml files are read with tomllib and other files as json
+def read_config_file(config_path):
+    """Read Config File"""
+    if not os.path.isfile(config_path):
+        print('Error: Config file \'{0}\' not found'.format(config_path))
+        exit(1)
+    try:
+        if os.path.splitext(config_path)[1].lower() == '.toml':
+            if tomllib is None:
+                print('Error: Toml config file \'{0}\' requires python 3.11+, use json config file'.format(config_path))
+                exit(1)
+            with open(config_path, 'rb') as file:
+                return tomllib.load(file)
+        with open(config_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except ValueError as error:
+        print('Error: Invalid config file \'{0}\': {1}'.format(config_path, error))
+        exit(1)
+
+# add config arguments to argument parser of example script
+def add_config_arguments(parser):
+    """Add Config Arguments"""
+    parser.add_argument('--config', default=os.environ.get('HST_IMAGER_CONFIG'),
+                        help='TOML or JSON config file with answers to prompts, e.g. create_image = true. Tables named '
+                        'by script, e.g. [extract-whdloads], have answers only used by that script.')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='Answer to prompt, e.g. --set image_path=amiga.vhd. Overrides environment variables and '
+                        'config file.')
+    parser.add_argument('--headless', action='store_true',
+                        help='Never show dialogs or prompts and exit with error, if a prompt has no answer.')
+
+# configure answers to prompts and headless mode from config arguments
+def configure(args):
+    """Configure"""
+    global config_answers
+    global argument_answers
+    global config_headless
+
+    config = read_config_file(args.config) if args.config else {}
+    script_name = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    config_answers = dict([(get_answer_key(x[0]), x[1]) for x in config.items() if not isinstance(x[1], dict)])
+    config_answers.update([(get_answer_key(x[0]), x[1]) for x in config.get(script_name, {}).items()])
+    config_headless = args.headless or parse_answer_bool('headless', config_answers.pop('headless', False))
+
+    for argument in args.set:
+        if not '=' in argument:
+            print('Error: Invalid answer \'{0}\', answer must be KEY=VALUE'.format(argument))
+            exit(1)
+        (key, value) = argument.split('=', 1)
+        argument_answers[get_answer_key(key)] = value
+
+# is headless, prompts are never shown and dialog is not used
+def is_headless():
+    """Is Headless"""
+    return config_headless or re.search(r'^(1|y|yes|true)$', os.environ.get('HST_IMAGER_HEADLESS', ''), re.I) is not None
+
+# get answer to prompt from command line arguments, environment variables or config file. returns none, if not set
+def get_answer(key):
+    """Get Answer"""
+    if key is None:
+        return None
+    if key in argument_answers:
+        return argument_answers[key]
+    environment_variable = 'HST_IMAGER_{0}'.format(key.upper())
+    if environment_variable in os.environ:
+        return os.environ[environment_variable]
+    return config_answers.get(key)
+
+# get prompt answer, exits if headless and prompt has no answer
+def get_prompt_answer(key, message):
+    """Get Prompt Answer"""
+    answer = get_answer(key)
+    if answer is None and is_headless():
+        if key is None:
+            print('Error: No answer to \'{0}\' in headless mode'.format(message))
+        else:
+            print('Error: No answer to \'{0}\' in headless mode, set answer with --set {1}=..., HST_IMAGER_{2} or '
+                  '{1} in config file'.format(message, key, key.upper()))
+        exit(1)
+    return answer
+
+# parse answer as yes or no
+def parse_answer_bool(key, answer):
+    """Parse Answer Bool"""
+    if isinstance(answer, bool):
+        return answer
+    if re.search(r'^(1|y|yes|true)$', str(answer).strip(), re.I):
+        return True
+    if re.search(r'^(0|n|no|false)$', str(answer).strip(), re.I):
+        return False
+    print('Error: Invalid answer \'{0}\' for {1}, answer must be yes or no'.format(answer, key))
+    exit(1)
+
 # init
 def init():
     global is_initialized
@@ -43,7 +177,10 @@ def init():
     is_initialized = True
 
 # confirm
-def confirm(message, action):
+def confirm(message, action, key = None):
+    answer = get_prompt_answer(key, message)
+    if answer is not None:
+        return parse_answer_bool(key, answer)
     init()
     if platform_system == 'Darwin':
         return re.search(r'yes$', run_command_capture_output(['osascript', '-e', 'display dialog "{0}" buttons {{"Yes", "No"}} default button "Yes"'.format(message)]).strip(), re.I)
@@ -53,7 +190,10 @@ def confirm(message, action):
         return re.search(r'^(|y|yes)$', input("{0} ({1}): ".format(message, action)), re.I)
 
 # input box
-def input_box(message):
+def input_box(message, key = None):
+    answer = get_prompt_answer(key, message)
+    if answer is not None:
+        return str(answer).strip()
     init()
     if platform_system == 'Darwin':
         text_match = re.search(r'text[^:]*:(.*)$', run_command_capture_output(['osascript', '-e', 'display dialog "{0}" default answer "" buttons {{"OK", "Cancel"}} default button "OK"'.format(message)]).strip(), re.I)
@@ -74,7 +214,10 @@ def macos_choose_folder_dialog(title):
     return run_command_capture_output(['osascript', '-e', 'set directory to POSIX path of (choose folder with prompt "{0}" default location (path to desktop))'.format(title)]).strip()
 
 # select file path
-def select_file_path(title):
+def select_file_path(title, key = None):
+    answer = get_prompt_answer(key, 'Select {0}'.format(title))
+    if answer is not None:
+        return os.path.abspath(str(answer))
     init()
     if platform_system == 'Darwin':
         return macos_choose_file_dialog("Select {0}".format(title))
@@ -84,7 +227,10 @@ def select_file_path(title):
         return os.path.abspath(input("Enter path to {0}: ".format(title)))
 
 # select folder path
-def select_folder_path(title):
+def select_folder_path(title, key = None):
+    answer = get_prompt_answer(key, 'Select {0}'.format(title))
+    if answer is not None:
+        return os.path.abspath(str(answer))
     init()
     if platform_system == 'Darwin':
         return macos_choose_folder_dialog("Select {0}".format(title))
@@ -93,16 +239,236 @@ def select_folder_path(title):
     else:
         return os.path.abspath(input("Enter path to {0}: ".format(title)))
 
+# trace of commands run, enabled by setting trace file path in environment variable.
+# trace is written as chrome trace json, which can be opened in perfetto or chrome://tracing
+trace_path = os.environ.get('HST_IMAGER_TRACE')
+trace_lock = threading.Lock()
+trace_events = []
+trace_step = None
+trace_thread_steps = threading.local()
+trace_start_time = time.monotonic()
+
+# interactive commands, which are not traced as they wait for user input
+untraced_commands = ['dialog', 'osascript']
+
+# set trace step, label added to traced commands run by thread until next step is set. step set by main thread
+# is used by threads, which haven't set a step, like worker threads extracting whdloads
+def set_trace_step(step):
+    """Set Trace Step"""
+    global trace_step
+    trace_thread_steps.step = step
+    if threading.current_thread() is threading.main_thread():
+        trace_step = step
+
+# get trace step of thread
+def get_trace_step():
+    """Get Trace Step"""
+    return getattr(trace_thread_steps, 'step', trace_step)
+
+# is traced, if tracing is enabled and command is not interactive
+def is_traced(commands):
+    """Is Traced"""
+    return trace_path is not None and trace_path != '' and \
+        not os.path.basename(commands[0]).lower() in untraced_commands
+
+# get command type, executable name and sub commands, e.g. hst.imager fs extract
+def get_command_type(commands):
+    """Get Command Type"""
+    command_type = [re.sub(r'\.exe$', '', os.path.basename(commands[0]), flags=re.I)]
+    for command in commands[1:4]:
+        if not re.search(r'^[a-z]+$', command):
+            break
+        command_type.append(command)
+    return ' '.join(command_type)
+
+# read process io from proc, bytes read and written by process and it's children.
+# returns empty, if proc is not supported
+def read_process_io(pid):
+    """Read Process IO"""
+    io_path = '/proc/{0}/io'.format(pid)
+    try:
+        with open(io_path, 'r') as file:
+            io = dict([line.split(':') for line in file.read().splitlines() if ':' in line])
+    except OSError:
+        return {}
+    return {
+        'ReadBytes': int(io.get('rchar', 0)),
+        'WriteBytes': int(io.get('wchar', 0)),
+        'DiskReadBytes': int(io.get('read_bytes', 0)),
+        'DiskWriteBytes': int(io.get('write_bytes', 0))
+    }
+
+# wait for process and get resource usage of process and it's children, if supported by os.
+# process is waited for without reaping it to read io from proc before it's reaped by wait4
+def wait_process(process):
+    """Wait Process"""
+    if not hasattr(os, 'wait4'):
+        process.wait()
+        return {}
+
+    usage = {}
+    if hasattr(os, 'waitid'):
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        usage = read_process_io(process.pid)
+    (pid, status, rusage) = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    # max rss is kilobytes on linux and bytes on macos
+    usage['UserTime'] = rusage.ru_utime
+    usage['SystemTime'] = rusage.ru_stime
+    usage['CpuTime'] = rusage.ru_utime + rusage.ru_stime
+    usage['PeakRss'] = rusage.ru_maxrss * (1 if platform.system() == 'Darwin' else 1024)
+    return usage
+
+# add trace event of command started at start time
+def add_trace_event(commands, start_time, end_time, args):
+    """Add Trace Event"""
+    event = {
+        'name': get_command_type(commands),
+        'cat': get_trace_step() or 'command',
+        'ph': 'X',
+        'ts': int((start_time - trace_start_time) * 1000000),
+        'dur': int((end_time - start_time) * 1000000),
+        'pid': os.getpid(),
+        'tid': threading.get_native_id(),
+        'args': dict({ 'Step': get_trace_step(), 'Commands': commands }, **args)
+    }
+    with trace_lock:
+        if len(trace_events) == 0:
+            atexit.register(write_trace)
+        trace_events.append(event)
+
+# format trace time and size
+def format_trace_usage(args):
+    """Format Trace Usage"""
+    usage = []
+    if 'CpuTime' in args:
+        usage.append('cpu {0:.1f}s'.format(args['CpuTime']))
+    if 'PeakRss' in args:
+        usage.append('rss {0:.0f}mb'.format(args['PeakRss'] / (1024 * 1024)))
+    if 'ReadBytes' in args:
+        usage.append('read {0:.1f}mb'.format(args['ReadBytes'] / (1024 * 1024)))
+        usage.append('written {0:.1f}mb'.format(args['WriteBytes'] / (1024 * 1024)))
+    return ', '.join(usage)
+
+# write trace and print summary of slowest commands and total time per command type
+def write_trace():
+    """Write Trace"""
+    with trace_lock:
+        events = list(trace_events)
+    with open(trace_path, 'w', encoding='utf-8') as file:
+        json.dump({ 'traceEvents': events, 'displayTimeUnit': 'ms' }, file)
+
+    print('Trace of {0} commands written to \'{1}\''.format(len(events), trace_path))
+    print('Slowest commands:')
+    for event in sorted(events, key=lambda x: x['dur'], reverse=True)[:10]:
+        usage = format_trace_usage(event['args'])
+        print('- {0:.1f}s {1}{2}: {3}'.format(event['dur'] / 1000000, event['name'],
+                                               ' ({0})'.format(usage) if usage else '',
+                                               ' '.join(event['args']['Commands'][1:])))
+
+    # total time per command type, commands run by script are included in script and own command type
+    print('Time per command type:')
+    command_types = {}
+    for event in events:
+        command_type = command_types.setdefault(event['name'], { 'Count': 0, 'Time': 0, 'CpuTime': 0.0 })
+        command_type['Count'] = command_type['Count'] + 1
+        command_type['Time'] = command_type['Time'] + event['dur']
+        command_type['CpuTime'] = command_type['CpuTime'] + event['args'].get('CpuTime', 0.0)
+    for name, command_type in sorted(command_types.items(), key=lambda x: x[1]['Time'], reverse=True):
+        print('- {0}: {1} commands, {2:.1f}s, cpu {3:.1f}s'.format(
+            name, command_type['Count'], command_type['Time'] / 1000000, command_type['CpuTime']))
+
+# trace client event, commands run by imager clients are traced when they exit
+def trace_client_event(event):
+    """Trace Client Event"""
+    if event['Type'] == 'Exit' and is_traced(event['Commands']):
+        add_trace_event(event['Commands'], event['StartTime'], event['EndTime'], { 'ReturnCode': event['ReturnCode'] })
+
+# read process output, stderr is read in a thread while stdout is read to avoid filling pipes
+def read_process_output(process):
+    """Read Process Output"""
+    stderr = []
+    thread = None
+    if process.stderr is not None:
+        thread = threading.Thread(target=lambda: stderr.append(process.stderr.read()))
+        thread.start()
+    stdout = process.stdout.read() if process.stdout is not None else None
+    if thread is not None:
+        thread.join()
+    for pipe in [process.stdout, process.stderr]:
+        if pipe is not None:
+            pipe.close()
+    return (stdout, stderr[0] if thread is not None else None)
+
+# run process, process is traced with resource usage, if tracing is enabled. commands are run with subprocess
+# instead of imager clients, so output is written directly to console and resource usage is traced
+def run_process(commands, stdout = None, stderr = None):
+    """Run Process"""
+    start_time = time.monotonic()
+    process = subprocess.Popen(commands, bufsize=-1, text=True, stdout=stdout, stderr=stderr)
+
+    if not is_traced(commands):
+        (output, error) = process.communicate()
+        return (process.returncode, output, error)
+
+    (output, error) = read_process_output(process)
+    usage = wait_process(process)
+    add_trace_event(commands, start_time, time.monotonic(), dict({ 'ReturnCode': process.returncode }, **usage))
+    return (process.returncode, output, error)
+
+# run process with watchdog, process is killed, if it stops making progress for timeout seconds. progress is
+# output written by process or bytes read and written by process, if proc is supported. returns return code,
+# output with stderr and if process was killed by watchdog
+def run_process_watchdog(commands, timeout, poll_interval = 1.0):
+    """Run Process Watchdog"""
+    start_time = time.monotonic()
+    process = subprocess.Popen(commands, bufsize=-1, text=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    # read output in a thread, so watchdog can check progress while process is running
+    output = []
+    progress_times = [start_time]
+    def read_output():
+        for line in process.stdout:
+            output.append(line)
+            progress_times.append(time.monotonic())
+    thread = threading.Thread(target=read_output, daemon=True)
+    thread.start()
+
+    # kill process, if no output is written and no bytes are read or written for timeout seconds
+    io = read_process_io(process.pid)
+    killed = False
+    while thread.is_alive():
+        thread.join(poll_interval)
+        process_io = read_process_io(process.pid)
+        if process_io != io:
+            io = process_io
+            progress_times.append(time.monotonic())
+        if timeout and thread.is_alive() and time.monotonic() - progress_times[-1] > timeout:
+            process.kill()
+            killed = True
+            thread.join()
+    process.stdout.close()
+
+    usage = {}
+    if is_traced(commands):
+        usage = wait_process(process)
+        add_trace_event(commands, start_time, time.monotonic(),
+                        dict({ 'ReturnCode': process.returncode, 'Killed': killed }, **usage))
+    else:
+        process.wait()
+    return (process.returncode, ''.join(output), killed)
+
 # run command
 def run_command(commands):
     """Run command"""
 
-    # process to run commands
-    process = subprocess.run(commands)
+    # process to run commands, output is written to console
+    (returncode, stdout, stderr) = run_process(commands)
 
     # return, if return code is not 0
-    if process.returncode:
-        print(stderr)
+    if returncode:
+        print('Error: Command \'{0}\' failed with exit code {1}'.format(' '.join(commands), returncode))
         exit(1)
 
 # run command capture error code
@@ -110,87 +476,190 @@ def run_command_capture_error_code(commands):
     """Run command capture error code"""
 
     # process to run commands
-    process = subprocess.Popen(commands, bufsize=-1, text=True,
-        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-    # get stdout and stderr from process
-    (stdout, stderr) = process.communicate()
+    (returncode, stdout, stderr) = run_process(commands, subprocess.DEVNULL, subprocess.DEVNULL)
 
     # return error code
-    return process.returncode
+    return returncode
 
 # run command and capture output
 def run_command_capture_output(commands):
     """Run command capture output"""
 
     # process to run commands
-    process = subprocess.Popen(commands, bufsize=-1, text=True,
-                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    # get stdout and stderr from process
-    (stdout, stderr) = process.communicate()
+    (returncode, stdout, stderr) = run_process(commands, subprocess.PIPE, subprocess.PIPE)
 
     # return, if return code is not 0
-    if process.returncode:
+    if returncode:
         print(stderr)
         exit(1)
 
     return stdout
 
-# get hst imager path
+# quote script argument
+def quote_script_argument(argument):
+    """Quote Script Argument"""
+
+    # quote argument, if empty or contains whitespace
+    if argument == '' or re.search(r'\s', argument):
+        return '"{0}"'.format(argument)
+
+    return argument
+
+# is script command
+def is_script_command(commands):
+    """Is Script Command"""
+
+    # script lines can't contain quotes, line breaks or nested scripts
+    if len(commands) < 2 or commands[1] == 'script':
+        return False
+    return not any(re.search(r'["\r\n]', command) for command in commands[1:])
+
+# run script commands, progress is called with index and result of each command done. process is killed, if
+# progress exits before script is done
+def run_script_commands(batch_commands, progress = None):
+    """Run Script Commands"""
+
+    results = [{ 'Commands': commands, 'Status': 'Skipped', 'Time': 0.0 } for commands in batch_commands]
+
+    # write commands to script file, executable is implicit in script lines
+    (script_fd, script_path) = tempfile.mkstemp(prefix='hst-imager-batch-', suffix='.txt')
+    with os.fdopen(script_fd, 'w', encoding='utf-8') as script_file:
+        for commands in batch_commands:
+            script_file.write(' '.join([quote_script_argument(command) for command in commands[1:]]) + '\n')
+
+    process = None
+    try:
+        # process to run script
+        script_commands = [batch_commands[0][0], 'script', script_path]
+        script_start_time = time.monotonic()
+        process = subprocess.Popen(script_commands, bufsize=1, text=True,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+        # track operation started for each command logged by script
+        index = -1
+        start_time = script_start_time
+        for line in process.stdout:
+            print(line, end='')
+            cmd_match = re.search(r'\[CMD\] (.*)$', line.rstrip())
+            if not cmd_match or cmd_match.group(1).startswith('script '):
+                continue
+            now = time.monotonic()
+            if index >= 0:
+                results[index]['Status'] = 'Done'
+                results[index]['Time'] = now - start_time
+                if progress is not None:
+                    progress(index, results[index])
+            index = index + 1
+            start_time = now
+            if index < len(results):
+                results[index]['Status'] = 'Running'
+                results[index]['StartTime'] = now
+
+        # wait for script, resource usage is only read when traced
+        usage = {}
+        if is_traced(script_commands):
+            usage = wait_process(process)
+        else:
+            process.wait()
+    finally:
+        if process is not None and process.returncode is None:
+            process.kill()
+            process.wait()
+        os.remove(script_path)
+
+    # set status of last started operation, first operation failed if script failed before starting any
+    index = max(index, 0) if process.returncode else index
+    if 0 <= index < len(results):
+        results[index]['Status'] = 'Failed' if process.returncode else 'Done'
+        results[index]['Time'] = time.monotonic() - start_time
+        results[index].setdefault('StartTime', start_time)
+        if progress is not None and not process.returncode:
+            progress(index, results[index])
+
+    # trace script and each operation run by script
+    if is_traced(script_commands):
+        add_trace_event(script_commands, script_start_time, time.monotonic(),
+                        dict({ 'ReturnCode': process.returncode, 'Operations': len(batch_commands) }, **usage))
+        for result in [x for x in results if 'StartTime' in x]:
+            add_trace_event(result['Commands'], result['StartTime'], result['StartTime'] + result['Time'],
+                            { 'Status': result['Status'] })
+
+    return (process.returncode, results)
+
+# run batch commands, results are returned instead of exiting, if a command fails and not exit on error.
+# progress is called with index and result of each command done
+def run_batch_commands(batch_commands, exit_on_error = True, progress = None):
+    """Run Batch Commands"""
+
+    results = []
+
+    # run consecutive hst imager commands in one script, other commands one at a time
+    position = 0
+    while position < len(batch_commands):
+        commands = batch_commands[position]
+
+        end = position
+        while end < len(batch_commands) and is_script_command(batch_commands[end]) and \
+                batch_commands[end][0] == commands[0]:
+            end = end + 1
+
+        if end - position > 1:
+            (returncode, script_results) = run_script_commands(
+                batch_commands[position:end],
+                (lambda index, result: progress(position + index, result)) if progress is not None else None)
+            results.extend(script_results)
+            position = end
+        else:
+            start_time = time.monotonic()
+            (returncode, stdout, stderr) = run_process(commands)
+            results.append({ 'Commands': commands, 'Status': 'Failed' if returncode else 'Done',
+                             'Time': time.monotonic() - start_time })
+            if progress is not None and not returncode:
+                progress(position, results[-1])
+            position = position + 1
+
+        # report results and exit, if return code is not 0
+        if returncode:
+            results.extend([{ 'Commands': commands, 'Status': 'Skipped', 'Time': 0.0 }
+                            for commands in batch_commands[position:]])
+            print_batch_results(results)
+            if not exit_on_error:
+                return results
+            exit(1)
+
+    return results
+
+# print batch results
+def print_batch_results(results):
+    """Print Batch Results"""
+    for number, result in enumerate(results, start=1):
+        if result['Status'] != 'Failed':
+            continue
+        print('{0}: Batch command {1}/{2} \'{3}\''.format(
+            result['Status'], number, len(results), ' '.join(result['Commands'][1:])))
+    print('Batch commands done {0}, failed {1}, skipped {2}'.format(
+        len([x for x in results if x['Status'] == 'Done']),
+        len([x for x in results if x['Status'] == 'Failed']),
+        len([x for x in results if x['Status'] == 'Skipped'])))
+
+# get hst imager path, development apps are used, if present
 def get_hst_imager_path(path):
-    # use hst imager macos/linux app by default
-    hst_imager_path = os.path.join(path, 'hst.imager')
-
-    # use hst imager windows exe app, if present
-    hst_imager_dev = os.path.join(path, 'hst.imager.exe')
-    if os.path.isfile(hst_imager_dev):
-        hst_imager_path = hst_imager_dev
-
-    # use hst imager macos/linux development app, if present
-    hst_imager_dev = os.path.join(path, 'Hst.Imager.ConsoleApp')
-    if os.path.isfile(hst_imager_dev):
-        hst_imager_path = hst_imager_dev
-
-    # use hst imager windows development app, if present
-    hst_imager_dev = os.path.join(path, 'Hst.Imager.ConsoleApp.exe')
-    if os.path.isfile(hst_imager_dev):
-        hst_imager_path = hst_imager_dev
-
-    # error, if hst imager is not found
-    if not os.path.isfile(hst_imager_path):
-        print('Error: Hst Imager file \'{0}\' not found'.format(hst_imager_path))
+    """Get Hst Imager Path"""
+    try:
+        return imagerclient.find_hst_imager_path(path)
+    except imagerclient.ToolNotFoundError as error:
+        print('Error: Hst Imager file \'{0}\' not found'.format(error.path))
         exit(1)
 
-    return hst_imager_path
-
-# get hst amiga path
+# get hst amiga path, development apps are used, if present
 def get_hst_amiga_path(path):
-    # use hst amiga macos/linux app by default
-    hst_amiga_path = os.path.join(path, 'hst.amiga')
-    
-    # use hst amiga windows exe app, if present
-    hst_amiga_dev = os.path.join(path, 'hst.amiga.exe')
-    if os.path.isfile(hst_amiga_dev):
-        hst_amiga_path = hst_amiga_dev
-
-    # use hst imager macos/linux development app, if present
-    hst_amiga_dev = os.path.join(path, 'Hst.Amiga.ConsoleApp')
-    if os.path.isfile(hst_amiga_dev):
-        hst_amiga_path = hst_amiga_dev
-
-    # use hst imager windows development app, if present
-    hst_amiga_dev = os.path.join(path, 'Hst.Amiga.ConsoleApp.exe')
-    if os.path.isfile(hst_amiga_dev):
-        hst_amiga_path = hst_amiga_dev
-
-    # error, if hst amiga is not found
-    if not os.path.isfile(hst_amiga_path):
-        print('Error: Hst Amiga file \'{0}\' not found.'.format(hst_amiga_path))
+    """Get Hst Amiga Path"""
+    try:
+        return imagerclient.find_hst_amiga_path(path)
+    except imagerclient.ToolNotFoundError as error:
+        print('Error: Hst Amiga file \'{0}\' not found.'.format(error.path))
         exit(1)
 
-    return hst_amiga_path
-
 # read text lines for amiga
 def read_text_lines_for_amiga(path):
     """Read Text Lines for Amiga"""
@@ -207,6 +676,212 @@ def write_text_lines_for_amiga(path, lines):
         for line in lines:
             file.write(unicodedata.normalize('NFC', line)+"\n")
 
+# parse size
+def parse_size(size):
+    """Parse Size"""
+    size_match = re.search(r'^\s*(\d+(?:\.\d+)?)\s*(b|kb|mb|gb|tb)?\s*$', str(size), re.I)
+    if not size_match:
+        print('Error: Invalid size \'{0}\''.format(size))
+        exit(1)
+    units = ['b', 'kb', 'mb', 'gb', 'tb']
+    unit = (size_match.group(2) or 'b').lower()
+    return int(float(size_match.group(1)) * 1024 ** units.index(unit))
+
+# get directory size
+def get_directory_size(path):
+    """Get Directory Size"""
+    size = 0
+    for root, directories, filenames in os.walk(path):
+        for filename in filenames:
+            size += os.path.getsize(os.path.join(root, filename))
+    return size
+
+# get file hash
+def get_file_hash(path):
+    """Get File Hash"""
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(1024 * 1024):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+# get entries from path using hst imager fs dir with imager client, client errors are printed and exits, if
+# hst imager fails. client and event loop are created per call, so entries can be listed from worker threads
+def get_entries(hst_imager_path, path, recursive = True):
+    """Get Entries"""
+    client = imagerclient.ImagerClient(hst_imager_path, on_event=trace_client_event)
+    try:
+        return asyncio.run(client.fs_dir(path, recursive))
+    except imagerclient.ImagerError as error:
+        if isinstance(error, imagerclient.CommandError):
+            print(error.output)
+        print('Error: {0}'.format(error))
+        exit(1)
+
+# file system block size and rigid disk block cylinder size and reserved cylinders used by hst imager
+file_system_block_size = 512
+rdb_cylinder_size = 16 * 63 * 512
+rdb_reserved_cylinders = 2
+
+# get file system blocks used by files and directories for dos type.
+# fast file system uses a header block per file and directory, extension blocks for every 72 data blocks
+# and a bitmap block per 4064 blocks. pfs3 packs directory entries into directory blocks, uses an anode per
+# file and directory and a bitmap block per 4000 blocks
+def get_file_system_blocks(entries, dos_type, partition_blocks):
+    """Get File System Blocks"""
+    files = [x for x in entries if x['type'] == 1]
+
+    # directories from directory entries and parent directories of files
+    directories = set()
+    for entry in entries:
+        parts = re.split(r'[\\/]', entry['name'].lower())
+        for i in range(1, len(parts) + (1 if entry['type'] == 0 else 0)):
+            directories.add('/'.join(parts[:i]))
+
+    if dos_type.upper() == 'PDS3':
+        # data blocks
+        blocks = sum([-(-x['size'] // file_system_block_size) for x in files])
+
+        # directory blocks, entries are packed into directory blocks of 492 bytes
+        directory_entries = {}
+        for entry in files + [{ 'name': x, 'type': 0 } for x in directories]:
+            parts = re.split(r'[\\/]', entry['name'].lower())
+            entry_size = 18 + len(parts[-1]) + 2
+            directory_entries.setdefault('/'.join(parts[:-1]), []).append(entry_size + entry_size % 2)
+        for directory_entry_sizes in directory_entries.values():
+            free = 0
+            for entry_size in directory_entry_sizes:
+                if entry_size > free:
+                    blocks += 1
+                    free = 492
+                free -= entry_size
+
+        # anode blocks with 41 anodes per block, bitmap blocks and reserved root, deldir and index blocks
+        blocks += -(-(len(files) + len(directories)) // 41)
+        blocks += -(-partition_blocks // 4000)
+        blocks += 32
+        return blocks
+
+    # data blocks, old file system stores 488 bytes per data block
+    data_block_size = 488 if dos_type.upper() in ['DOS0', 'DOS2', 'DOS4'] else file_system_block_size
+    blocks = 0
+    for file in files:
+        data_blocks = -(-file['size'] // data_block_size)
+        blocks += 1 + data_blocks + max(0, -(-data_blocks // 72) - 1)
+
+    # directory blocks, boot blocks, root block, bitmap blocks and bitmap extension blocks
+    bitmap_blocks = -(-partition_blocks // 4064)
+    blocks += len(directories) + 2 + 1 + bitmap_blocks + -(-max(0, bitmap_blocks - 25) // 127)
+    return blocks
+
+# get partition size for files and directories plus extra size and margin for dos type, rounded up to cylinders
+def get_partition_size(entries, dos_type, extra_size = 0, margin = 0.05):
+    """Get Partition Size"""
+    partition_blocks = 0
+    while True:
+        used_blocks = get_file_system_blocks(entries, dos_type, partition_blocks) + \
+            -(-extra_size // file_system_block_size)
+        required_blocks = int(used_blocks * (1 + margin)) + 1
+        if required_blocks <= partition_blocks:
+            break
+        partition_blocks = required_blocks
+    partition_size = partition_blocks * file_system_block_size
+    return -(-partition_size // rdb_cylinder_size) * rdb_cylinder_size
+
+# get image size for partition sizes, compatible size is 95% of size used by blank command
+def get_image_size(partition_sizes, compatible = False):
+    """Get Image Size"""
+    image_size = rdb_reserved_cylinders * rdb_cylinder_size + sum(partition_sizes)
+    if compatible:
+        image_size = -(-image_size * 100 // 95)
+    return -(-image_size // rdb_cylinder_size) * rdb_cylinder_size
+
+# uae fsdb file name and node size, node is valid (1), mode (4), amiga name (257), normal name (257) and comment (81)
+uae_fsdb_filename = '_UAEFSDB.___'
+uae_fsdb_node_size = 600
+
+# read uae fsdb nodes
+def read_uae_fsdb_nodes(dir_path):
+    """Read UAE FSDB Nodes"""
+    nodes = []
+    uae_fsdb_path = os.path.join(dir_path, uae_fsdb_filename)
+    if not os.path.isfile(uae_fsdb_path):
+        return nodes
+    with open(uae_fsdb_path, 'rb') as file:
+        while len(node_bytes := file.read(uae_fsdb_node_size)) == uae_fsdb_node_size:
+            nodes.append({
+                'AmigaName': node_bytes[5:262].split(b'\0', 1)[0].decode('iso-8859-1'),
+                'NormalName': node_bytes[262:519].split(b'\0', 1)[0].decode('iso-8859-1'),
+                'Bytes': node_bytes
+            })
+    return nodes
+
+# write uae fsdb nodes
+def write_uae_fsdb_nodes(dir_path, nodes):
+    """Write UAE FSDB Nodes"""
+    uae_fsdb_path = os.path.join(dir_path, uae_fsdb_filename)
+    if len(nodes) == 0:
+        if os.path.isfile(uae_fsdb_path):
+            os.remove(uae_fsdb_path)
+        return
+    with open(uae_fsdb_path, 'wb') as file:
+        for node in nodes:
+            file.write(node['Bytes'])
+
+# merge uae fsdb nodes, nodes for same amiga name are replaced
+def merge_uae_fsdb_nodes(src_dir_path, dest_dir_path, normal_names=None):
+    """Merge UAE FSDB Nodes"""
+    src_nodes = [node for node in read_uae_fsdb_nodes(src_dir_path)
+                 if normal_names is None or node['NormalName'] in normal_names]
+    if len(src_nodes) == 0:
+        return
+    src_amiga_names = set([node['AmigaName'].lower() for node in src_nodes])
+    dest_nodes = [node for node in read_uae_fsdb_nodes(dest_dir_path)
+                  if not node['AmigaName'].lower() in src_amiga_names]
+    write_uae_fsdb_nodes(dest_dir_path, dest_nodes + src_nodes)
+
+# merge local directory, moves entries from src to dest and overwrites existing entries matched case insensitive
+def merge_local_directory(src_path, dest_path):
+    """Merge Local Directory"""
+    if not os.path.isdir(dest_path):
+        os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+        os.replace(src_path, dest_path)
+        return
+
+    dest_names = dict([(name.lower(), name) for name in os.listdir(dest_path)])
+    for name in os.listdir(src_path):
+        if name == uae_fsdb_filename:
+            continue
+        src_entry_path = os.path.join(src_path, name)
+        dest_entry_path = os.path.join(dest_path, dest_names.get(name.lower(), name))
+        if os.path.isdir(src_entry_path) and os.path.isdir(dest_entry_path):
+            merge_local_directory(src_entry_path, dest_entry_path)
+            continue
+        if os.path.isdir(dest_entry_path):
+            shutil.rmtree(dest_entry_path)
+        elif os.path.isfile(dest_entry_path):
+            os.remove(dest_entry_path)
+        os.replace(src_entry_path, os.path.join(dest_path, name))
+
+    merge_uae_fsdb_nodes(src_path, dest_path)
+    shutil.rmtree(src_path)
+
+# confirm identified file only identified by volume name is used as id. if headless without answer, unambiguous
+# identified file is used and ambiguous identified file is not used, so adf file is selected instead. identified
+# file confirmed by user is recorded, so it's not confirmed again
+def confirm_identified_file(path, id, unambiguous):
+    """Confirm Identified File"""
+    key = 'use_identified_{0}'.format(get_answer_key(id))
+    if get_answer(key) is None and is_headless():
+        if unambiguous:
+            print('Using \'{0}\' identified by volume name as \'{1}\''.format(path, id))
+        return unambiguous
+    if not confirm('Use \'{0}\' identified by volume name as \'{1}\'?'.format(path, id),
+                   'enter = yes, no = select file', key):
+        return False
+    identify.confirm_candidate_file(path, id)
+    return True
+
 # get adf files
 def get_adf_files(adfFiles, output_path):
     if not os.path.exists(output_path):
@@ -235,10 +910,17 @@ def get_adf_files(adfFiles, output_path):
                 os.chmod(dest_adf_path, os.stat(dest_adf_path).st_mode | stat.S_IREAD | stat.S_IWRITE | stat.S_IEXEC)
                 break
 
+            # copy identified adf file, if found
+            if identify.copy_identified_file(adfFile['Filename'], dest_adf_path, confirm_identified_file):
+                break
+
             # select adf file
-            adf_path = select_file_path("{0} adf file".format(adfFile['Name']))
+            adf_key = get_answer_key(adfFile['Filename'])
+            adf_path = select_file_path("{0} adf file".format(adfFile['Name']), adf_key)
             if not os.path.isfile(adf_path):
                 print('Error: {0} adf file \'{1}\' not found'.format(adfFile['Name'], adf_path))
+                if get_answer(adf_key) is not None:
+                    exit(1)
                 continue
 
             # set src path to path with adf file
@@ -281,10 +963,17 @@ def get_rom_files(romFiles, output_path):
                 os.chmod(dest_rom_path, os.stat(dest_rom_path).st_mode | stat.S_IREAD | stat.S_IWRITE | stat.S_IEXEC)
                 break
 
+            # copy identified rom file, if found
+            if identify.copy_identified_file(romFile['SrcFilename'], dest_rom_path, confirm_identified_file):
+                break
+
             # select rom file
-            rom_path = select_file_path("{0} rom file".format(romFile['Name']))
+            rom_key = get_answer_key(romFile['SrcFilename'])
+            rom_path = select_file_path("{0} rom file".format(romFile['Name']), rom_key)
             if not os.path.isfile(rom_path):
                 print('Error: {0} rom file \'{1}\' not found'.format(romFile['Name'], rom_path))
+                if get_answer(rom_key) is not None:
+                    exit(1)
                 continue
 
             # set src path to path with rom file
@@ -303,7 +992,7 @@ def get_rom_files(romFiles, output_path):
 
 # copy amigaos adf path
 def copy_amigaos_adf_path(title, path):
-    adf_file = select_file_path(title)
+    adf_file = select_file_path(title, get_answer_key(os.path.basename(path)))
 
     if not os.path.isfile(adf_file):
         print('Error: Adf file \'{0}\' doesn\'t exist'.format(adf_file))
@@ -319,11 +1008,15 @@ def copy_amigaos_adf_path(title, path):
 def get_amigaos_adf_path(title, path):
     if os.path.isfile(path):
         return
+
+    # copy identified adf file, if found
+    if identify.copy_identified_file(os.path.basename(path), path, confirm_identified_file):
+        return
     copy_amigaos_adf_path(title, path)
 
 # copy kickstart rom path
 def copy_kickstart_rom_path(title, path):
-    rom_file = select_file_path(title)
+    rom_file = select_file_path(title, get_answer_key(os.path.basename(path)))
 
     if not os.path.isfile(rom_file):
         print('Error: Rom file \'{0}\' doesn\'t exist'.format(rom_file))
@@ -375,80 +1068,570 @@ def get_amigaos_install_adf_path(image_path, use_amigaos_31):
     get_amigaos_adf_path("AmigaOS 3.1.4, 3.2+ install adf", amigaos_install_adf_path)
     return amigaos_install_adf_path
 
+# get base image cache path, shared by all example scripts on host
+def get_base_image_cache_path():
+    """Get Base Image Cache Path"""
+    if os.environ.get('HST_IMAGER_BASE_IMAGE_CACHE'):
+        return os.environ['HST_IMAGER_BASE_IMAGE_CACHE']
+    return os.path.join(os.path.dirname(get_download_cache_path()), 'base-images')
+
+# get base image key, hash of key parts, input files and shared script building base image. scripts with own
+# build functions add their script to input files
+def get_base_image_key(key_parts, input_paths):
+    """Get Base Image Key"""
+    key = hashlib.sha256()
+    key.update('|'.join([str(x) for x in key_parts]).encode('utf-8'))
+    for path in input_paths + [os.path.abspath(__file__)]:
+        key.update((get_file_hash(path) if os.path.isfile(path) else '-').encode('utf-8'))
+    return key.hexdigest()
+
+# clone file using reflink or copy file range, if supported by file system. otherwise file is copied
+def clone_file(src_path, dest_path):
+    """Clone File"""
+    with open(src_path, 'rb') as src_file, open(dest_path, 'wb') as dest_file:
+        # clone file using reflink ioctl ficlone, supported by btrfs, xfs and others
+        if fcntl is not None and platform.system() == 'Linux':
+            try:
+                fcntl.ioctl(dest_file.fileno(), 0x40049409, src_file.fileno())
+                return
+            except OSError:
+                pass
+
+        # copy file within kernel using copy file range, which can share blocks on nfs, cifs and others
+        size = os.fstat(src_file.fileno()).st_size
+        if hasattr(os, 'copy_file_range'):
+            try:
+                copied = 0
+                while copied < size:
+                    length = os.copy_file_range(src_file.fileno(), dest_file.fileno(), size - copied)
+                    if length == 0:
+                        break
+                    copied += length
+                if copied == size:
+                    return
+            except OSError:
+                pass
+            src_file.seek(0)
+            dest_file.seek(0)
+            dest_file.truncate()
+
+        shutil.copyfileobj(src_file, dest_file, 1024 * 1024)
+
+# create image from cached base image with key, base image is built and added to cache, if not cached.
+# cached base image is locked while checked, built and added to cache, so parallel jobs and processes with same
+# key wait for base image built by first job instead of building it too. cache is disabled, if base image cache
+# is set to off
+def create_cached_image(image_path, key, build):
+    """Create Cached Image"""
+    if os.environ.get('HST_IMAGER_BASE_IMAGE_CACHE', '').lower() == 'off':
+        build()
+        return
+
+    cache_path = get_base_image_cache_path()
+    os.makedirs(cache_path, exist_ok=True)
+    cached_image_path = os.path.join(cache_path, '{0}{1}'.format(key, os.path.splitext(image_path)[1].lower()))
+
+    # clone cached base image, if present
+    if os.path.isfile(cached_image_path):
+        print('Creating image file \'{0}\' from cached base image'.format(image_path))
+        clone_file(cached_image_path, image_path)
+        return
+
+    # build base image and add it to cache with cached base image locked. cached base image is cloned, if built
+    # by other job while waiting for lock
+    lock = lock_file('{0}.lock'.format(cached_image_path))
+    try:
+        if os.path.isfile(cached_image_path):
+            print('Creating image file \'{0}\' from cached base image'.format(image_path))
+            clone_file(cached_image_path, image_path)
+            return
+        build()
+        (file_handle, temp_image_path) = tempfile.mkstemp(prefix='.base-', dir=cache_path)
+        os.close(file_handle)
+        clone_file(image_path, temp_image_path)
+        os.replace(temp_image_path, cached_image_path)
+    finally:
+        unlock_file(lock)
+
+# confirm use pfs3
+def confirm_use_pfs3():
+    """Confirm Use PFS3"""
+    return confirm("Use PFS3 file system?", "enter = yes, no = DOS7", 'use_pfs3')
+
+# get create image size, image size fits 500mb dh0 partition and entries in dh1 partition, if size is auto
+def get_create_image_size(size, entries, use_pfs3):
+    """Get Create Image Size"""
+    if size != 'auto':
+        return size
+    dh1_size = get_partition_size(entries or [], 'PDS3' if use_pfs3 else 'DOS7')
+    return str(get_image_size([parse_size('500mb'), dh1_size], True))
+
+# get create partition sizes of 500mb dh0 partition and dh1 partition fitting entries, if size is auto.
+# otherwise dh1 partition uses remaining size of image file
+def get_create_partition_sizes(size, entries, use_pfs3):
+    """Get Create Partition Sizes"""
+    dh0_size = -(-parse_size('500mb') // rdb_cylinder_size) * rdb_cylinder_size
+    if size == 'auto':
+        return [dh0_size, get_partition_size(entries or [], 'PDS3' if use_pfs3 else 'DOS7')]
+    dh1_size = (parse_size(size) * 95 // 100 - rdb_reserved_cylinders * rdb_cylinder_size - dh0_size) // \
+        rdb_cylinder_size * rdb_cylinder_size
+    if dh1_size <= 0:
+        print('Error: Image size \'{0}\' is too small for DH0 and DH1 partitions'.format(size))
+        exit(1)
+    return [dh0_size, dh1_size]
+
+# get file system adf path, amigaos install adf path to import fast file system from. returns none for pfs3.
+# adf path is selected, if not found, so it must be called before images are created in parallel
+def get_file_system_adf_path(image_path, use_pfs3):
+    """Get File System Adf Path"""
+    if use_pfs3:
+        return None
+    return get_amigaos_install_adf_path(os.path.dirname(image_path) or '.', False)
+
+# get file system commands to add file system for pfs3 or fast file system imported from amigaos install adf
+# path to rigid disk block. returns dos type and commands
+def get_add_file_system_commands(hst_imager_path, image_path, use_pfs3, amigaos_install_adf_path):
+    """Get Add File System Commands"""
+    if use_pfs3:
+        # add rdb file system pfs3aio with dos type PDS3
+        return ('PDS3', [[hst_imager_path, 'rdb', 'fs', 'add', image_path, 'pfs3aio', 'PDS3']])
+
+    # add rdb file system fast file system with dos type DOS7 imported from amigaos install adf
+    return ('DOS7', [[hst_imager_path, 'rdb', 'fs', 'import', image_path, amigaos_install_adf_path, '--dos-type',
+                      'DOS7', '--name', 'FastFileSystem']])
+
+# get partition image path, partition images are created next to image file, e.g. whdloads.dh1.vhd
+def get_partition_image_path(image_path, name, extension = None):
+    """Get Partition Image Path"""
+    (root, image_extension) = os.path.splitext(image_path)
+    return '{0}.{1}{2}'.format(root, name.lower(), extension or image_extension)
+
+# create partition image, image file with rigid disk block and one partition of partition size formatted with
+# volume name. partition images are filled in parallel and imported into image file by import partition images.
+# file system adf path is resolved by caller, so partition images created in parallel don't select it
+def create_partition_image(hst_imager_path, image_path, partition_size, name, volume_name, use_pfs3,
+                           file_system_adf_path, bootable = False):
+    """Create Partition Image"""
+    set_trace_step('create partition image')
+    size = get_image_size([partition_size], True)
+    print('Creating partition image file \'{0}\' of size {1}'.format(image_path, size))
+    (dos_type, file_system_commands) = get_add_file_system_commands(hst_imager_path, image_path, use_pfs3,
+                                                                    file_system_adf_path)
+    batch_commands = [
+        [hst_imager_path, 'blank', image_path, str(size), '--compatible'],
+        [hst_imager_path, 'rdb', 'init', image_path]
+    ] + file_system_commands + [
+        [hst_imager_path, 'rdb', 'part', 'add', image_path, name, dos_type, str(partition_size)] +
+        (['--bootable'] if bootable else []),
+        [hst_imager_path, 'rdb', 'part', 'format', image_path, '1', volume_name]
+    ]
+    run_batch_commands(batch_commands)
+
+# import partition images into new image file. partition of each partition image is exported to a hard file and
+# imported into image file in order. hard files and partition images are removed, when imported
+def import_partition_images(hst_imager_path, image_path, partition_images, use_pfs3, file_system_adf_path):
+    """Import Partition Images"""
+    set_trace_step('import partition images')
+    size = get_image_size([x['Size'] for x in partition_images], True)
+    print('Creating image file \'{0}\' of size {1} from {2} partition images'.format(
+        image_path, size, len(partition_images)))
+    (dos_type, file_system_commands) = get_add_file_system_commands(hst_imager_path, image_path, use_pfs3,
+                                                                    file_system_adf_path)
+    batch_commands = [
+        [hst_imager_path, 'blank', image_path, str(size), '--compatible'],
+        [hst_imager_path, 'rdb', 'init', image_path]
+    ] + file_system_commands
+    for partition_image in partition_images:
+        hard_file_path = get_partition_image_path(image_path, partition_image['Name'], '.hdf')
+        batch_commands.append([hst_imager_path, 'rdb', 'part', 'export', partition_image['Path'], '1', hard_file_path])
+        batch_commands.append([hst_imager_path, 'rdb', 'part', 'import', hard_file_path, image_path,
+                               partition_image['Name'], dos_type] +
+                              (['--bootable'] if partition_image.get('Bootable') else []))
+    run_batch_commands(batch_commands)
+    for partition_image in partition_images:
+        for path in [partition_image['Path'], get_partition_image_path(image_path, partition_image['Name'], '.hdf')]:
+            if os.path.isfile(path):
+                os.remove(path)
+
 # create image
-def create_image(hst_imager_path, image_path, size):
-    # show use pfs3 confirm dialog 
-    use_pfs3 = confirm("Use PFS3 file system?", "enter = yes, no = DOS7")
+def create_image(hst_imager_path, image_path, size, entries = None, use_pfs3 = None):
+    # show use pfs3 confirm dialog, if not set
+    if use_pfs3 is None:
+        use_pfs3 = confirm_use_pfs3()
+
+    set_trace_step('create image')
 
-    # get amigaos install adf path
-    amigaos_install_adf_path = None
-    if not use_pfs3:
-        amigaos_install_adf_path = get_amigaos_install_adf_path(os.path.dirname(image_path), False)
+    # get image size, size is calculated from entries, if auto
+    size = get_create_image_size(size, entries, use_pfs3)
 
     print('Creating image file \'{0}\' of size {1}'.format(image_path, size))
+
+    # batch of commands to create image
+    batch_commands = []
     
     # create blank image of size
-    run_command([hst_imager_path, 'blank', image_path, size, '--compatible'])
+    batch_commands.append([hst_imager_path, 'blank', image_path, size, '--compatible'])
     
     # initialize rigid disk block for entire disk
-    run_command([hst_imager_path, 'rdb', 'init', image_path])
-    
-    if use_pfs3:
-        # add rdb file system pfs3aio with dos type PDS3
-        run_command([hst_imager_path, 'rdb', 'fs', 'add', image_path, 'pfs3aio', 'PDS3'])
+    batch_commands.append([hst_imager_path, 'rdb', 'init', image_path])
 
-        # add rdb partition of 500mb disk space with device name "DH0" and set bootable
-        run_command([hst_imager_path, 'rdb', 'part', 'add', image_path, 'DH0', 'PDS3', '500mb', '--bootable'])
-        
-        # add rdb partition of remaining disk space with device name "DH1"
-        run_command([hst_imager_path, 'rdb', 'part', 'add', image_path, 'DH1', 'PDS3', '*'])
-    else:
-        # add rdb file system fast file system with dos type DOS7 imported from amigaos install adf
-        run_command([hst_imager_path, 'rdb', 'fs', 'import', image_path, amigaos_install_adf_path, '--dos-type', 'DOS7', '--name', 'FastFileSystem'])
+    # add rdb file system pfs3aio with dos type PDS3 or fast file system with dos type DOS7
+    (dos_type, file_system_commands) = get_add_file_system_commands(
+        hst_imager_path, image_path, use_pfs3, get_file_system_adf_path(image_path, use_pfs3))
+    batch_commands.extend(file_system_commands)
 
-        # add rdb partition of 500mb disk space with device name "DH0" and set bootable
-        run_command([hst_imager_path, 'rdb', 'part', 'add', image_path, 'DH0', 'DOS7', '500mb', '--bootable'])
+    # add rdb partition of 500mb disk space with device name "DH0" and set bootable
+    batch_commands.append([hst_imager_path, 'rdb', 'part', 'add', image_path, 'DH0', dos_type, '500mb', '--bootable'])
 
-        # add rdb partition of remaining disk space with device name "DH1"
-        run_command([hst_imager_path, 'rdb', 'part', 'add', image_path, 'DH1', 'DOS7', '*'])
+    # add rdb partition of remaining disk space with device name "DH1"
+    batch_commands.append([hst_imager_path, 'rdb', 'part', 'add', image_path, 'DH1', dos_type, '*'])
 
     # format rdb partition number 1 with volume name "Workbench"
-    run_command([hst_imager_path, 'rdb', 'part', 'format', image_path, '1', 'Workbench'])
+    batch_commands.append([hst_imager_path, 'rdb', 'part', 'format', image_path, '1', 'Workbench'])
     
     # format rdb partition number 2 with volume name "Work"
-    run_command([hst_imager_path, 'rdb', 'part', 'format', image_path, '2', 'Work'])
+    batch_commands.append([hst_imager_path, 'rdb', 'part', 'format', image_path, '2', 'Work'])
+
+    # run batch of commands to create image
+    run_batch_commands(batch_commands)
+
+# download files, sha256 is pinned digest of versioned archives, which are released under a new filename and
+# never change. pinned digests must be the sha256 of the archive published at url. every download and mirror file
+# must also be a valid lha archive before cached, so truncated and corrupt archives are never cached.
+# whdload usr lha is not versioned and is updated in place with each whdload release, so it's never pinned in
+# table. it's trusted on first use: digest of first download or mirror file is recorded in download cache index,
+# cached file is verified against recorded digest and a new release is only downloaded, when cached file is removed
+# from download cache. digest of whdload usr lha can be pinned with environment variable
+# HST_IMAGER_DOWNLOAD_SHA256_WHDLOAD
+download_files = {
+    'skick': {
+        'Filename': 'skick346.lha',
+        'Url': 'https://aminet.net/util/boot/skick346.lha',
+        'Versioned': True,
+        'Sha256': None
+    },
+    'whdload': {
+        'Filename': 'WHDLoad_usr.lha',
+        'Url': 'https://whdload.de/whdload/WHDLoad_usr.lha',
+        'Versioned': False,
+        'Sha256': None
+    },
+    'iconlib': {
+        'Filename': 'IconLib_46.4.lha',
+        'Url': 'http://aminet.net/util/libs/IconLib_46.4.lha',
+        'Versioned': True,
+        'Sha256': None
+    }
+}
+
+# get pinned sha256 digest of download, digest of download not versioned can be pinned with environment variable.
+# returns none, if download is trusted on first use
+def get_download_sha256(name):
+    """Get Download Sha256"""
+    download_file = download_files[name]
+    if download_file['Versioned']:
+        return download_file['Sha256']
+    return os.environ.get('HST_IMAGER_DOWNLOAD_SHA256_{0}'.format(name.upper())) or download_file['Sha256']
+
+# downloads required to install minimal whdload
+minimal_whdload_downloads = ['skick', 'whdload', 'iconlib']
+
+# lock for updating download cache index from concurrent downloads
+download_cache_lock = threading.Lock()
+
+# get download cache path, shared by all example scripts on host
+def get_download_cache_path():
+    """Get Download Cache Path"""
+    if os.environ.get('HST_IMAGER_DOWNLOAD_CACHE'):
+        return os.environ['HST_IMAGER_DOWNLOAD_CACHE']
+    if platform.system() == 'Windows' and os.environ.get('LOCALAPPDATA'):
+        return os.path.join(os.environ['LOCALAPPDATA'], 'hst-imager', 'downloads')
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'hst-imager', 'downloads')
+
+# read download cache index with digests of urls downloaded
+def read_download_cache_index(cache_path):
+    """Read Download Cache Index"""
+    index_path = os.path.join(cache_path, 'index.json')
+    if not os.path.isfile(index_path):
+        return {}
+    try:
+        with open(index_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except ValueError:
+        return {}
+
+# write download cache index
+def write_download_cache_index(cache_path, index):
+    """Write Download Cache Index"""
+    (file_handle, temp_index_path) = tempfile.mkstemp(prefix='.index-', dir=cache_path)
+    with os.fdopen(file_handle, 'w', encoding='utf-8') as file:
+        json.dump(index, file, indent=2, sort_keys=True)
+    os.replace(temp_index_path, os.path.join(cache_path, 'index.json'))
+
+# get cached download file path by digest
+def get_cached_download_path(cache_path, download_file, sha256):
+    """Get Cached Download Path"""
+    return os.path.join(cache_path, 'sha256', sha256, download_file['Filename'])
+
+# get lha crc16, crc-16/arc used by lha for header and file data
+def get_lha_crc16(data):
+    """Get Lha Crc16"""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for bit in range(8):
+            crc = (crc >> 1) ^ 0xa001 if crc & 1 else crc >> 1
+    return crc
+
+# is valid lha file, headers of level 0, 1 and 2 are verified with header checksum, compressed data of each entry
+# must be within file and archive must end with end marker or after last entry. crc16 of stored entries is verified
+def is_valid_lha_file(path):
+    """Is Valid Lha File"""
+    with open(path, 'rb') as file:
+        data = file.read()
+    offset = 0
+    entries = 0
+    while offset < len(data) and data[offset] != 0:
+        if offset + 22 > len(data) or not re.match(rb'^-l[hz][0-9a-z]-$', data[offset + 2:offset + 7]):
+            return False
+        compressed_size = int.from_bytes(data[offset + 7:offset + 11], 'little')
+        level = data[offset + 20]
+        if level in [0, 1]:
+            header_size = data[offset] + 2
+            if sum(data[offset + 2:offset + header_size]) & 0xff != data[offset + 1]:
+                return False
+            crc_offset = offset + 22 + data[offset + 21]
+        elif level == 2:
+            header_size = int.from_bytes(data[offset:offset + 2], 'little')
+            crc_offset = offset + 21
+        else:
+            return False
+        data_offset = offset + header_size
+        end_offset = data_offset + compressed_size
+        if header_size < 22 or end_offset > len(data):
+            return False
+
+        # verify crc16 of stored entries, level 1 compressed size includes extended headers before data
+        if data[offset + 2:offset + 7] == b'-lh0-' and level != 1 and \
+                get_lha_crc16(data[data_offset:end_offset]) != int.from_bytes(data[crc_offset:crc_offset + 2], 'little'):
+            return False
+        offset = end_offset
+        entries += 1
+    return entries > 0 and offset <= len(data)
+
+# add file to download cache, file is verified as lha archive, hashed and verified against pinned digest before
+# renamed into cache
+def add_download_cache_file(cache_path, download_file, temp_path, pinned_sha256):
+    """Add Download Cache File"""
+    if not is_valid_lha_file(temp_path):
+        print('Warning: File for \'{0}\' is not a valid lha archive'.format(download_file['Filename']))
+        os.remove(temp_path)
+        return None
+    sha256 = get_file_hash(temp_path)
+    if pinned_sha256 and pinned_sha256.lower() != sha256:
+        print('Warning: File for \'{0}\' doesn\'t match sha256 digest {1}'.format(download_file['Filename'],
+                                                                             pinned_sha256))
+        os.remove(temp_path)
+        return None
+    if not pinned_sha256 and download_file['Versioned']:
+        print('Warning: No sha256 digest pinned for \'{0}\', caching archive with sha256 digest {1}'.format(
+            download_file['Filename'], sha256))
+    cached_path = get_cached_download_path(cache_path, download_file, sha256)
+    os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+    os.replace(temp_path, cached_path)
+    with download_cache_lock:
+        index = read_download_cache_index(cache_path)
+        index[download_file['Url']] = sha256
+        write_download_cache_index(cache_path, index)
+    return cached_path
+
+# lock file exclusively, waits until file is unlocked by other processes. returns opened lock file
+def lock_file(path):
+    """Lock File"""
+    file = open(path, 'a+b')
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                continue
+    return file
+
+# unlock and close lock file
+def unlock_file(file):
+    """Unlock File"""
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    file.close()
+
+# get download part path of url in cache, partial file is shared by processes downloading same url
+def get_download_part_path(cache_path, url):
+    """Get Download Part Path"""
+    return os.path.join(cache_path, '.{0}.part'.format(hashlib.sha256(url.encode('utf-8')).hexdigest()))
+
+# get download url, base url is used to download from mirror or local http server
+def get_download_url(download_file):
+    """Get Download Url"""
+    base_url = os.environ.get('HST_IMAGER_DOWNLOAD_BASE_URL')
+    if not base_url:
+        return download_file['Url']
+    return '{0}/{1}'.format(base_url.rstrip('/'), download_file['Filename'])
+
+# download url to partial file in cache, partial file is resumed using http range, if download is interrupted.
+# each attempt is limited by timeout and failed attempts are retried with backoff. partial file must be locked
+# by caller, so concurrent processes don't write same partial file. returns none, if download failed
+def download_url(cache_path, url, retries = 3, timeout = 300):
+    """Download Url"""
+    part_path = get_download_part_path(cache_path, url)
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            delay = 2 ** attempt
+            print('Retrying url \'{0}\' in {1} seconds'.format(url, delay))
+            time.sleep(delay)
+
+        # resume from size of partial file, if present
+        size = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+        request = Request(url)
+        if size > 0:
+            request.add_header('Range', 'bytes={0}-'.format(size))
+
+        try:
+            deadline = time.monotonic() + timeout
+            with urlopen(request, timeout=30) as response:
+                # get total size from content range, if partial content is returned. otherwise start from beginning
+                if size > 0 and response.status == 206:
+                    mode = 'ab'
+                    content_range = response.headers.get('Content-Range', '')
+                    total_size = content_range.split('/')[-1] if '/' in content_range else None
+                else:
+                    mode = 'wb'
+                    size = 0
+                    total_size = response.headers.get('Content-Length')
+                total_size = int(total_size) if total_size and total_size.isdigit() else None
+
+                with open(part_path, mode) as file:
+                    while chunk := response.read(1024 * 1024):
+                        file.write(chunk)
+                        size += len(chunk)
+                        if time.monotonic() > deadline:
+                            raise TimeoutError('timed out after {0} seconds'.format(timeout))
+
+            if total_size is None or size == total_size:
+                return part_path
+            print('Warning: Download of url \'{0}\' is incomplete, got {1} of {2} bytes'.format(url, size, total_size))
+            if size > total_size:
+                os.remove(part_path)
+        except HTTPError as error:
+            print('Warning: Failed to download url \'{0}\': {1}'.format(url, error))
+
+            # remove partial file, if range is not satisfiable
+            if error.code == 416 and os.path.isfile(part_path):
+                os.remove(part_path)
+
+            # stop, if client error won't be solved by retrying
+            elif 400 <= error.code < 500 and not error.code in [408, 429]:
+                break
+        except (OSError, HTTPException) as error:
+            print('Warning: Failed to download url \'{0}\': {1}'.format(url, error))
+
+    print('Error: Failed to download url \'{0}\''.format(url))
+    return None
+
+# get verified cached download path, cached file is verified against pinned digest or digest recorded in download
+# cache index. returns none, if file is not cached or corrupt cached file is removed
+def get_verified_cached_download_path(cache_path, download_file, pinned_sha256):
+    """Get Verified Cached Download Path"""
+    sha256 = pinned_sha256.lower() if pinned_sha256 else read_download_cache_index(cache_path).get(download_file['Url'])
+    if not sha256:
+        return None
+    cached_path = get_cached_download_path(cache_path, download_file, sha256)
+    if not os.path.isfile(cached_path):
+        return None
+    if get_file_hash(cached_path) == sha256:
+        return cached_path
+    print('Warning: Removing corrupt cached file \'{0}\''.format(cached_path))
+    os.remove(cached_path)
+    return None
+
+# get download path from cache, mirror directory or download, if not cached
+def get_download_path(name, download_path):
+    """Get Download Path"""
+    download_file = download_files[name]
+    cache_path = get_download_cache_path()
+    os.makedirs(cache_path, exist_ok=True)
+
+    # use cached file, if it's digest is verified
+    pinned_sha256 = get_download_sha256(name)
+    cached_path = get_verified_cached_download_path(cache_path, download_file, pinned_sha256)
+    if cached_path:
+        return cached_path
+
+    # add file from offline mirror directory or download directory to cache, if present
+    mirror_paths = [x for x in [os.environ.get('HST_IMAGER_DOWNLOAD_MIRROR'), download_path] if x]
+    for mirror_path in mirror_paths:
+        mirror_file_path = os.path.join(mirror_path, download_file['Filename'])
+        if not os.path.isfile(mirror_file_path):
+            continue
+        (file_handle, temp_path) = tempfile.mkstemp(prefix='.mirror-', dir=cache_path)
+        os.close(file_handle)
+        shutil.copyfile(mirror_file_path, temp_path)
+        cached_path = add_download_cache_file(cache_path, download_file, temp_path, pinned_sha256)
+        if cached_path:
+            return cached_path
+        print('Warning: Skipping mirror file \'{0}\''.format(mirror_file_path))
+
+    # download url to cache with partial file locked. cached file is used, if downloaded by other process
+    # while waiting for lock
+    url = get_download_url(download_file)
+    lock = lock_file('{0}.lock'.format(os.path.splitext(get_download_part_path(cache_path, url))[0]))
+    try:
+        cached_path = get_verified_cached_download_path(cache_path, download_file, pinned_sha256)
+        if cached_path:
+            return cached_path
+        print('Downloading url \'{0}\''.format(url))
+        temp_path = download_url(cache_path, url)
+        if temp_path is None:
+            exit(1)
+        cached_path = add_download_cache_file(cache_path, download_file, temp_path, pinned_sha256)
+    finally:
+        unlock_file(lock)
+    if cached_path is None:
+        print('Error: Download of url \'{0}\' is not verified'.format(url))
+        exit(1)
+    return cached_path
+
+# fetch downloads concurrently in background, returns futures with download path for each download name
+def fetch_downloads(names, download_path):
+    """Fetch Downloads"""
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(names))
+    downloads = {}
+    for name in names:
+        downloads[name] = executor.submit(get_download_path, name, download_path)
+    executor.shutdown(wait=False)
+    return downloads
 
 # get skick lha path, download lha if not found
 def get_skick_lha_path(download_path):
-    skick_lha_path = os.path.join(download_path, "skick346.lha")
-    if os.path.isfile(skick_lha_path):
-        return skick_lha_path
-    url = 'https://aminet.net/util/boot/skick346.lha'
-    print('Downloading url \'{0}\''.format(url))
-    urlretrieve(url, skick_lha_path)
-    return skick_lha_path
+    return get_download_path('skick', download_path)
 
 # get whdload lha path, download lha if not found
 def get_whdload_lha_path(download_path):
-    whdload_usr_lha_path = os.path.join(download_path, "WHDLoad_usr.lha")
-    if os.path.isfile(whdload_usr_lha_path):
-        return whdload_usr_lha_path
-    url = 'https://whdload.de/whdload/WHDLoad_usr.lha'
-    print('Downloading url \'{0}\''.format(url))
-    urlretrieve(url, whdload_usr_lha_path)
-    return whdload_usr_lha_path
+    return get_download_path('whdload', download_path)
 
 # get iconlib lha path, download lha if not found
 def get_iconlib_lha_path(download_path):
-    iconlib_lha_path = os.path.join(download_path, "IconLib_46.4.lha")
-    if os.path.isfile(iconlib_lha_path):
-        return iconlib_lha_path
-    url = 'http://aminet.net/util/libs/IconLib_46.4.lha'
-    print('Downloading url \'{0}\''.format(url))
-    urlretrieve(url, iconlib_lha_path)
-    return iconlib_lha_path
+    return get_download_path('iconlib', download_path)
 
 def install_minimal_amigaos(hst_imager_path, image_path, use_amigaos_31):
+    set_trace_step('install minimal amigaos')
     image_dir = os.path.dirname(image_path)
     if image_dir is None or image_dir == '':
         image_dir = '.'
@@ -457,42 +1640,48 @@ def install_minimal_amigaos(hst_imager_path, image_path, use_amigaos_31):
     amigaos_workbench_adf_path = get_amigaos_workbench_adf_path(image_dir, use_amigaos_31)
     amigaos_install_adf_path = get_amigaos_install_adf_path(image_dir, use_amigaos_31)
 
-    # extract amiga os install adf to image file
-    run_command([hst_imager_path, 'fs', 'extract', amigaos_install_adf_path, os.path.join(image_path, 'rdb', 'dh0'), '--force'])
-
-    # extract amiga os workbench adf to image file
-    run_command([hst_imager_path, 'fs', 'extract', amigaos_workbench_adf_path, os.path.join(image_path, 'rdb', 'dh0'), '--force'])
+    # extract amiga os install and workbench adf to image file
+    run_batch_commands([
+        [hst_imager_path, 'fs', 'extract', amigaos_install_adf_path, os.path.join(image_path, 'rdb', 'dh0'), '--force'],
+        [hst_imager_path, 'fs', 'extract', amigaos_workbench_adf_path, os.path.join(image_path, 'rdb', 'dh0'), '--force']
+    ])
+
+# kickstart rom files
+kickstart_rom_files = [
+    {
+        'SrcFilename': 'amiga-os-130.rom',
+        'DestFilename': 'kick34005.A500',
+        'Name': 'Amiga 500 Kickstart 1.3'
+    },
+    {
+        'SrcFilename': 'amiga-os-120.rom',
+        'DestFilename': 'kick33180.A500',
+        'Name': 'Amiga 500 Kickstart 1.2'
+    },
+    {
+        'SrcFilename': 'amiga-os-310-a600.rom',
+        'DestFilename': 'kick40063.A600',
+        'Name': 'Amiga 600 Kickstart 3.1'
+    },
+    {
+        'SrcFilename': 'amiga-os-310-a1200.rom',
+        'DestFilename': 'kick40068.A1200',
+        'Name': 'Amiga 1200 Kickstart 3.1'
+    },
+    {
+        'SrcFilename': 'amiga-os-310-a4000.rom',
+        'DestFilename': 'kick40068.A4000',
+        'Name': 'Amiga 4000 Kickstart 3.1'
+    }
+]
+
+# get kickstart rom paths in path including rom key
+def get_kickstart_rom_paths(path):
+    """Get Kickstart Rom Paths"""
+    return [os.path.join(path, x['DestFilename']) for x in kickstart_rom_files] + [os.path.join(path, 'rom.key')]
 
 def install_kickstart_roms(hst_imager_path, image_path):
-    # kickstart rom files
-    kickstart_rom_files = [
-        {
-            'SrcFilename': 'amiga-os-130.rom',
-            'DestFilename': 'kick34005.A500',
-            'Name': 'Amiga 500 Kickstart 1.3'
-        },
-        {
-            'SrcFilename': 'amiga-os-120.rom',
-            'DestFilename': 'kick33180.A500',
-            'Name': 'Amiga 500 Kickstart 1.2'
-        },
-        {
-            'SrcFilename': 'amiga-os-310-a600.rom',
-            'DestFilename': 'kick40063.A600',
-            'Name': 'Amiga 600 Kickstart 3.1'
-        },
-        {
-            'SrcFilename': 'amiga-os-310-a1200.rom',
-            'DestFilename': 'kick40068.A1200',
-            'Name': 'Amiga 1200 Kickstart 3.1'
-        },
-        {
-            'SrcFilename': 'amiga-os-310-a4000.rom',
-            'DestFilename': 'kick40068.A4000',
-            'Name': 'Amiga 4000 Kickstart 3.1'
-        }
-    ]
-    
+    set_trace_step('install kickstart roms')
     image_dir = os.path.dirname(image_path)
     if image_dir == None or image_dir == '':
         image_dir = '.'
@@ -509,50 +1698,71 @@ def install_kickstart_roms(hst_imager_path, image_path):
     rom_key_path = os.path.join(image_dir, "rom.key")
 
     # copy kickstart roms to image file
-    run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts')])
-    run_command([hst_imager_path, 'fs', 'copy', kickstart12_a500_rom_path, os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
-    run_command([hst_imager_path, 'fs', 'copy', kickstart13_a500_rom_path, os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
-    run_command([hst_imager_path, 'fs', 'copy', kickstart31_a600_rom_path, os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
-    run_command([hst_imager_path, 'fs', 'copy', kickstart31_a1200_rom_path, os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
-    run_command([hst_imager_path, 'fs', 'copy', kickstart31_a4000_rom_path, os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
+    batch_commands = []
+    batch_commands.append([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts')])
+    batch_commands.append([hst_imager_path, 'fs', 'copy', kickstart12_a500_rom_path, os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
+    batch_commands.append([hst_imager_path, 'fs', 'copy', kickstart13_a500_rom_path, os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
+    batch_commands.append([hst_imager_path, 'fs', 'copy', kickstart31_a600_rom_path, os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
+    batch_commands.append([hst_imager_path, 'fs', 'copy', kickstart31_a1200_rom_path, os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
+    batch_commands.append([hst_imager_path, 'fs', 'copy', kickstart31_a4000_rom_path, os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
 
     # copy rom key to image, if present
     if os.path.exists(rom_key_path):
-        run_command([hst_imager_path, 'fs', 'copy', rom_key_path, os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
+        batch_commands.append([hst_imager_path, 'fs', 'copy', rom_key_path, os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
 
-# install minimal whdload
-def install_minimal_whdload(hst_imager_path, image_path):
-    # install kickstart roms
-    install_kickstart_roms(hst_imager_path, image_path)
+    # run batch of commands to copy kickstart roms
+    run_batch_commands(batch_commands)
 
+# install minimal whdload
+def install_minimal_whdload(hst_imager_path, image_path, downloads = None, work_path = None):
+    set_trace_step('install minimal whdload')
     image_dir = os.path.dirname(image_path)
     if image_dir == None or image_dir == '':
         image_dir = '.'
-    skick_lha_path = get_skick_lha_path(image_dir)
-    whdload_usr_lha_path = get_whdload_lha_path(image_dir)
-    iconlib_lha_path = get_iconlib_lha_path(image_dir)
+
+    # use image dir for temporary files, if work path is not set
+    if work_path is None:
+        work_path = image_dir
+
+    # fetch downloads, if not already fetching
+    if downloads is None:
+        downloads = fetch_downloads(minimal_whdload_downloads, image_dir)
+
+    # install kickstart roms
+    install_kickstart_roms(hst_imager_path, image_path)
+
+    # wait for downloads
+    skick_lha_path = downloads['skick'].result()
+    whdload_usr_lha_path = downloads['whdload'].result()
+    iconlib_lha_path = downloads['iconlib'].result()
+
+    # batch of commands to install minimal whdload
+    batch_commands = []
 
     # extract soft-kicker lha to image file
-    run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts')])
-    run_command([hst_imager_path, 'fs', 'extract', os.path.join(skick_lha_path, 'Kickstarts'), os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
+    batch_commands.append([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts')])
+    batch_commands.append([hst_imager_path, 'fs', 'extract', os.path.join(skick_lha_path, 'Kickstarts'), os.path.join(image_path, 'rdb', 'dh0', 'Devs', 'Kickstarts'), '--force'])
 
     # extract whdload lha to image file
-    run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'C')])
-    run_command([hst_imager_path, 'fs', 'extract', os.path.join(whdload_usr_lha_path, os.path.join('WHDLoad', 'C')), os.path.join(image_path, 'rdb', 'dh0', 'C'), '--force'])
-    run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'S')])
-    run_command([hst_imager_path, 'fs', 'extract', os.path.join(whdload_usr_lha_path, os.path.join('WHDLoad', 'S')), os.path.join(image_path, 'rdb', 'dh0', 'S'), '--force'])
+    batch_commands.append([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'C')])
+    batch_commands.append([hst_imager_path, 'fs', 'extract', os.path.join(whdload_usr_lha_path, os.path.join('WHDLoad', 'C')), os.path.join(image_path, 'rdb', 'dh0', 'C'), '--force'])
+    batch_commands.append([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'S')])
+    batch_commands.append([hst_imager_path, 'fs', 'extract', os.path.join(whdload_usr_lha_path, os.path.join('WHDLoad', 'S')), os.path.join(image_path, 'rdb', 'dh0', 'S'), '--force'])
 
     # extract iconlib lha to image file
-    run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Libs')])
-    run_command([hst_imager_path, 'fs', 'extract', os.path.join(iconlib_lha_path, 'IconLib_46.4', 'Libs', '68000', 'icon.library'), os.path.join(image_path, 'rdb', 'dh0', 'Libs'), '--force'])
-    run_command([hst_imager_path, 'fs', 'extract', os.path.join(iconlib_lha_path, 'IconLib_46.4', 'ThirdParty', 'RemLib', 'RemLib'), os.path.join(image_path, 'rdb', 'dh0', 'C'), '--force'])
-    run_command([hst_imager_path, 'fs', 'extract', os.path.join(iconlib_lha_path, 'IconLib_46.4', 'ThirdParty', 'LoadResident', 'LoadResident'), os.path.join(image_path, 'rdb', 'dh0', 'C'), '--force'])
+    batch_commands.append([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'Libs')])
+    batch_commands.append([hst_imager_path, 'fs', 'extract', os.path.join(iconlib_lha_path, 'IconLib_46.4', 'Libs', '68000', 'icon.library'), os.path.join(image_path, 'rdb', 'dh0', 'Libs'), '--force'])
+    batch_commands.append([hst_imager_path, 'fs', 'extract', os.path.join(iconlib_lha_path, 'IconLib_46.4', 'ThirdParty', 'RemLib', 'RemLib'), os.path.join(image_path, 'rdb', 'dh0', 'C'), '--force'])
+    batch_commands.append([hst_imager_path, 'fs', 'extract', os.path.join(iconlib_lha_path, 'IconLib_46.4', 'ThirdParty', 'LoadResident', 'LoadResident'), os.path.join(image_path, 'rdb', 'dh0', 'C'), '--force'])
 
     # extract image file startup sequence
-    run_command([hst_imager_path, 'fs', 'copy', os.path.join(image_path, 'rdb', 'dh0', 'S', 'Startup-Sequence'), image_dir, '--force'])
+    batch_commands.append([hst_imager_path, 'fs', 'copy', os.path.join(image_path, 'rdb', 'dh0', 'S', 'Startup-Sequence'), work_path, '--force'])
+
+    # run batch of commands to install minimal whdload
+    run_batch_commands(batch_commands)
 
     # read startup sequence
-    startup_sequence_path = os.path.join(image_dir, 'Startup-Sequence')
+    startup_sequence_path = os.path.join(work_path, 'Startup-Sequence')
     startup_sequence_lines = read_text_lines_for_amiga(startup_sequence_path)
 
     # create remlib lines for icon library
@@ -0,0 +1,247 @@
+﻿#!/usr/bin/env python3
+# Test Downloads
+# --------------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script to test downloads of shared functions against a local http server, which serves an lha
+# archive with a random file and support for http range requests. Downloads are redirected to local http server using download
+# base url and cached in a temporary download cache. Tests run on Linux, macOS and Windows without network.
+#
+# Usage:
+# - test-downloads.py: Run tests, exits with code 1 if a test fails.
+
+"""Test Downloads"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import shared
+
+# create lha data with file stored in level 0 header
+def create_lha_data(name, data):
+    """Create Lha Data"""
+    header = b'-lh0-' + len(data).to_bytes(4, 'little') + len(data).to_bytes(4, 'little') + \
+        (0).to_bytes(4, 'little') + bytes([0x20, 0, len(name)]) + name.encode('ascii') + \
+        shared.get_lha_crc16(data).to_bytes(2, 'little')
+    return bytes([len(header), sum(header) & 0xff]) + header + data + b'\x00'
+
+# versioned archive and archive trusted on first use served by local http server
+archive_name = 'skick'
+unversioned_archive_name = 'whdload'
+archive_data = create_lha_data('skick346/Kickstarts/kick.rom', os.urandom(3 * 1024 * 1024 + 123))
+
+# requests received, number of responses to truncate, seconds to delay responses and data served instead of
+# archive by local http server
+server_state = { 'Requests': [], 'Truncate': 0, 'Delay': 0, 'Data': None }
+
+# http request handler serving archive with range requests. truncated responses send half of content and
+# close connection, like an interrupted download
+class ArchiveRequestHandler(BaseHTTPRequestHandler):
+    """Archive Request Handler"""
+    def do_GET(self):
+        """Do Get"""
+        server_state['Requests'].append({ 'Path': self.path, 'Range': self.headers.get('Range') })
+        if not self.path in ['/{0}'.format(x['Filename']) for x in shared.download_files.values()]:
+            self.send_error(404)
+            return
+        data = server_state['Data'] or archive_data
+
+        # get start of content from range header
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header and range_header.startswith('bytes=') and range_header.endswith('-'):
+            start = int(range_header[len('bytes='):-1])
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */{0}'.format(len(data)))
+                self.end_headers()
+                return
+        content = data[start:]
+
+        self.send_response(206 if start > 0 else 200)
+        if start > 0:
+            self.send_header('Content-Range', 'bytes {0}-{1}/{2}'.format(
+                start, len(data) - 1, len(data)))
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        time.sleep(server_state['Delay'])
+        if server_state['Truncate'] > 0:
+            server_state['Truncate'] -= 1
+            content = content[:len(content) // 2]
+        self.wfile.write(content)
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        """Log Message"""
+
+# start local http server on free port, returns server and base url
+def start_server():
+    """Start Server"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ArchiveRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return (server, 'http://127.0.0.1:{0}'.format(server.server_address[1]))
+
+# reset download cache and requests received by local http server
+def reset(cache_path):
+    """Reset"""
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.makedirs(cache_path)
+    server_state['Requests'] = []
+    server_state['Truncate'] = 0
+    server_state['Delay'] = 0
+    server_state['Data'] = None
+
+# get names of files in download cache, index and partial files excluded
+def get_cached_files(cache_path):
+    """Get Cached Files"""
+    cached_files = []
+    for (root, directories, filenames) in os.walk(cache_path):
+        cached_files.extend([os.path.join(root, x) for x in filenames if x != 'index.json' and not x.startswith('.')])
+    return cached_files
+
+# test download is rejected, if it doesn't match digest pinned in download files or pinned with environment
+# variable for archive not versioned
+def test_digest_mismatch(cache_path, download_path):
+    """Test Digest Mismatch"""
+    environment_variable = 'HST_IMAGER_DOWNLOAD_SHA256_{0}'.format(unversioned_archive_name.upper())
+    shared.download_files[archive_name]['Sha256'] = '0' * 64
+    os.environ[environment_variable] = '0' * 64
+    try:
+        for name in [archive_name, unversioned_archive_name]:
+            try:
+                shared.get_download_path(name, download_path)
+                return 'download of \'{0}\' with mismatching digest was accepted'.format(name)
+            except SystemExit:
+                pass
+    finally:
+        shared.download_files[archive_name]['Sha256'] = None
+        del os.environ[environment_variable]
+    if len(get_cached_files(cache_path)) > 0:
+        return 'download with mismatching digest was cached'
+    return None
+
+# test versioned archive ignores digest pinned with environment variable
+def test_versioned_digest_override(cache_path, download_path):
+    """Test Versioned Digest Override"""
+    environment_variable = 'HST_IMAGER_DOWNLOAD_SHA256_{0}'.format(archive_name.upper())
+    shared.download_files[archive_name]['Sha256'] = '0' * 64
+    os.environ[environment_variable] = hashlib.sha256(archive_data).hexdigest()
+    try:
+        shared.get_download_path(archive_name, download_path)
+        return 'digest of versioned archive was overridden by environment variable'
+    except SystemExit:
+        return None
+    finally:
+        shared.download_files[archive_name]['Sha256'] = None
+        del os.environ[environment_variable]
+
+# test corrupt archive is rejected and not cached, when no digest is pinned
+def test_corrupt_archive(cache_path, download_path):
+    """Test Corrupt Archive"""
+    server_state['Data'] = archive_data[:1024 * 1024] + os.urandom(16) + archive_data[1024 * 1024 + 16:]
+    try:
+        shared.get_download_path(unversioned_archive_name, download_path)
+        return 'corrupt archive was accepted'
+    except SystemExit:
+        pass
+    if len(get_cached_files(cache_path)) > 0:
+        return 'corrupt archive was cached'
+    return None
+
+# test truncated download is resumed with range request and matches pinned digest
+def test_truncated_download(cache_path, download_path):
+    """Test Truncated Download"""
+    shared.download_files[archive_name]['Sha256'] = hashlib.sha256(archive_data).hexdigest()
+    server_state['Truncate'] = 1
+    try:
+        downloaded_path = shared.fetch_downloads([archive_name], download_path)[archive_name].result()
+    finally:
+        shared.download_files[archive_name]['Sha256'] = None
+    with open(downloaded_path, 'rb') as file:
+        if file.read() != archive_data:
+            return 'truncated download was not re-fetched'
+    if len(server_state['Requests']) != 2 or server_state['Requests'][1]['Range'] is None:
+        return 'truncated download was not resumed with range request, requests {0}'.format(server_state['Requests'])
+    return None
+
+# test first download of archive not versioned is trusted and cached file is used without downloading again
+def test_trust_on_first_use(cache_path, download_path):
+    """Test Trust On First Use"""
+    downloaded_path = shared.get_download_path(unversioned_archive_name, download_path)
+    if shared.get_download_path(unversioned_archive_name, download_path) != downloaded_path:
+        return 'cached download was not used'
+    if len(server_state['Requests']) != 1:
+        return 'cached download was downloaded again, requests {0}'.format(server_state['Requests'])
+
+    # corrupt cached file is removed and downloaded again
+    with open(downloaded_path, 'ab') as file:
+        file.write(b'corrupt')
+    if shared.get_download_path(unversioned_archive_name, download_path) != downloaded_path or \
+            len(server_state['Requests']) != 2:
+        return 'corrupt cached download was not downloaded again'
+    return None
+
+# test concurrent processes downloading same url, partial file is locked by one process and other process
+# uses cached file, when download is done
+def test_concurrent_downloads(cache_path, download_path):
+    """Test Concurrent Downloads"""
+    server_state['Delay'] = 1
+    script = 'import sys, shared; print(shared.get_download_path(sys.argv[1], sys.argv[2]))'
+    processes = [subprocess.Popen([sys.executable, '-c', script, archive_name, download_path],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.PIPE,
+                                  text=True) for x in range(2)]
+    outputs = [x.communicate()[0].strip().splitlines() for x in processes]
+    if any([x.returncode != 0 for x in processes]):
+        return 'concurrent download failed'
+    downloaded_paths = set([x[-1] for x in outputs])
+    if len(downloaded_paths) != 1:
+        return 'concurrent downloads returned different paths {0}'.format(downloaded_paths)
+    with open(downloaded_paths.pop(), 'rb') as file:
+        if file.read() != archive_data:
+            return 'concurrent downloads corrupted download'
+    if len(server_state['Requests']) != 1:
+        return 'url was downloaded by both processes, requests {0}'.format(server_state['Requests'])
+    return None
+
+tests = [
+    ('digest mismatch', test_digest_mismatch),
+    ('versioned digest override', test_versioned_digest_override),
+    ('corrupt archive', test_corrupt_archive),
+    ('truncated download', test_truncated_download),
+    ('trust on first use', test_trust_on_first_use),
+    ('concurrent downloads', test_concurrent_downloads)
+]
+
+test_path = tempfile.mkdtemp(prefix='hst-imager-test-downloads-')
+cache_path = os.path.join(test_path, 'cache')
+download_path = os.path.join(test_path, 'downloads')
+os.makedirs(download_path)
+(server, base_url) = start_server()
+os.environ['HST_IMAGER_DOWNLOAD_BASE_URL'] = base_url
+os.environ['HST_IMAGER_DOWNLOAD_CACHE'] = cache_path
+os.environ.pop('HST_IMAGER_DOWNLOAD_MIRROR', None)
+
+failed = 0
+try:
+    for (name, test) in tests:
+        reset(cache_path)
+        error = test(cache_path, download_path)
+        print('{0}: {1}'.format(name, 'Failed, {0}'.format(error) if error else 'Passed'))
+        if error:
+            failed += 1
+finally:
+    server.shutdown()
+    shutil.rmtree(test_path, ignore_errors=True)
+
+if failed > 0:
+    print('Error: {0} of {1} tests failed'.format(failed, len(tests)))
+    exit(1)
+print('{0} tests passed'.format(len(tests)))
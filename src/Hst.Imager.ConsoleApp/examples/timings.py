@@ -0,0 +1,226 @@
+﻿# Timings
+# -------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script with shared functions to record timings of operations run by example scripts in a SQLite
+# database and estimate duration of planned operations. Timings are normalized by number of commands, bytes
+# and files of each operation, so plans of any size are estimated from previous runs. Estimates are used by
+# dry runs to print plans and by runs to print a live eta.
+
+"""Timings"""
+
+import os
+import sqlite3
+import time
+import shared
+
+# timings version, database is recreated, if created by other version
+timings_version = 1
+
+# number of most recent timings kept per operation and used to fit timing model
+timings_samples = 1000
+
+# minimum number of timings to fit timing model, default timing model is scaled to fewer timings
+timings_min_samples = 10
+
+# seconds between eta printed during run
+eta_print_interval = 30
+
+# default timing models used until timings are recorded, seconds per command, per mb and per file
+default_timing_models = {
+    'create image': (10.0, 0.0, 0.0),
+    'create dh0 partition image': (10.0, 0.0, 0.0),
+    'mkdir': (0.05, 0.0, 0.0),
+    'extract whdload': (0.2, 1 / 30.0, 0.002),
+    'stage whdload': (0.2, 1 / 60.0, 0.001),
+    'copy staged': (0.2, 1 / 30.0, 0.002),
+    'install mkdir': (0.05, 0.0, 0.0),
+    'install extract': (0.5, 0.0, 0.0),
+    'install copy': (0.3, 0.0, 0.0)
+}
+default_timing_model = (1.0, 1 / 30.0, 0.002)
+
+# get timings path, shared by all example scripts on host
+def get_timings_path():
+    """Get Timings Path"""
+    if os.environ.get('HST_IMAGER_TIMINGS'):
+        return os.environ['HST_IMAGER_TIMINGS']
+    return os.path.join(os.path.dirname(shared.get_download_cache_path()), 'timings.sqlite')
+
+# is timings enabled, timings are disabled, if timings is set to off
+def is_timings_enabled():
+    """Is Timings Enabled"""
+    return os.environ.get('HST_IMAGER_TIMINGS', '').lower() != 'off'
+
+# open timings, returns none, if timings are disabled. tables are created, if timings don't exist or are created by
+# other version
+def open_timings():
+    """Open Timings"""
+    if not is_timings_enabled():
+        return None
+    timings_path = get_timings_path()
+    if os.path.dirname(timings_path):
+        os.makedirs(os.path.dirname(timings_path), exist_ok=True)
+    connection = sqlite3.connect(timings_path, timeout=60)
+    if connection.execute('PRAGMA user_version').fetchone()[0] != timings_version:
+        with connection:
+            connection.execute('DROP TABLE IF EXISTS timings')
+            connection.execute('CREATE TABLE timings (operation TEXT, count INTEGER, size INTEGER, files INTEGER, '
+                               'duration REAL, recorded_at REAL)')
+            connection.execute('CREATE INDEX timings_operation ON timings (operation)')
+            connection.execute('PRAGMA user_version = {0}'.format(timings_version))
+    return connection
+
+# record timings of operation, each timing is count, size, files and duration. only most recent timings are kept
+def record_timings(connection, operation, timings):
+    """Record Timings"""
+    if connection is None or len(timings) == 0:
+        return
+    with connection:
+        connection.executemany('INSERT INTO timings VALUES (?, ?, ?, ?, ?, ?)', [
+            (operation, x[0], x[1], x[2], x[3], time.time()) for x in timings])
+        connection.execute('DELETE FROM timings WHERE operation = ? AND rowid NOT IN (SELECT rowid FROM timings '
+                           'WHERE operation = ? ORDER BY rowid DESC LIMIT ?)', (operation, operation, timings_samples))
+
+# get timing features, number of commands, mb and files
+def get_timing_features(count, size, files):
+    """Get Timing Features"""
+    return (count, size / (1024 * 1024), files)
+
+# solve linear equations using gaussian elimination, returns none, if equations have no unique solution
+def solve_linear_equations(matrix, vector):
+    """Solve Linear Equations"""
+    rows = [list(row) + [value] for (row, value) in zip(matrix, vector)]
+    for column in range(len(rows)):
+        pivot = max(range(column, len(rows)), key=lambda x: abs(rows[x][column]))
+        if abs(rows[pivot][column]) < 1e-9:
+            return None
+        (rows[column], rows[pivot]) = (rows[pivot], rows[column])
+        for row in range(len(rows)):
+            if row != column:
+                factor = rows[row][column] / rows[column][column]
+                rows[row] = [x - factor * y for (x, y) in zip(rows[row], rows[column])]
+    return [rows[x][-1] / rows[x][x] for x in range(len(rows))]
+
+# fit timing model to samples of features and duration by least squares. features, which are zero in all samples,
+# keep coefficient of default model. returns none, if fit has no unique solution or negative coefficients
+def fit_timing_model(samples, default_model):
+    """Fit Timing Model"""
+    used = [x for x in range(len(default_model)) if any([s[0][x] for s in samples])]
+    if len(used) == 0:
+        return None
+    matrix = [[sum([s[0][i] * s[0][j] for s in samples]) for j in used] for i in used]
+    vector = [sum([s[0][i] * s[1] for s in samples]) for i in used]
+    coefficients = solve_linear_equations(matrix, vector)
+    if coefficients is None or any([x < 0 for x in coefficients]):
+        return None
+    model = list(default_model)
+    for (index, coefficient) in zip(used, coefficients):
+        model[index] = coefficient
+    return tuple(model)
+
+# get timing model of operation fitted to recorded timings. default timing model is scaled to recorded timings,
+# if too few timings are recorded or they can't be fitted
+def get_timing_model(connection, operation):
+    """Get Timing Model"""
+    default_model = default_timing_models.get(operation, default_timing_model)
+    samples = [] if connection is None else [(get_timing_features(x[0], x[1], x[2]), x[3]) for x in connection.execute(
+        'SELECT count, size, files, duration FROM timings WHERE operation = ? ORDER BY rowid DESC LIMIT ?',
+        (operation, timings_samples))]
+    coefficients = fit_timing_model(samples, default_model) if len(samples) >= timings_min_samples else None
+    if coefficients is None and len(samples) > 0:
+        estimated = sum([get_model_duration(default_model, x[0]) for x in samples])
+        scale = sum([x[1] for x in samples]) / estimated if estimated > 0 else 1.0
+        coefficients = tuple([x * scale for x in default_model])
+    return { 'Operation': operation, 'Coefficients': coefficients or default_model, 'Samples': len(samples) }
+
+# get model duration of features
+def get_model_duration(coefficients, features):
+    """Get Model Duration"""
+    return sum([x * y for (x, y) in zip(coefficients, features)])
+
+# create plan operation of commands with number of commands, bytes and files. operations run by jobs in parallel
+# are estimated to take a part of their duration. operations with estimated size are not recorded
+def plan_operation(operation, commands, count = 1, size = 0, files = 0, jobs = 1, estimated = False):
+    """Plan Operation"""
+    return { 'Operation': operation, 'Commands': commands, 'Count': count, 'Size': size, 'Files': files,
+             'Jobs': jobs, 'Estimated': estimated }
+
+# estimate plan, estimate is set for each operation in plan. returns timing models by operation
+def estimate_plan(connection, plan, models = None):
+    """Estimate Plan"""
+    models = models if models is not None else {}
+    for operation in plan:
+        if not operation['Operation'] in models:
+            models[operation['Operation']] = get_timing_model(connection, operation['Operation'])
+        operation['Estimate'] = get_model_duration(models[operation['Operation']]['Coefficients'], get_timing_features(
+            operation['Count'], operation['Size'], operation['Files'])) / operation['Jobs']
+    return models
+
+# format duration in hours, minutes and seconds
+def format_duration(seconds):
+    """Format Duration"""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return '{0}h {1:02d}m {2:02d}s'.format(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+    if seconds >= 60:
+        return '{0}m {1:02d}s'.format(seconds // 60, seconds % 60)
+    return '{0}s'.format(seconds)
+
+# print plan summary, number of commands, bytes, files and estimate per operation and if estimated from recorded
+# timings or default timing model
+def print_plan(plan, models):
+    """Print Plan"""
+    operations = {}
+    for operation in plan:
+        summary = operations.setdefault(operation['Operation'], { 'Count': 0, 'Size': 0, 'Files': 0, 'Estimate': 0.0 })
+        for key in ['Count', 'Size', 'Files', 'Estimate']:
+            summary[key] = summary[key] + operation[key]
+    for name, summary in operations.items():
+        samples = models[name]['Samples']
+        print('- {0}: {1} commands, {2:.1f}mb, {3} files, estimated {4} from {5}'.format(
+            name, summary['Count'], summary['Size'] / (1024 * 1024), summary['Files'],
+            format_duration(summary['Estimate']), '{0} timings'.format(samples) if samples else 'defaults'))
+    print('Estimated time {0}'.format(format_duration(sum([x['Estimate'] for x in plan]))))
+
+# create run of plan, timings of done operations are recorded and eta is updated from estimates of operations
+def create_run(connection, plan, models):
+    """Create Run"""
+    now = time.monotonic()
+    return { 'Connection': connection, 'Models': models, 'Timings': {}, 'Estimate': sum([x['Estimate'] for x in plan]),
+             'Done': 0.0, 'StartTime': now, 'PrintTime': now }
+
+# get eta of run, remaining estimate is scaled by how much faster or slower done operations were than estimated
+def get_eta(run):
+    """Get ETA"""
+    remaining = max(0.0, run['Estimate'] - run['Done'])
+    if run['Done'] > 0:
+        remaining = remaining * (time.monotonic() - run['StartTime']) / run['Done']
+    return remaining
+
+# flush timings of run to timings database
+def flush_run(run):
+    """Flush Run"""
+    for (operation, timings) in run['Timings'].items():
+        record_timings(run['Connection'], operation, timings)
+    run['Timings'] = {}
+
+# done operation of run, timing is recorded, if size of operation is not estimated, and eta is printed and timings
+# are flushed every eta print interval. operations done, which are not in plan, are estimated for eta
+def done_operation(run, operation, duration):
+    """Done Operation"""
+    if not operation['Estimated']:
+        run['Timings'].setdefault(operation['Operation'], []).append(
+            (operation['Count'], operation['Size'], operation['Files'], duration))
+    if not 'Estimate' in operation:
+        estimate_plan(run['Connection'], [operation], run['Models'])
+    run['Done'] = run['Done'] + operation['Estimate']
+
+    now = time.monotonic()
+    if now - run['PrintTime'] >= eta_print_interval:
+        run['PrintTime'] = now
+        flush_run(run)
+        print('ETA {0}, {1:.0f}% done'.format(format_duration(get_eta(run)),
+                                              min(100.0, 100 * run['Done'] / run['Estimate']) if run['Estimate'] else 100))
@@ -0,0 +1,187 @@
+﻿# Verify
+# ------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script with shared functions to verify files extracted to image files by example scripts.
+# Target directory in image file is listed once and names and sizes are compared with entries of
+# archives from WHDLoad index. Content of a random sample of files is extracted from archives and
+# copied from image file in parallel and compared by sha256.
+
+"""Verify"""
+
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import concurrent.futures
+import shared
+import whdloadindex
+
+# verify report version
+verify_report_version = 1
+
+# add verify arguments to argument parser of example script
+def add_verify_arguments(parser):
+    """Add Verify Arguments"""
+    parser.add_argument('--verify', action='store_true',
+                        help='Verify names and sizes of files in image file against archives and compare content of '
+                        'a random sample of files.')
+    parser.add_argument('--verify-sample', default='20',
+                        help='Number or percent of files compared by content, e.g. 50 or 5%% (default = 20).')
+    parser.add_argument('--verify-seed', type=int,
+                        help='Seed used to select random sample of files, so sample can be repeated.')
+    parser.add_argument('--verify-report',
+                        help='Path to write json verify report to.')
+
+# get sample size from number or percent of files
+def get_sample_size(sample, files):
+    """Get Sample Size"""
+    percent_match = re.search(r'^(\d+(?:\.\d+)?)%$', str(sample).strip())
+    if percent_match:
+        return min(files, int(round(files * float(percent_match.group(1)) / 100)))
+    if not re.search(r'^\d+$', str(sample).strip()):
+        print('Error: Invalid verify sample \'{0}\', sample must be a number or percent'.format(sample))
+        exit(1)
+    return min(files, int(sample))
+
+# get name parts of entry name, hst imager uses / or \ as separator depending on host
+def get_name_parts(name):
+    """Get Name Parts"""
+    return [x for x in re.split(r'[\\/]', name) if x]
+
+# get expected entries from sources of archives, prefix and entries indexed by lower case name like
+# amiga file systems. entries extracted from more than one archive have a source for each archive
+def get_expected_entries(sources):
+    """Get Expected Entries"""
+    expected_entries = {}
+    for (archive_path, prefix, entries) in sources:
+        for entry in entries:
+            name = '/'.join(get_name_parts(prefix) + get_name_parts(entry['name']))
+            expected_entry = expected_entries.setdefault(name.lower(), { 'Name': name, 'Type': entry['type'],
+                                                                         'Sources': [] })
+            expected_entry['Sources'].append({ 'ArchivePath': archive_path, 'Name': entry['name'],
+                                               'Size': entry['size'] })
+    return expected_entries
+
+# get sha256 of single file in directory, returns none, if directory doesn't have one file
+def get_extracted_file_hash(dir_path):
+    """Get Extracted File Hash"""
+    file_paths = [os.path.join(root, x) for (root, directories, filenames) in os.walk(dir_path) for x in filenames]
+    return shared.get_file_hash(file_paths[0]) if len(file_paths) == 1 else None
+
+# verify content of file by extracting it from archive and copying it from image file with hst imager.
+# returns none, if content is identical
+def verify_file_content(hst_imager_path, target_path, expected_entry, work_path):
+    """Verify File Content"""
+    source = expected_entry['Sources'][0]
+    sample_path = tempfile.mkdtemp(prefix='.verify-', dir=work_path)
+    try:
+        archive_dir_path = os.path.join(sample_path, 'archive')
+        image_dir_path = os.path.join(sample_path, 'image')
+        os.makedirs(archive_dir_path)
+        os.makedirs(image_dir_path)
+        for commands in [
+            [hst_imager_path, 'fs', 'extract', os.path.join(source['ArchivePath'], *get_name_parts(source['Name'])),
+             archive_dir_path],
+            [hst_imager_path, 'fs', 'copy', os.path.join(target_path, *get_name_parts(expected_entry['Name'])),
+             image_dir_path]]:
+            (return_code, stdout, stderr) = shared.run_process(
+                commands + ['--quiet', '--force', '--uaemetadata', 'None'], subprocess.PIPE, subprocess.STDOUT)
+            if return_code:
+                return { 'Name': expected_entry['Name'], 'Reason': 'command \'{0}\' failed'.format(
+                    ' '.join(commands[1:3])) }
+        archive_hash = get_extracted_file_hash(archive_dir_path)
+        image_hash = get_extracted_file_hash(image_dir_path)
+        if archive_hash is None or archive_hash != image_hash:
+            return { 'Name': expected_entry['Name'], 'Reason': 'content differs', 'ArchiveSha256': archive_hash,
+                     'ImageSha256': image_hash }
+        return None
+    finally:
+        shutil.rmtree(sample_path, ignore_errors=True)
+
+# verify image, target path in image file is listed once and compared with expected entries from sources.
+# content of sample of files extracted from one archive and with expected size is compared in parallel
+def verify_image(hst_imager_path, target_path, sources, sample, jobs, seed = None, work_path = None):
+    """Verify Image"""
+    expected_entries = get_expected_entries(sources)
+    image_entries = dict([('/'.join(get_name_parts(x['name'])).lower(), x)
+                          for x in shared.get_entries(hst_imager_path, target_path)])
+
+    # compare names, types and sizes
+    missing = []
+    size_mismatches = []
+    sample_entries = []
+    for (key, expected_entry) in sorted(expected_entries.items()):
+        image_entry = image_entries.get(key)
+        if image_entry is None:
+            missing.append(expected_entry['Name'])
+        elif expected_entry['Type'] == 1 and (image_entry['type'] != 1 or
+                                                not image_entry['size'] in [x['Size'] for x in expected_entry['Sources']]):
+            size_mismatches.append({ 'Name': expected_entry['Name'], 'Size': image_entry['size'],
+                                     'ExpectedSizes': sorted(set([x['Size'] for x in expected_entry['Sources']])) })
+        elif expected_entry['Type'] == 1 and len(expected_entry['Sources']) == 1:
+            sample_entries.append(expected_entry)
+
+    # compare content of random sample of files in parallel
+    sample_entries = random.Random(seed).sample(sample_entries, get_sample_size(sample, len(sample_entries)))
+    work_path = work_path or os.getcwd()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        content_mismatches = [x for x in executor.map(
+            lambda x: verify_file_content(hst_imager_path, target_path, x, work_path), sample_entries) if x]
+
+    return {
+        'Version': verify_report_version,
+        'Target': target_path,
+        'Checked': len(expected_entries),
+        'Sampled': len(sample_entries),
+        'Unexpected': len([x for x in image_entries if not x in expected_entries]),
+        'Missing': missing,
+        'SizeMismatches': size_mismatches,
+        'ContentMismatches': content_mismatches
+    }
+
+# is verify report ok, no files are missing or mismatched
+def is_verify_report_ok(report):
+    """Is Verify Report Ok"""
+    return len(report['Missing']) + len(report['SizeMismatches']) + len(report['ContentMismatches']) + \
+        len(report.get('Unlisted', [])) == 0
+
+# print verify report, mismatches are listed up to max lines
+def print_verify_report(report, max_lines = 20):
+    """Print Verify Report"""
+    print('Verified {0} entries in \'{1}\', content of {2} files compared: {3} missing, {4} size mismatches, '
+          '{5} content mismatches, {6} unexpected'.format(
+              report['Checked'], report['Target'], report['Sampled'], len(report['Missing']),
+              len(report['SizeMismatches']), len(report['ContentMismatches']), report['Unexpected']))
+    lines = ['- {0}: not listed'.format(x) for x in report.get('Unlisted', [])] + \
+        ['- {0}: missing'.format(x) for x in report['Missing']] + \
+        ['- {0}: size {1}, expected {2}'.format(x['Name'], x['Size'], ' or '.join([str(s) for s in x['ExpectedSizes']]))
+         for x in report['SizeMismatches']] + \
+        ['- {0}: {1}'.format(x['Name'], x['Reason']) for x in report['ContentMismatches']]
+    for line in lines[:max_lines]:
+        print(line)
+    if len(lines) > max_lines:
+        print('- {0} more mismatches'.format(len(lines) - max_lines))
+
+# write verify reports to json file
+def write_verify_reports(report_path, reports):
+    """Write Verify Reports"""
+    with open(report_path, 'w', encoding='utf-8') as file:
+        json.dump(reports, file, indent=2)
+
+# verify whdload archives extracted to target path in image file with entries from whdload index.
+# entries of archives are prefixed with index dir, if use index dir
+def verify_whdload_archives(hst_imager_path, target_path, whdload_archives, use_index_dir, sample, jobs,
+                            seed = None, work_path = None):
+    """Verify WHDLoad Archives"""
+    archives_entries = whdloadindex.get_whdload_archives_entries(hst_imager_path, whdload_archives, jobs)
+    sources = [(x['Path'], x['IndexDir'] if use_index_dir else '', archives_entries[x['Path']])
+               for x in whdload_archives if archives_entries[x['Path']] is not None]
+    report = verify_image(hst_imager_path, target_path, sources, sample, jobs, seed, work_path)
+    report['Unlisted'] = [x['Filename'] for x in whdload_archives if archives_entries[x['Path']] is None]
+    return report
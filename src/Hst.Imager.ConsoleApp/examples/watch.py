@@ -0,0 +1,152 @@
+﻿# Watch
+# -----
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script with shared functions to watch a directory recursively for new and changed files.
+# Directories are watched with inotify on linux and polled on other operating systems, or if inotify
+# fails. Files are stable, when size and modified time are unchanged for settle seconds, so files
+# still being copied to the directory are not read.
+
+"""Watch"""
+
+import ctypes
+import ctypes.util
+import os
+import platform
+import select
+import struct
+import time
+
+# inotify flags and events for files written, moved and deleted and directories created
+in_modify = 0x00000002
+in_close_write = 0x00000008
+in_moved_from = 0x00000040
+in_moved_to = 0x00000080
+in_create = 0x00000100
+in_delete = 0x00000200
+in_q_overflow = 0x00004000
+in_isdir = 0x40000000
+in_nonblock = 0o4000
+in_cloexec = 0o2000000
+inotify_events = in_modify | in_close_write | in_moved_from | in_moved_to | in_create | in_delete
+
+# inotify event header, watch descriptor, mask, cookie and length of name following header
+inotify_event_header = struct.Struct('iIII')
+
+# load libc with inotify functions, returns none, if inotify is not supported
+def load_inotify():
+    """Load Inotify"""
+    if platform.system() != 'Linux':
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+# open watcher of directory, directory and it's sub directories are watched with inotify, if supported and
+# not poll. otherwise directory is polled
+def open_watcher(path, poll = False):
+    """Open Watcher"""
+    watcher = { 'Path': path, 'Libc': None, 'Fd': None, 'Directories': {} }
+    libc = None if poll else load_inotify()
+    if libc is None:
+        return watcher
+    fd = libc.inotify_init1(in_nonblock | in_cloexec)
+    if fd < 0:
+        print('Warning: Failed to initialize inotify: {0}, polling instead'.format(os.strerror(ctypes.get_errno())))
+        return watcher
+    watcher['Libc'] = libc
+    watcher['Fd'] = fd
+    add_watches(watcher, path)
+    return watcher
+
+# is polling, if directory is not watched with inotify
+def is_polling(watcher):
+    """Is Polling"""
+    return watcher['Fd'] is None
+
+# close watcher
+def close_watcher(watcher):
+    """Close Watcher"""
+    if watcher['Fd'] is not None:
+        os.close(watcher['Fd'])
+        watcher['Fd'] = None
+
+# add inotify watches of directory and it's sub directories. watcher is closed and directory is polled instead,
+# if a watch can't be added, e.g. when max user watches is reached
+def add_watches(watcher, path):
+    """Add Watches"""
+    for (root, directories, filenames) in os.walk(path):
+        wd = watcher['Libc'].inotify_add_watch(watcher['Fd'], os.fsencode(root), inotify_events)
+        if wd < 0:
+            print('Warning: Failed to watch directory \'{0}\': {1}, polling instead'.format(
+                root, os.strerror(ctypes.get_errno())))
+            close_watcher(watcher)
+            return
+        watcher['Directories'][wd] = root
+
+# read inotify events, watches are added for directories created or moved into watched directories.
+# returns number of events read
+def read_events(watcher):
+    """Read Events"""
+    events = 0
+    while watcher['Fd'] is not None:
+        try:
+            data = os.read(watcher['Fd'], 64 * 1024)
+        except BlockingIOError:
+            break
+        offset = 0
+        while offset < len(data):
+            (wd, mask, cookie, length) = inotify_event_header.unpack_from(data, offset)
+            name = data[offset + inotify_event_header.size:offset + inotify_event_header.size + length].rstrip(b'\0')
+            offset += inotify_event_header.size + length
+            events += 1
+            if mask & in_isdir and mask & (in_create | in_moved_to) and wd in watcher['Directories']:
+                add_watches(watcher, os.path.join(watcher['Directories'][wd], os.fsdecode(name)))
+                if watcher['Fd'] is None:
+                    break
+    return events
+
+# wait for changes in watched directory for timeout seconds or until changed, if timeout is none. changes are
+# collected for window seconds after first change, so files copied together are changed together. polling
+# waits for timeout or window seconds. returns true, if directory may have changed
+def wait_for_changes(watcher, timeout, window):
+    """Wait For Changes"""
+    if is_polling(watcher):
+        time.sleep(timeout if timeout is not None else window)
+        return True
+
+    (readable, writable, exceptional) = select.select([watcher['Fd']], [], [], timeout)
+    if not readable:
+        return False
+    end_time = time.monotonic() + window
+    while not is_polling(watcher):
+        read_events(watcher)
+        remaining = end_time - time.monotonic()
+        if remaining <= 0 or is_polling(watcher):
+            break
+        select.select([watcher['Fd']], [], [], remaining)
+    return True
+
+# get stable files, files with same size and modified time for settle seconds. size and modified time of files
+# not stable yet are observed, stable files and files no longer found are not observed
+def get_stable_files(files, observed, settle):
+    """Get Stable Files"""
+    now = time.monotonic()
+    stable_files = []
+    for file in files:
+        state = (file['Size'], file['Mtime'])
+        observation = observed.get(file['Path'])
+        if observation is None or observation[0] != state:
+            observed[file['Path']] = (state, now)
+        elif now - observation[1] >= settle:
+            stable_files.append(file)
+    paths = set([x['Path'] for x in files if not x in stable_files])
+    for path in [x for x in observed if not x in paths]:
+        del observed[path]
+    return stable_files
@@ -7,26 +7,382 @@
 #
 # A python script to convert a WHDLoad .lha file to an amiga harddisk file 
 # using Hst Imager console.
+#
+# Usage:
+# - whdload-to-hdf.py: Convert selected WHDLoad .lha file to image file.
+# - whdload-to-hdf.py --batch whdloads --output-dir hdfs: Convert all WHDLoad files in directory to
+#   image files in parallel. Image files are only converted again, if WHDLoad file or options changed.
+#   Entries of WHDLoad files are read from WHDLoad index, see index-whdloads.py.
+# - whdload-to-hdf.py --batch whdloads --headless --set use_amigaos_31=yes --set use_pfs3=yes: Convert
+#   WHDLoad files without prompts, e.g. in CI. Answers can also be set in a TOML or JSON config file
+#   with --config or environment variables, e.g. HST_IMAGER_USE_PFS3=yes.
+# - whdload-to-hdf.py --batch whdloads --optimize --compress zip xz: Optimize image files and create .zip and
+#   .xz artifacts compressed in parallel with sha256 sums and json artifact manifest per image file.
+# - whdload-to-hdf.py --batch whdloads --verify --verify-report verify.json: Verify names and sizes of
+#   extracted files against WHDLoad file and compare content of a random sample of files. Image files
+#   failing verification are not replaced.
+# - HST_IMAGER_TRACE=trace.json whdload-to-hdf.py: Trace commands run to chrome trace file, which can be
+#   opened in Perfetto, and print slowest commands and time per command type when done.
 
 """WHDLoad to HDF"""
 
+import argparse
+import concurrent.futures
+import hashlib
 import os
 import platform
 import re
+import shutil
 import subprocess
 import json
 import codecs
 import unicodedata
 import shared
+import artifacts
+import verify
+import whdload
+import whdloadindex
+
+# arguments
+parser = argparse.ArgumentParser(description='WHDLoad to HDF')
+parser.add_argument('--batch',
+                    help='Directory with WHDLoad files to convert to image files.')
+parser.add_argument('--output-dir', default=os.getcwd(),
+                    help='Directory image files are created in (default = current directory).')
+parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                    help='Number of WHDLoad files converted in parallel in batch mode (default = number of cpus).')
+artifacts.add_artifact_arguments(parser)
+verify.add_verify_arguments(parser)
+shared.add_config_arguments(parser)
+args = parser.parse_args()
+shared.configure(args)
+
+# base image size step
+base_image_size_step = 8 * 1024 * 1024
+
+# get whdload slave paths from whdload lha entries
+def get_whdload_slave_paths(entries):
+    """Get WHDLoad Slave Paths"""
+    whdload_slave_paths = []
+    for entry in entries:
+        slave_match = re.search(r'\.slave$', entry['name'], re.I)
+        if slave_match:
+            whdload_slave_paths.append(entry['name'])
+    return whdload_slave_paths
+
+# create startup sequence lines starting whdload slave. if 1 then run directly, if more show request choice
+def create_startup_sequence_lines(whdload_slave_paths):
+    """Create Startup Sequence Lines"""
+    startup_sequence_lines = [
+        "C:SetPatch QUIET",
+        "C:Version >NIL:",
+        "FailAt 21",
+        "C:MakeDir RAM:T RAM:Clipboards RAM:ENV RAM:ENV/Sys",
+        "C:Assign T: RAM:T"
+    ]
+
+    if len(whdload_slave_paths) == 1:
+        whdload_slave_path = whdload_slave_paths[0]
+        startup_sequence_lines.append('cd "{0}"'.format(os.path.join('WHDLoad', os.path.dirname(whdload_slave_path)).replace('\\', '/')))
+        startup_sequence_lines.append('WHDLoad "{0}" PRELOAD'.format(os.path.basename(whdload_slave_path)))
+        return startup_sequence_lines
+
+    options = []
+    for whdload_slave_path in whdload_slave_paths:
+        options.append(os.path.splitext(os.path.basename(whdload_slave_path))[0])
+    startup_sequence_lines.append('set slave `RequestChoice "Start WHDLoad slave" "Select WHDLoad slave to start?" "{0}"`'.format('|'.join(options)))
+
+    option = 1
+    for whdload_slave_path in whdload_slave_paths:
+        if option == len(whdload_slave_paths):
+            option = 0
+
+        startup_sequence_lines.append('IF "$slave" EQ {0} VAL'.format(option))
+        startup_sequence_lines.append('  cd "{0}"'.format(os.path.join("WHDLoad", os.path.dirname(whdload_slave_path)).replace('\\', '/')))
+        startup_sequence_lines.append('  WHDLoad "{0}" PRELOAD'.format(os.path.basename(whdload_slave_path)))
+        startup_sequence_lines.append('  SKIP end')
+        startup_sequence_lines.append('ENDIF')
+
+        option = option + 1
+
+    startup_sequence_lines.append('LAB end')
+    return startup_sequence_lines
+
+# get whdload path in image file, whdload lha is extracted to
+def get_whdload_image_target_path(image_path):
+    """Get WHDLoad Image Target Path"""
+    return os.path.join(image_path, 'rdb', 'dh0', 'WHDLoad')
+
+# convert whdload lha to image file. amiga os adf and kickstart rom files must be present in image file directory
+def convert_whdload_lha(hst_imager_path, whdload_lha_path, entries, image_path, use_amigaos_31, use_pfs3,
+                        downloads, work_path):
+    """Convert WHDLoad Lha"""
+    image_dir = os.path.dirname(image_path)
+
+    # calculate disk size from file system usage of whdload lha entries with 10mb extra for amiga os,
+    # kickstart and whdload files
+    partition_size = shared.get_partition_size(entries, 'PDS3' if use_pfs3 else 'DOS3', 10 * 1024 * 1024)
+    disk_size = shared.get_image_size([partition_size])
+
+    # round disk size up to base image size step, so whdloads of similar size share cached base image
+    disk_size = -(-disk_size // base_image_size_step) * base_image_size_step
+
+    # get amiga os adf, kickstart rom and download files used by base image
+    input_paths = [
+        shared.get_amigaos_workbench_adf_path(image_dir, use_amigaos_31),
+        shared.get_amigaos_install_adf_path(image_dir, use_amigaos_31)
+    ]
+    shared.get_rom_files(shared.kickstart_rom_files, image_dir)
+    input_paths += shared.get_kickstart_rom_paths(image_dir)
+    input_paths += [downloads[x].result() for x in shared.minimal_whdload_downloads]
+
+    # build base image with minimal amiga os and whdload
+    def build_base_image():
+        print('Creating image file \'{0}\''.format(image_path))
+
+        # batch of commands to create image
+        batch_commands = []
+
+        # create blank image of calculated disk size
+        batch_commands.append([hst_imager_path, 'blank', image_path, str(disk_size)])
+
+        # initialize rigid disk block for entire disk
+        batch_commands.append([hst_imager_path, 'rdb', 'init', image_path])
+
+        if use_pfs3:
+            # add rdb file system pfs3aio with dos type PDS3
+            batch_commands.append([hst_imager_path, 'rdb', 'fs', 'add', image_path, 'pfs3aio', 'PDS3'])
+
+            # add rdb partition of entire disk with device name "DH0" and set bootable
+            batch_commands.append([hst_imager_path, 'rdb', 'part', 'add', image_path, 'DH0', 'PDS3', '*', '--bootable'])
+        else:
+            # add rdb file system fast file system with dos type DOS3 imported from amiga os install adf
+            batch_commands.append([hst_imager_path, 'rdb', 'fs', 'import', image_path, input_paths[1], '--dos-type', 'DOS3', '--name', 'FastFileSystem'])
+
+            # add rdb partition of entire disk with device name "DH0" and set bootable
+            batch_commands.append([hst_imager_path, 'rdb', 'part', 'add', image_path, 'DH0', 'DOS3', '*', '--bootable'])
+
+        # format rdb partition number 1 with volume name "WHDLoad"
+        batch_commands.append([hst_imager_path, 'rdb', 'part', 'format', image_path, '1', 'WHDLoad'])
+
+        # run batch of commands to create image
+        shared.run_batch_commands(batch_commands)
+
+        # install minimal amigaos
+        shared.install_minimal_amigaos(hst_imager_path, image_path, use_amigaos_31)
+
+        # install minimal whdload script
+        shared.install_minimal_whdload(hst_imager_path, image_path, downloads, work_path)
+
+    # create image from cached base image with same size, file system, amiga os and input files
+    base_image_key = shared.get_base_image_key(
+        ['whdload-to-hdf', disk_size, use_pfs3, use_amigaos_31, os.path.splitext(image_path)[1].lower()],
+        input_paths + [os.path.abspath(__file__)])
+    shared.create_cached_image(image_path, base_image_key, build_base_image)
+
+    # extract whdload lha to image file
+    batch_commands = []
+    batch_commands.append([hst_imager_path, 'fs', 'mkdir', get_whdload_image_target_path(image_path)])
+    batch_commands.append([hst_imager_path, 'fs', 'extract', whdload_lha_path, get_whdload_image_target_path(image_path), '--recursive', '--force'])
 
+    # write startup sequence to work path
+    startup_sequence_path = os.path.join(work_path, 'Startup-Sequence')
+    shared.write_text_lines_for_amiga(startup_sequence_path, create_startup_sequence_lines(get_whdload_slave_paths(entries)))
+
+    # copy startup sequence to image file
+    batch_commands.append([hst_imager_path, 'fs', 'copy', startup_sequence_path, os.path.join(image_path, 'rdb', 'dh0', 'S'), '--force'])
+
+    # run batch of commands to extract whdload and copy startup sequence
+    shared.run_batch_commands(batch_commands)
+
+# get input hashes of amiga os adf, kickstart rom, download and example script files, hashed once for all whdload
+# images. missing files are hashed as -, like base image key, so stamp changes when a file is added or removed
+def get_input_hashes(input_paths):
+    """Get Input Hashes"""
+    return [shared.get_file_hash(x) if os.path.isfile(x) else '-' for x in input_paths]
+
+# get whdload image stamp, hash of whdload lha, options and input hashes
+def get_whdload_image_stamp(whdload_lha_path, use_amigaos_31, use_pfs3, input_hashes):
+    """Get WHDLoad Image Stamp"""
+    stamp = hashlib.sha256()
+    stamp.update('{0}|{1}'.format(use_amigaos_31, use_pfs3).encode('utf-8'))
+    for sha256 in [shared.get_file_hash(whdload_lha_path)] + input_hashes:
+        stamp.update(sha256.encode('utf-8'))
+    return stamp.hexdigest()
+
+# get whdload image stamp path
+def get_whdload_image_stamp_path(image_path):
+    """Get WHDLoad Image Stamp Path"""
+    return '{0}.stamp'.format(image_path)
+
+# is whdload image unchanged, if image file exists and is converted from same whdload lha and options
+def is_whdload_image_unchanged(image_path, stamp):
+    """Is WHDLoad Image Unchanged"""
+    stamp_path = get_whdload_image_stamp_path(image_path)
+    if not os.path.isfile(image_path) or not os.path.isfile(stamp_path):
+        return False
+    with open(stamp_path, 'r', encoding='utf-8') as file:
+        return file.read().strip() == stamp
+
+# get whdload image names, name of whdload file without extension. whdload files with same name in different
+# sub directories or with different extensions get a hash of their path relative to batch path appended, so
+# their image files and work paths are unique. returns image name for each whdload file path
+def get_whdload_image_names(whdload_archives, batch_path):
+    """Get WHDLoad Image Names"""
+    names = {}
+    for whdload_archive in whdload_archives:
+        names.setdefault(os.path.splitext(whdload_archive['Filename'])[0].lower(), []).append(whdload_archive)
+    image_names = {}
+    for whdload_archive in whdload_archives:
+        name = os.path.splitext(whdload_archive['Filename'])[0]
+        if len(names[name.lower()]) > 1:
+            relative_path = os.path.relpath(whdload_archive['Path'], batch_path).replace('\\', '/')
+            name = '{0}-{1}'.format(name, hashlib.sha256(relative_path.encode('utf-8')).hexdigest()[:8])
+        image_names[whdload_archive['Path']] = name
+    return image_names
+
+# convert whdload lha to image file in batch with entries from whdload index, image file is created in work
+# directory and renamed to image path when done. image file is verified before renamed, if verify sample is set
+# and verify report is added to verify reports. returns status of conversion
+def convert_whdload_lha_batch(hst_imager_path, whdload_archive, entries, image_path, stamp, use_amigaos_31,
+                              use_pfs3, downloads, verify_sample = None, verify_seed = None, verify_reports = None):
+    """Convert WHDLoad Lha Batch"""
+    output_path = os.path.dirname(image_path)
+    name = os.path.splitext(os.path.basename(image_path))[0]
+
+    # work path for temporary files and image file, image file is created in output path to use amiga os adf
+    # and kickstart rom files present in output path
+    work_path = os.path.join(output_path, '.work-{0}'.format(hashlib.sha256(name.encode('utf-8')).hexdigest()[:16]))
+    if os.path.exists(work_path):
+        shutil.rmtree(work_path)
+    os.makedirs(work_path)
+    work_image_path = os.path.join(output_path, '.{0}.vhd'.format(name))
+
+    try:
+        if entries is None:
+            return 'Failed'
+        if len(get_whdload_slave_paths(entries)) == 0:
+            print('No WHDLoad slave files found in \'{0}\''.format(whdload_archive['Path']))
+            return 'Failed'
+        convert_whdload_lha(hst_imager_path, whdload_archive['Path'], entries, work_image_path, use_amigaos_31,
+                            use_pfs3, downloads, work_path)
+
+        # verify work image file, files are compared one at a time as whdload files are converted in parallel
+        if verify_sample is not None:
+            report = verify.verify_image(hst_imager_path, get_whdload_image_target_path(work_image_path),
+                                         [(whdload_archive['Path'], '', entries)], verify_sample, 1, verify_seed,
+                                         work_path)
+            report['Target'] = get_whdload_image_target_path(image_path)
+            verify_reports.append(report)
+            if not verify.is_verify_report_ok(report):
+                verify.print_verify_report(report)
+                os.remove(work_image_path)
+                return 'Failed'
+    except SystemExit:
+        if os.path.isfile(work_image_path):
+            os.remove(work_image_path)
+        return 'Failed'
+    finally:
+        shutil.rmtree(work_path, ignore_errors=True)
+
+    # replace image file and write stamp
+    os.replace(work_image_path, image_path)
+    with open(get_whdload_image_stamp_path(image_path), 'w', encoding='utf-8') as file:
+        file.write(stamp)
+    return 'Converted'
 
 # paths
 current_path = os.getcwd()
 script_path = os.path.dirname(__file__)
 hst_imager_path = shared.get_hst_imager_path(script_path)
 
+if args.batch:
+    # error, if batch directory is not found
+    if not os.path.isdir(args.batch):
+        print('Error: WHDLoads directory \'{0}\' doesn\'t exist'.format(args.batch))
+        exit(1)
+
+    # find whdload files to convert
+    whdload_archives = whdload.find_whdload_archives(args.batch)
+    output_path = os.path.abspath(args.output_dir)
+    if not os.path.isdir(output_path):
+        os.makedirs(output_path)
+
+    # confirm use amiga os 3.1 and pfs3 once for all whdload files
+    use_amigaos_31 = shared.confirm("Use Amiga OS 3.1 adf files", "enter = yes, no = 3.1+/other", 'use_amigaos_31')
+    use_pfs3 = shared.confirm("Use PFS3 file system?", "enter = yes, no = DOS3", 'use_pfs3')
+
+    # fetch minimal whdload downloads once for all whdload files
+    downloads = shared.fetch_downloads(shared.minimal_whdload_downloads, output_path)
+
+    # get amiga os adf and kickstart rom files to output path before converting, so jobs don't prompt for them
+    input_paths = [
+        shared.get_amigaos_workbench_adf_path(output_path, use_amigaos_31),
+        shared.get_amigaos_install_adf_path(output_path, use_amigaos_31)
+    ]
+    shared.get_rom_files(shared.kickstart_rom_files, output_path)
+    input_paths += shared.get_kickstart_rom_paths(output_path)
+    input_paths += [downloads[x].result() for x in shared.minimal_whdload_downloads]
+    input_paths += [os.path.join(script_path, 'shared.py'), __file__]
+    input_hashes = get_input_hashes(input_paths)
+
+    # get image path and stamp for each whdload file and skip unchanged image files
+    image_names = get_whdload_image_names(whdload_archives, args.batch)
+    def get_whdload_image(whdload_archive):
+        image_path = os.path.join(output_path, '{0}.vhd'.format(image_names[whdload_archive['Path']]))
+        stamp = get_whdload_image_stamp(whdload_archive['Path'], use_amigaos_31, use_pfs3, input_hashes)
+        return (whdload_archive, image_path, stamp)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        whdload_images = list(executor.map(get_whdload_image, whdload_archives))
+    changed_whdload_images = [x for x in whdload_images if not is_whdload_image_unchanged(x[1], x[2])]
+    results = { 'Unchanged': len(whdload_images) - len(changed_whdload_images) }
+    all_whdload_images = whdload_images
+    whdload_images = changed_whdload_images
+
+    # convert changed whdload files in parallel, each conversion runs hst imager processes
+    if len(whdload_images) > 0:
+        # get entries of changed whdload files from whdload index, only new and changed whdload files are listed
+        shared.set_trace_step('index whdloads')
+        archives_entries = whdloadindex.get_whdload_archives_entries(
+            hst_imager_path, [x[0] for x in whdload_images], args.jobs)
+
+        print('Converting {0} WHDLoads using {1} jobs'.format(len(whdload_images), args.jobs))
+        shared.set_trace_step('convert whdloads')
+        verify_reports = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {}
+            for (whdload_archive, image_path, stamp) in whdload_images:
+                futures[executor.submit(convert_whdload_lha_batch, hst_imager_path, whdload_archive,
+                                        archives_entries[whdload_archive['Path']], image_path, stamp,
+                                        use_amigaos_31, use_pfs3, downloads,
+                                        args.verify_sample if args.verify else None, args.verify_seed,
+                                        verify_reports)] = whdload_archive
+            for future in concurrent.futures.as_completed(futures):
+                status = future.result()
+                results[status] = results.get(status, 0) + 1
+                print('{0}: {1}'.format(os.path.relpath(futures[future]['Path'], args.batch), status))
+
+        # write verify reports of converted image files
+        if args.verify and args.verify_report:
+            verify.write_verify_reports(args.verify_report, verify_reports)
+
+    # optimize and compress converted and unchanged image files, image files already published are skipped
+    if args.optimize or args.compress:
+        shared.set_trace_step('publish images')
+        for (whdload_archive, image_path, stamp) in all_whdload_images:
+            if is_whdload_image_unchanged(image_path, stamp):
+                artifacts.publish_image(hst_imager_path, image_path, args.artifacts_dir, args.compress,
+                                        args.optimize, args.compress_jobs)
+
+    print('{0} converted, {1} unchanged, {2} failed'.format(
+        results.get('Converted', 0), results.get('Unchanged', 0), results.get('Failed', 0)))
+    if results.get('Failed', 0) > 0:
+        exit(1)
+    print('Done')
+    exit(0)
+
 # enter whdload lha file
-whdload_lha_path = shared.select_file_path('WHDLoad lha')
+whdload_lha_path = shared.select_file_path('WHDLoad lha', 'whdload_lha')
 if not os.path.isfile(whdload_lha_path):
     print('Error: WHDLoad lha file \'{0}\' not found'.format(whdload_lha_path))
     exit(1)
@@ -35,17 +391,8 @@ if not os.path.isfile(whdload_lha_path):
 whdload_lha_entries_json = shared.run_command_capture_output([hst_imager_path, 'fs', 'dir', whdload_lha_path, '--recursive', '--format', 'json'])
 whdload_lha_entries_dict = json.loads(whdload_lha_entries_json)
 
-# calculate disk size and get whdload slave paths
-disk_size = 0
-whdload_slave_paths = []
-for entry in whdload_lha_entries_dict['entries']:
-    disk_size += entry['size']
-    slave_match = re.search(r'\.slave$', entry['name'], re.I)
-    if slave_match:
-        whdload_slave_paths.append(entry['name'])
-
-# add 10mb extra for amiga os, kickstart and whdload files
-disk_size += 10 * 1024 * 1024
+# get whdload slave paths
+whdload_slave_paths = get_whdload_slave_paths(whdload_lha_entries_dict['entries'])
 
 # error, if whdload lha file doesn't contain any .slave files
 if len(whdload_slave_paths) == 0:
@@ -53,90 +400,36 @@ if len(whdload_slave_paths) == 0:
     exit(1)
 
 # confirm use amiga os 3.1
-use_amigaos_31 = shared.confirm("Use Amiga OS 3.1 adf files", "enter = yes, no = 3.1+/other")
+use_amigaos_31 = shared.confirm("Use Amiga OS 3.1 adf files", "enter = yes, no = 3.1+/other", 'use_amigaos_31')
 
 # confirm use pfs3 confirm 
-use_pfs3 = shared.confirm("Use PFS3 file system?", "enter = yes, no = DOS3")
+use_pfs3 = shared.confirm("Use PFS3 file system?", "enter = yes, no = DOS3", 'use_pfs3')
+
+# fetch minimal whdload downloads in background while image is created
+downloads = shared.fetch_downloads(shared.minimal_whdload_downloads, current_path)
 
 # get image path based on selected whdload lha
 image_path = os.path.join(current_path, '{0}.vhd'.format(os.path.splitext(os.path.basename(whdload_lha_path))[0]))
-print('Creating image file \'{0}\''.format(image_path))
-
-# create blank image of calculated disk size
-shared.run_command([hst_imager_path, 'blank', image_path, str(disk_size)])
-
-# initialize rigid disk block for entire disk
-shared.run_command([hst_imager_path, 'rdb', 'init', image_path])
-
-if use_pfs3:
-    # add rdb file system pfs3aio with dos type PDS3
-    shared.run_command([hst_imager_path, 'rdb', 'fs', 'add', image_path, 'pfs3aio', 'PDS3'])
-
-    # add rdb partition of entire disk with device name "DH0" and set bootable
-    shared.run_command([hst_imager_path, 'rdb', 'part', 'add', image_path, 'DH0', 'PDS3', '*', '--bootable'])
-else:
-    # get amigaos install adf path
-    amigaos_install_adf_path = shared.get_amigaos_install_adf_path(current_path, use_amigaos_31)
-    
-    # add rdb file system fast file system with dos type DOS3 imported from amiga os install adf
-    shared.run_command([hst_imager_path, 'rdb', 'fs', 'import', image_path, amigaos_install_adf_path, '--dos-type', 'DOS3', '--name', 'FastFileSystem'])
-
-    # add rdb partition of entire disk with device name "DH0" and set bootable
-    shared.run_command([hst_imager_path, 'rdb', 'part', 'add', image_path, 'DH0', 'DOS3', '*', '--bootable'])
-
-# format rdb partition number 1 with volume name "WHDLoad"
-shared.run_command([hst_imager_path, 'rdb', 'part', 'format', image_path, '1', 'WHDLoad'])
-
-# install minimal amigaos
-shared.install_minimal_amigaos(hst_imager_path, image_path, use_amigaos_31)
-
-# install minimal whdload script
-shared.install_minimal_whdload(hst_imager_path, image_path)
-
-# extract whdload lha to image file
-shared.run_command([hst_imager_path, 'fs', 'mkdir', os.path.join(image_path, 'rdb', 'dh0', 'WHDLoad')])
-shared.run_command([hst_imager_path, 'fs', 'extract', whdload_lha_path, os.path.join(image_path, 'rdb', 'dh0', 'WHDLoad'), '--recursive', '--force'])
-
-# create startup sequence
-startup_sequence_lines = [
-    "C:SetPatch QUIET",
-    "C:Version >NIL:",
-    "FailAt 21",
-    "C:MakeDir RAM:T RAM:Clipboards RAM:ENV RAM:ENV/Sys",
-    "C:Assign T: RAM:T"
-]
-
-# add start whdload slave. if 1 then run directly, if more show request choice
-if len(whdload_slave_paths) == 1:
-    whdload_slave_path = whdload_slave_paths[0]
-    startup_sequence_lines.append('cd "{0}"'.format(os.path.join('WHDLoad', os.path.dirname(whdload_slave_path)).replace('\\', '/')))
-    startup_sequence_lines.append('WHDLoad "{0}" PRELOAD'.format(os.path.basename(whdload_slave_path)))
-else:
-    options = []
-    for whdload_slave_path in whdload_slave_paths:
-        options.append(os.path.splitext(os.path.basename(whdload_slave_path))[0])
-    startup_sequence_lines.append('set slave `RequestChoice "Start WHDLoad slave" "Select WHDLoad slave to start?" "{0}"`'.format('|'.join(options)))
 
-    option = 1
-    for whdload_slave_path in whdload_slave_paths:
-        if option == len(whdload_slave_paths):
-            option = 0
-
-        startup_sequence_lines.append('IF "$slave" EQ {0} VAL'.format(option))
-        startup_sequence_lines.append('  cd "{0}"'.format(os.path.join("WHDLoad", os.path.dirname(whdload_slave_path)).replace('\\', '/')))
-        startup_sequence_lines.append('  WHDLoad "{0}" PRELOAD'.format(os.path.basename(whdload_slave_path)))
-        startup_sequence_lines.append('  SKIP end')
-        startup_sequence_lines.append('ENDIF')
-
-        option = option + 1
-
-    startup_sequence_lines.append('LAB end')
+# convert whdload lha to image file
+convert_whdload_lha(hst_imager_path, whdload_lha_path, whdload_lha_entries_dict['entries'], image_path,
+                    use_amigaos_31, use_pfs3, downloads, current_path)
 
-# write startup sequence
-startup_sequence_path = os.path.join(script_path, 'Startup-Sequence')
-shared.write_text_lines_for_amiga(startup_sequence_path, startup_sequence_lines)
+# verify extracted whdload lha in image file
+if args.verify:
+    shared.set_trace_step('verify image')
+    report = verify.verify_image(hst_imager_path, get_whdload_image_target_path(image_path),
+                                 [(whdload_lha_path, '', whdload_lha_entries_dict['entries'])], args.verify_sample,
+                                 args.jobs, args.verify_seed, current_path)
+    verify.print_verify_report(report)
+    if args.verify_report:
+        verify.write_verify_reports(args.verify_report, [report])
+    if not verify.is_verify_report_ok(report):
+        print('Error: Image file \'{0}\' doesn\'t match WHDLoad lha file'.format(image_path))
+        exit(1)
 
-# copy startup sequence to image file
-shared.run_command([hst_imager_path, 'fs', 'copy', startup_sequence_path, os.path.join(image_path, 'rdb', 'dh0', 'S'), '--force'])
+# optimize and compress image file
+artifacts.publish_image(hst_imager_path, image_path, args.artifacts_dir, args.compress, args.optimize,
+                        args.compress_jobs)
 
 print('Done')
@@ -0,0 +1,616 @@
+﻿# WHDLoad
+# -------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script with shared functions for WHDLoad example scripts.
+
+"""WHDLoad"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import time
+import concurrent.futures
+import shared
+import timings
+import whdloadindex
+
+# whdload archive extensions
+whdload_archive_extensions = ['.lha', '.lzx', '.zip']
+
+# manifest filename used when stored in image file
+manifest_filename = 'whdloads-manifest.json'
+
+# shard policies, letters shards index dirs into contiguous ranges and size balances size of shards
+whdload_shard_policies = ['letters', 'size']
+
+# archive bytes per second added to watchdog timeout, so large archives get more time to make progress
+watchdog_bytes_per_second = 256 * 1024
+
+# expansion ratio and bytes per file used to estimate uncompressed size and files of archives not indexed
+whdload_expansion_ratio = 3
+whdload_bytes_per_file = 32 * 1024
+
+# get index dir
+def get_index_dir(filename):
+    """Get Index Dir"""
+    index_dir = filename[0].upper()
+    if re.search(r'^[0-9]', index_dir):
+        index_dir = '0'
+    return index_dir
+
+# find whdload archives
+def find_whdload_archives(whdloads_path):
+    """Find WHDLoad Archives"""
+    whdload_archives = []
+    for root, directories, filenames in os.walk(whdloads_path):
+        for filename in filenames:
+            # skip, if filename doesn't end with .lha, .lzx or .zip
+            if not os.path.splitext(filename)[1].lower() in whdload_archive_extensions:
+                continue
+
+            whdload_file = os.path.join(root, filename)
+            whdload_stat = os.stat(whdload_file)
+            whdload_archives.append({
+                'Path': whdload_file,
+                'Filename': filename,
+                'IndexDir': get_index_dir(filename),
+                'Size': whdload_stat.st_size,
+                'Mtime': whdload_stat.st_mtime
+            })
+    return whdload_archives
+
+# whdload chipsets and languages used in whdload archive names, e.g. "Game_v1.3_AGA_De.lha"
+whdload_chipsets = ['OCS', 'ECS', 'AGA', 'CD32', 'CDTV']
+whdload_languages = ['Cz', 'De', 'Dk', 'Es', 'Fi', 'Fr', 'Gr', 'Hu', 'It', 'Nl', 'No', 'Pl', 'Pt', 'Ru', 'Se']
+
+# duplicate policies, all extracts every archive except identical duplicates
+whdload_duplicate_policies = ['all', 'newest', 'per-chipset']
+
+# parse whdload name, title is followed by version, chipset, language and other tags separated by underscore
+def parse_whdload_name(filename):
+    """Parse WHDLoad Name"""
+    parts = os.path.splitext(filename)[0].split('_')
+    whdload_name = {
+        'Title': parts[0].lower(),
+        'Version': (),
+        'Chipset': None,
+        'Language': None,
+        'Tags': []
+    }
+    for part in parts[1:]:
+        version_match = re.search(r'^v(\d+(?:\.\d+)*)', part, re.I)
+        if version_match and not whdload_name['Version']:
+            whdload_name['Version'] = tuple([int(x) for x in version_match.group(1).split('.')])
+        elif part.upper() in whdload_chipsets:
+            whdload_name['Chipset'] = part.upper()
+        elif part.capitalize() in whdload_languages:
+            whdload_name['Language'] = part.capitalize()
+        else:
+            whdload_name['Tags'].append(part.lower())
+    return whdload_name
+
+# find identical whdload archives, only archives with same size are hashed
+def find_identical_whdload_archives(whdload_archives, jobs):
+    """Find Identical WHDLoad Archives"""
+    sizes = {}
+    for whdload_archive in whdload_archives:
+        sizes.setdefault(whdload_archive['Size'], []).append(whdload_archive)
+    same_size_archives = [x for archives in sizes.values() if len(archives) > 1 for x in archives]
+
+    # hash archives with same size in parallel
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        hashes = list(executor.map(lambda x: shared.get_file_hash(x['Path']), same_size_archives))
+
+    # archives identical to a previous archive
+    identical_archives = {}
+    first_archives = {}
+    for whdload_archive, sha256 in zip(same_size_archives, hashes):
+        if sha256 in first_archives:
+            identical_archives[whdload_archive['Path']] = first_archives[sha256]
+        else:
+            first_archives[sha256] = whdload_archive
+    return identical_archives
+
+# select whdload archives using duplicate policy, returns selected archives and skipped archives with reason
+def select_whdload_archives(whdload_archives, policy, jobs):
+    """Select WHDLoad Archives"""
+    skipped_archives = []
+
+    # skip archives identical to another archive
+    identical_archives = find_identical_whdload_archives(whdload_archives, jobs)
+    for whdload_archive in whdload_archives:
+        if whdload_archive['Path'] in identical_archives:
+            skipped_archives.append((whdload_archive, 'identical to \'{0}\''.format(
+                identical_archives[whdload_archive['Path']]['Filename'])))
+    selected_archives = [x for x in whdload_archives if not x['Path'] in identical_archives]
+
+    if policy == 'all':
+        return (selected_archives, skipped_archives)
+
+    # group archives by title and chipset, if per chipset
+    groups = {}
+    for whdload_archive in selected_archives:
+        whdload_name = parse_whdload_name(whdload_archive['Filename'])
+        whdload_archive['WHDLoadName'] = whdload_name
+        key = (whdload_name['Title'], whdload_name['Chipset'] if policy == 'per-chipset' else None)
+        groups.setdefault(key, []).append(whdload_archive)
+
+    # select newest version from each group, plain archives without language and tags are preferred for same version
+    newest_archives = {}
+    for group_archives in groups.values():
+        newest_archive = sorted(group_archives, key=lambda x: (
+            not x['WHDLoadName']['Version'],
+            [-v for v in x['WHDLoadName']['Version']] + [0],
+            x['WHDLoadName']['Language'] is not None,
+            len(x['WHDLoadName']['Tags']),
+            x['Filename'].lower()))[0]
+        newest_archives[newest_archive['Path']] = newest_archive
+        for whdload_archive in group_archives:
+            if whdload_archive is not newest_archive:
+                skipped_archives.append((whdload_archive, 'superseded by \'{0}\''.format(newest_archive['Filename'])))
+
+    return ([x for x in selected_archives if x['Path'] in newest_archives], skipped_archives)
+
+# get entries of whdload archives from whdload index, entry names are prefixed with target dir and index dir
+def get_whdload_archives_entries(hst_imager_path, whdload_archives, target_dir, jobs):
+    """Get WHDLoad Archives Entries"""
+    archives_entries = whdloadindex.get_whdload_archives_entries(hst_imager_path, whdload_archives, jobs)
+    if None in archives_entries.values():
+        exit(1)
+    entries = []
+    for whdload_archive in whdload_archives:
+        for entry in archives_entries[whdload_archive['Path']]:
+            entry['name'] = '{0}/{1}/{2}'.format(target_dir, whdload_archive['IndexDir'], entry['name'])
+            entries.append(entry)
+    return entries
+
+# get sizes of whdload archives by archive path, uncompressed size, files and directories from entries or whdload
+# index. sizes of archives without entries and not indexed are estimated from size of archive
+def get_whdload_archives_sizes(whdload_archives, archives_entries = None):
+    """Get WHDLoad Archives Sizes"""
+    indexed_sizes = whdloadindex.get_indexed_whdload_archives_sizes(whdload_archives) \
+        if archives_entries is None else {}
+    archives_sizes = {}
+    for whdload_archive in whdload_archives:
+        entries = archives_entries.get(whdload_archive['Path']) if archives_entries is not None else None
+        if entries is not None:
+            files = [x for x in entries if x['type'] == 1]
+            archives_sizes[whdload_archive['Path']] = { 'Size': sum([x['size'] for x in files]), 'Files': len(files),
+                                                        'Directories': len(entries) - len(files), 'Estimated': False }
+        elif whdload_archive['Path'] in indexed_sizes:
+            archives_sizes[whdload_archive['Path']] = dict(indexed_sizes[whdload_archive['Path']], Estimated=False)
+        else:
+            size = whdload_archive['Size'] * whdload_expansion_ratio
+            archives_sizes[whdload_archive['Path']] = { 'Size': size, 'Files': max(1, size // whdload_bytes_per_file),
+                                                        'Directories': 0, 'Estimated': True }
+    return archives_sizes
+
+# get whdload extract plan of operations extracting whdload archives to target path in image file. archives are
+# extracted with index dirs created by a batch of commands, isolated with index dirs created by extract or staged
+# to staging path by jobs in parallel and copied to image file per index dir. target path and index dirs in created
+# index dirs are not created again and index dirs created by plan are added to created index dirs
+def get_whdload_extract_plan(hst_imager_path, whdload_archives, archives_sizes, target_path, isolated = False,
+                             staging_path = None, jobs = 1, created_index_dirs = None):
+    """Get WHDLoad Extract Plan"""
+    plan = [timings.plan_operation('mkdir', [hst_imager_path, 'fs', 'mkdir', target_path])] \
+        if created_index_dirs is None else []
+
+    # plan archives decompressed to staging path and copies of each index dir in same order as staged
+    if staging_path is not None:
+        index_dirs = {}
+        for number, whdload_archive in enumerate(
+                sorted(whdload_archives, key=lambda x: (x['IndexDir'], -x['Size'])), start=1):
+            archive_sizes = archives_sizes[whdload_archive['Path']]
+            operation = timings.plan_operation(
+                'stage whdload', [hst_imager_path, 'fs', 'extract', whdload_archive['Path'],
+                                  os.path.join(staging_path, '.work-{0}'.format(number)), '--makedir', '--quiet',
+                                  '--force'], 1, archive_sizes['Size'], archive_sizes['Files'], jobs,
+                archive_sizes['Estimated'])
+            operation['Path'] = whdload_archive['Path']
+            plan.append(operation)
+            index_dir = index_dirs.setdefault(whdload_archive['IndexDir'], { 'Size': 0, 'Files': 0 })
+            index_dir['Size'] = index_dir['Size'] + archive_sizes['Size']
+            index_dir['Files'] = index_dir['Files'] + archive_sizes['Files']
+        for index_dir, index_dir_sizes in index_dirs.items():
+            plan.append(timings.plan_operation(
+                'copy staged', [hst_imager_path, 'fs', 'copy', os.path.join(staging_path, index_dir),
+                                os.path.join(target_path, index_dir), '--recursive', '--makedir', '--quiet', '--force'],
+                1, index_dir_sizes['Size'], index_dir_sizes['Files']))
+        return plan
+
+    # plan index dirs created and archives extracted to image file
+    index_dirs_created = created_index_dirs if created_index_dirs is not None else set()
+    for whdload_archive in whdload_archives:
+        index_dir = whdload_archive['IndexDir']
+        if not isolated and not index_dir in index_dirs_created:
+            operation = timings.plan_operation('mkdir', [hst_imager_path, 'fs', 'mkdir',
+                                                         os.path.join(target_path, index_dir)])
+            operation['IndexDir'] = index_dir
+            plan.append(operation)
+            index_dirs_created.add(index_dir)
+        archive_sizes = archives_sizes[whdload_archive['Path']]
+        operation = timings.plan_operation(
+            'extract whdload', [hst_imager_path, 'fs', 'extract', whdload_archive['Path'],
+                                os.path.join(target_path, index_dir)] +
+            (['--makedir'] if isolated else []) + ['--quiet', '--force'],
+            1, archive_sizes['Size'], archive_sizes['Files'], 1, archive_sizes['Estimated'])
+        operation['Path'] = whdload_archive['Path']
+        plan.append(operation)
+    return plan
+
+# get watchdog timeout for whdload archive, timeout is scaled to size of archive. returns none, if disabled
+def get_watchdog_timeout(whdload_archive, watchdog_timeout):
+    """Get Watchdog Timeout"""
+    if not watchdog_timeout:
+        return None
+    return watchdog_timeout + whdload_archive['Size'] / watchdog_bytes_per_second
+
+# extract whdload archive to local directory or image file. failed extractions are retried with backoff and
+# extraction is killed by watchdog, if it stops making progress. local directory is removed before retrying,
+# files in image file are overwritten. attempts, time of last attempt and if killed by watchdog are set on whdload
+# archive
+def extract_whdload_archive(hst_imager_path, whdload_archive, work_path, watchdog_timeout = None, retries = 0):
+    """Extract WHDLoad Archive"""
+    commands = [hst_imager_path, 'fs', 'extract', whdload_archive['Path'], work_path, '--makedir', '--quiet',
+                '--force']
+    timeout = get_watchdog_timeout(whdload_archive, watchdog_timeout)
+    for attempt in range(1, retries + 2):
+        if attempt > 1:
+            print('Retrying \'{0}\', attempt {1}/{2}'.format(whdload_archive['Filename'], attempt, retries + 1))
+            time.sleep(min(2 ** (attempt - 2), 30))
+            if os.path.isdir(work_path):
+                shutil.rmtree(work_path)
+        start_time = time.monotonic()
+        (returncode, output, killed) = shared.run_process_watchdog(commands, timeout)
+        whdload_archive['Time'] = time.monotonic() - start_time
+        whdload_archive['Attempts'] = attempt
+        whdload_archive['TimedOut'] = killed
+        if killed:
+            output = '{0}Killed by watchdog after no progress for {1:.0f} seconds\n'.format(output, timeout)
+        if not returncode:
+            break
+    return (returncode, output)
+
+# get quarantined whdload archive, archive failed to extract with output of last attempt
+def get_quarantined_whdload_archive(whdload_archive, output):
+    """Get Quarantined WHDLoad Archive"""
+    return {
+        'Filename': whdload_archive['Filename'],
+        'Path': whdload_archive['Path'],
+        'IndexDir': whdload_archive['IndexDir'],
+        'Attempts': whdload_archive.get('Attempts', 1),
+        'TimedOut': whdload_archive.get('TimedOut', False),
+        'Output': output
+    }
+
+# write whdload quarantine, quarantine file is removed, if no archives are quarantined
+def write_whdload_quarantine(quarantine_path, quarantined_archives):
+    """Write WHDLoad Quarantine"""
+    if len(quarantined_archives) == 0:
+        if os.path.isfile(quarantine_path):
+            os.remove(quarantine_path)
+        return
+    with open(quarantine_path, 'w', encoding='utf-8') as file:
+        json.dump({ 'Version': 1, 'Archives': quarantined_archives }, file, indent=2)
+
+# extract whdload archives isolated, each archive is extracted to image file by it's own hst imager process with
+# retries and watchdog. failed archives are quarantined instead of exiting. progress is called with each archive
+# extracted. returns quarantined archives
+def extract_whdload_archives_isolated(hst_imager_path, whdload_archives, target_path, watchdog_timeout, retries,
+                                      progress = None):
+    """Extract WHDLoad Archives Isolated"""
+    quarantined_archives = []
+    for number, whdload_archive in enumerate(whdload_archives, start=1):
+        print('{0}/{1}: {2}'.format(number, len(whdload_archives), whdload_archive['Filename']))
+        (returncode, output) = extract_whdload_archive(
+            hst_imager_path, whdload_archive, os.path.join(target_path, whdload_archive['IndexDir']),
+            watchdog_timeout, retries)
+        if returncode:
+            print('Quarantined \'{0}\' after {1} attempts'.format(whdload_archive['Filename'],
+                                                              whdload_archive['Attempts']))
+            quarantined_archives.append(get_quarantined_whdload_archive(whdload_archive, output))
+        elif progress is not None:
+            progress('extract whdload', whdload_archive)
+    return quarantined_archives
+
+# push staged index directory to image file
+def push_staged_index_dir(hst_imager_path, bucket_path, target_path):
+    """Push Staged Index Dir"""
+    print('Copying staged \'{0}\' to \'{1}\''.format(bucket_path, target_path))
+    (returncode, stdout, stderr) = shared.run_process([hst_imager_path, 'fs', 'copy', bucket_path, target_path,
+                                                       '--recursive', '--makedir', '--quiet', '--force'],
+                                                      subprocess.PIPE, subprocess.STDOUT)
+    shutil.rmtree(bucket_path)
+    return (returncode, stdout)
+
+# extract whdload archives staged, archives are decompressed in parallel to local staging directory
+# and each index directory is copied to image file when all it's archives are decompressed. archives failing
+# to decompress are quarantined, if continue on error. progress is called with each archive decompressed and
+# each index directory copied. returns quarantined archives
+def extract_whdload_archives_staged(hst_imager_path, whdload_archives, target_path, staging_path,
+                                    staging_budget, jobs, expansion_ratio = whdload_expansion_ratio,
+                                    watchdog_timeout = None, retries = 0, continue_on_error = False,
+                                    progress = None):
+    """Extract WHDLoad Archives Staged"""
+
+    # order archives by index dir and largest archives first
+    pending = sorted(whdload_archives, key=lambda x: (x['IndexDir'], -x['Size']))
+    remaining = {}
+    for whdload_archive in pending:
+        remaining[whdload_archive['IndexDir']] = remaining.get(whdload_archive['IndexDir'], 0) + 1
+
+    if os.path.exists(staging_path):
+        shutil.rmtree(staging_path)
+    os.makedirs(staging_path)
+
+    # staged bytes per index dir and index dirs being copied to image file with their bytes and files
+    staged_sizes = {}
+    pushes = {}
+    in_flight = {}
+    push_number = 0
+    work_number = 0
+    failed = None
+    quarantined_archives = []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as extract_executor, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=1) as push_executor:
+
+        # push staged index dir timed, time is set on push
+        def push_timed(bucket_path, index_dir_path, staged_push):
+            start_time = time.monotonic()
+            result = push_staged_index_dir(hst_imager_path, bucket_path, index_dir_path)
+            staged_push['Time'] = time.monotonic() - start_time
+            return result
+
+        # push staged index dir, index dir is renamed so extraction can continue staging to it
+        def push(index_dir):
+            nonlocal push_number
+            if not os.path.isdir(os.path.join(staging_path, index_dir)):
+                staged_sizes.pop(index_dir, None)
+                return
+            push_number += 1
+            bucket_path = os.path.join(staging_path, '.push-{0}-{1}'.format(index_dir, push_number))
+            os.replace(os.path.join(staging_path, index_dir), bucket_path)
+            staged_push = { 'Size': staged_sizes.pop(index_dir),
+                            'Files': sum([len(x[2]) for x in os.walk(bucket_path)]) }
+            future = push_executor.submit(push_timed, bucket_path, os.path.join(target_path, index_dir), staged_push)
+            pushes[future] = staged_push
+
+        # bytes reserved by staged, copying and extracting archives
+        def reserved():
+            return sum(staged_sizes.values()) + sum([x['Size'] for x in pushes.values()]) + \
+                sum([x['Size'] * expansion_ratio for x in in_flight.values()])
+
+        while (pending or in_flight or pushes) and not failed:
+            # submit archives to extract, while budget allows. always allow one, if nothing else is reserved
+            while pending and len(in_flight) < jobs and \
+                    (reserved() + pending[0]['Size'] * expansion_ratio <= staging_budget or reserved() == 0):
+                whdload_archive = pending.pop(0)
+                work_number += 1
+                work_path = os.path.join(staging_path, '.work-{0}'.format(work_number))
+                print(whdload_archive['Filename'])
+                future = extract_executor.submit(extract_whdload_archive, hst_imager_path, whdload_archive, work_path,
+                                                 watchdog_timeout, retries)
+                whdload_archive['WorkPath'] = work_path
+                in_flight[future] = whdload_archive
+
+            # push largest partially staged index dir, if budget is exhausted and nothing else can free space
+            if pending and not in_flight and not pushes and staged_sizes:
+                push(max(staged_sizes, key=staged_sizes.get))
+
+            (done, not_done) = concurrent.futures.wait(list(in_flight) + list(pushes),
+                                                       return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                (returncode, output) = future.result()
+
+                if future in pushes:
+                    staged_push = pushes.pop(future)
+                    if returncode:
+                        failed = output
+                    elif progress is not None:
+                        progress('copy staged', staged_push)
+                    continue
+
+                whdload_archive = in_flight.pop(future)
+                if returncode and not continue_on_error:
+                    failed = output
+                    continue
+
+                # quarantine archive failed to decompress, partially decompressed files are not staged
+                index_dir = whdload_archive['IndexDir']
+                if returncode:
+                    print('Quarantined \'{0}\' after {1} attempts'.format(whdload_archive['Filename'],
+                                                                      whdload_archive['Attempts']))
+                    quarantined_archives.append(get_quarantined_whdload_archive(whdload_archive, output))
+                    shutil.rmtree(whdload_archive['WorkPath'], ignore_errors=True)
+
+                # merge extracted archive into staged index dir
+                elif os.path.isdir(whdload_archive['WorkPath']):
+                    size = shared.get_directory_size(whdload_archive['WorkPath'])
+                    shared.merge_local_directory(whdload_archive['WorkPath'], os.path.join(staging_path, index_dir))
+                    staged_sizes[index_dir] = staged_sizes.get(index_dir, 0) + size
+                    if progress is not None:
+                        progress('stage whdload', whdload_archive)
+
+                # push index dir, if all archives are staged
+                remaining[index_dir] -= 1
+                if remaining[index_dir] == 0:
+                    push(index_dir)
+
+        # cancel pending extractions, if failed
+        if failed:
+            for future in in_flight:
+                future.cancel()
+
+    shutil.rmtree(staging_path, ignore_errors=True)
+
+    # exit, if failed
+    if failed:
+        print(failed)
+        exit(1)
+
+    return quarantined_archives
+
+# get shard path, shard number is added to filename, e.g. whdloads-2.vhd for shard 2 of whdloads.vhd
+def get_shard_path(path, shard):
+    """Get Shard Path"""
+    (root, extension) = os.path.splitext(path)
+    return '{0}-{1}{2}'.format(root, shard, extension)
+
+# get whdload shards, archives are split into shards by uncompressed size of entries or archive size, if entries
+# are not indexed. letters policy splits index dirs in order into contiguous ranges of similar size and size policy
+# adds largest archives first to smallest shard. empty shards are not returned
+def get_whdload_shards(whdload_archives, archives_entries, shards, policy):
+    """Get WHDLoad Shards"""
+    sizes = {}
+    for whdload_archive in whdload_archives:
+        entries = archives_entries.get(whdload_archive['Path'])
+        sizes[whdload_archive['Path']] = whdload_archive['Size'] if entries is None else \
+            sum([x['size'] for x in entries if x['type'] == 1])
+
+    shard_archives = [[] for shard in range(shards)]
+    if policy == 'size':
+        shard_sizes = [0] * shards
+        for whdload_archive in sorted(whdload_archives, key=lambda x: (-sizes[x['Path']], x['Path'])):
+            shard = shard_sizes.index(min(shard_sizes))
+            shard_archives[shard].append(whdload_archive)
+            shard_sizes[shard] += sizes[whdload_archive['Path']]
+    else:
+        index_dirs = {}
+        for whdload_archive in whdload_archives:
+            index_dirs.setdefault(whdload_archive['IndexDir'], []).append(whdload_archive)
+        index_dir_names = sorted(index_dirs, key=lambda x: x.lower())
+        total_size = sum(sizes.values())
+        shard = 0
+        accumulated_size = 0
+        for number, index_dir in enumerate(index_dir_names):
+            size = sum([sizes[x['Path']] for x in index_dirs[index_dir]])
+
+            # next shard, if index dir fits next shard better or remaining index dirs are needed for remaining shards
+            if shard_archives[shard] and shard < shards - 1 and \
+                    (accumulated_size + size / 2 > total_size * (shard + 1) / shards or
+                     len(index_dir_names) - number <= shards - 1 - shard):
+                shard += 1
+            shard_archives[shard].extend(index_dirs[index_dir])
+            accumulated_size += size
+
+    return [{
+        'Shard': number,
+        'First': min([x['IndexDir'] for x in archives], key=lambda x: x.lower()),
+        'Last': max([x['IndexDir'] for x in archives], key=lambda x: x.lower()),
+        'Archives': archives,
+        'Size': sum([sizes[x['Path']] for x in archives])
+    } for number, archives in enumerate([x for x in shard_archives if x], start=1)]
+
+# read whdload shards manifest, exits if not found
+def read_whdload_shards(shards_path):
+    """Read WHDLoad Shards"""
+    if not os.path.isfile(shards_path):
+        print('Error: Shards manifest \'{0}\' not found'.format(shards_path))
+        exit(1)
+    with open(shards_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+# read whdload manifest
+def read_whdload_manifest(manifest_path):
+    """Read WHDLoad Manifest"""
+    if not os.path.isfile(manifest_path):
+        return { 'Version': 1, 'Archives': {} }
+    with open(manifest_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+# write whdload manifest
+def write_whdload_manifest(manifest_path, manifest):
+    """Write WHDLoad Manifest"""
+    temp_manifest_path = '{0}.tmp'.format(manifest_path)
+    with open(temp_manifest_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(temp_manifest_path, manifest_path)
+
+# get whdload archives directories from whdload index, top level directories and files extracted from each archive
+def get_whdload_archives_directories(hst_imager_path, whdload_archives, jobs):
+    """Get WHDLoad Archives Directories"""
+    archives_entries = whdloadindex.get_whdload_archives_entries(hst_imager_path, whdload_archives, jobs)
+    if None in archives_entries.values():
+        exit(1)
+    return dict([(x[0], sorted(set([whdloadindex.get_entry_top(e['name']) for e in x[1]])))
+                 for x in archives_entries.items()])
+
+# get changed whdload archives compared with manifest, whdload archives can be a subset of archives in manifest.
+# returns archives to extract and manifest archives of whdload archives
+def get_changed_whdload_archives(hst_imager_path, whdload_archives, whdloads_path, manifest, jobs):
+    """Get Changed WHDLoad Archives"""
+    manifest_archives = manifest.get('Archives', {})
+    synced_archives = {}
+    changed_archives = []
+
+    # find new and changed archives, archives with same size and modified time are unchanged
+    for whdload_archive in whdload_archives:
+        relative_path = os.path.relpath(whdload_archive['Path'], whdloads_path).replace('\\', '/')
+        whdload_archive['RelativePath'] = relative_path
+        whdload_archive['Mtime'] = os.path.getmtime(whdload_archive['Path'])
+        manifest_archive = manifest_archives.get(relative_path)
+        if manifest_archive and manifest_archive['Size'] == whdload_archive['Size'] and \
+                manifest_archive['Mtime'] == whdload_archive['Mtime'] and \
+                manifest_archive['IndexDir'] == whdload_archive['IndexDir']:
+            synced_archives[relative_path] = manifest_archive
+            continue
+        changed_archives.append(whdload_archive)
+
+    # hash changed archives, archives with same hash as in manifest are unchanged
+    def inspect(whdload_archive):
+        whdload_archive['Sha256'] = shared.get_file_hash(whdload_archive['Path'])
+        manifest_archive = manifest_archives.get(whdload_archive['RelativePath'])
+        whdload_archive['Unchanged'] = manifest_archive is not None and \
+            manifest_archive['Sha256'] == whdload_archive['Sha256'] and \
+            manifest_archive['IndexDir'] == whdload_archive['IndexDir']
+        if whdload_archive['Unchanged']:
+            whdload_archive['Directories'] = manifest_archive['Directories']
+        return whdload_archive
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        changed_archives = list(executor.map(inspect, changed_archives))
+
+    # get directories extracted from new and changed archives
+    archives_directories = get_whdload_archives_directories(
+        hst_imager_path, [x for x in changed_archives if not x['Unchanged']], jobs)
+
+    archives_to_extract = []
+    for whdload_archive in changed_archives:
+        if not whdload_archive['Unchanged']:
+            whdload_archive['Directories'] = archives_directories[whdload_archive['Path']]
+        synced_archives[whdload_archive['RelativePath']] = {
+            'Size': whdload_archive['Size'],
+            'Mtime': whdload_archive['Mtime'],
+            'Sha256': whdload_archive['Sha256'],
+            'IndexDir': whdload_archive['IndexDir'],
+            'Directories': whdload_archive['Directories']
+        }
+        if not whdload_archive['Unchanged']:
+            archives_to_extract.append(whdload_archive)
+
+    return (archives_to_extract, synced_archives)
+
+# sync whdload archives with manifest, whdload archives must be all archives in whdloads path.
+# returns archives to extract and directories no longer extracted from any archive
+def sync_whdload_archives(hst_imager_path, whdload_archives, whdloads_path, manifest, jobs):
+    """Sync WHDLoad Archives"""
+    (archives_to_extract, synced_archives) = get_changed_whdload_archives(
+        hst_imager_path, whdload_archives, whdloads_path, manifest, jobs)
+    manifest_archives = manifest.get('Archives', {})
+
+    # directories from removed or replaced archives, which are not extracted from any current archive.
+    # stale directories from previous syncs are kept, as hst imager can't delete them from image file
+    current_directories = set(['{0}/{1}'.format(x['IndexDir'], d).lower()
+                               for x in synced_archives.values() for d in x['Directories']])
+    previous_directories = manifest.get('StaleDirectories', []) + \
+        ['{0}/{1}'.format(x['IndexDir'], d) for x in manifest_archives.values() for d in x['Directories']]
+    stale_directories = sorted(set([x for x in previous_directories if not x.lower() in current_directories]))
+
+    return (archives_to_extract, stale_directories,
+            { 'Version': 1, 'Archives': synced_archives, 'StaleDirectories': stale_directories })
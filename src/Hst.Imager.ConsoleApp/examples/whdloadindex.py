@@ -0,0 +1,253 @@
+﻿# WHDLoad Index
+# -------------
+#
+# Author: Henrik Nørfjand Stengaard
+# Date:   2026-10-17
+#
+# A python script with shared functions to index contents of WHDLoad collections in a SQLite
+# database. Entries, hash and slaves of each WHDLoad archive are stored once and only new and
+# changed WHDLoad archives are listed with Hst Imager, when collection is indexed again.
+
+"""WHDLoad Index"""
+
+import os
+import re
+import sqlite3
+import time
+import concurrent.futures
+import shared
+
+# whdload index version, index is recreated, if created by other version
+whdload_index_version = 1
+
+# get whdload index path, shared by all example scripts on host
+def get_whdload_index_path():
+    """Get WHDLoad Index Path"""
+    if os.environ.get('HST_IMAGER_WHDLOAD_INDEX'):
+        return os.environ['HST_IMAGER_WHDLOAD_INDEX']
+    return os.path.join(os.path.dirname(shared.get_download_cache_path()), 'whdload-index.sqlite')
+
+# is whdload index enabled, index is disabled, if whdload index is set to off
+def is_whdload_index_enabled():
+    """Is WHDLoad Index Enabled"""
+    return os.environ.get('HST_IMAGER_WHDLOAD_INDEX', '').lower() != 'off'
+
+# open whdload index, tables are created, if index doesn't exist or is created by other version
+def open_whdload_index(index_path):
+    """Open WHDLoad Index"""
+    if os.path.dirname(index_path):
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    connection = sqlite3.connect(index_path, timeout=60)
+    if connection.execute('PRAGMA user_version').fetchone()[0] != whdload_index_version:
+        with connection:
+            for table in ['archives', 'entries', 'slaves']:
+                connection.execute('DROP TABLE IF EXISTS {0}'.format(table))
+            connection.execute('CREATE TABLE archives (path TEXT PRIMARY KEY, filename TEXT, index_dir TEXT, '
+                               'size INTEGER, mtime REAL, sha256 TEXT, files INTEGER, directories INTEGER, '
+                               'uncompressed_size INTEGER, indexed_at REAL)')
+            connection.execute('CREATE TABLE entries (archive_path TEXT, name TEXT, size INTEGER, type INTEGER, '
+                               'top TEXT)')
+            connection.execute('CREATE TABLE slaves (archive_path TEXT, name TEXT)')
+            connection.execute('CREATE INDEX archives_sha256 ON archives (sha256)')
+            connection.execute('CREATE INDEX entries_archive_path ON entries (archive_path)')
+            connection.execute('CREATE INDEX entries_top ON entries (top)')
+            connection.execute('CREATE INDEX slaves_archive_path ON slaves (archive_path)')
+            connection.execute('PRAGMA user_version = {0}'.format(whdload_index_version))
+    return connection
+
+# get top level name of entry, directory or file extracted to index dir
+def get_entry_top(name):
+    """Get Entry Top"""
+    return re.split(r'[\\/]', name)[0]
+
+# is whdload slave, entry is a file ending with .slave
+def is_whdload_slave(entry):
+    """Is WHDLoad Slave"""
+    return re.search(r'\.slave$', entry['name'], re.I) is not None
+
+# get indexed entries of whdload archive
+def get_indexed_entries(connection, archive_path):
+    """Get Indexed Entries"""
+    return [{ 'name': x[0], 'size': x[1], 'type': x[2] } for x in connection.execute(
+        'SELECT name, size, type FROM entries WHERE archive_path = ? ORDER BY rowid', (archive_path,))]
+
+# write indexed whdload archive, previous entries and slaves of archive are replaced
+def write_indexed_archive(connection, whdload_archive, entries):
+    """Write Indexed Archive"""
+    archive_path = os.path.abspath(whdload_archive['Path'])
+    files = [x for x in entries if x['type'] == 1]
+    with connection:
+        connection.execute('DELETE FROM entries WHERE archive_path = ?', (archive_path,))
+        connection.execute('DELETE FROM slaves WHERE archive_path = ?', (archive_path,))
+        connection.execute('INSERT OR REPLACE INTO archives VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+            archive_path, whdload_archive['Filename'], whdload_archive['IndexDir'], whdload_archive['Size'],
+            whdload_archive['Mtime'], whdload_archive['Sha256'], len(files), len(entries) - len(files),
+            sum([x['size'] for x in files]), time.time()))
+        connection.executemany('INSERT INTO entries VALUES (?, ?, ?, ?, ?)', [
+            (archive_path, x['name'], x['size'], x['type'], get_entry_top(x['name'])) for x in entries])
+        connection.executemany('INSERT INTO slaves VALUES (?, ?)', [
+            (archive_path, x['name']) for x in files if is_whdload_slave(x)])
+
+# remove indexed archives with their entries and slaves
+def remove_indexed_archives(connection, archive_paths):
+    """Remove Indexed Archives"""
+    with connection:
+        for table, column in [('archives', 'path'), ('entries', 'archive_path'), ('slaves', 'archive_path')]:
+            connection.executemany('DELETE FROM {0} WHERE {1} = ?'.format(table, column),
+                                   [(x,) for x in archive_paths])
+
+# list whdload archive entries with hst imager, returns none, if archive can't be listed
+def list_whdload_archive(hst_imager_path, whdload_archive):
+    """List WHDLoad Archive"""
+    try:
+        return shared.get_entries(hst_imager_path, whdload_archive['Path'])
+    except SystemExit:
+        return None
+
+# update whdload index, archives with same size and modified time as indexed are unchanged.
+# changed archives are hashed and only listed with hst imager, if no archive with same hash is indexed.
+# archives, which can't be listed, are removed from index. returns number of indexed archives
+def update_whdload_index(hst_imager_path, connection, whdload_archives, jobs):
+    """Update WHDLoad Index"""
+    indexed_archives = dict([(x[0], x[1:]) for x in connection.execute(
+        'SELECT path, size, mtime, sha256 FROM archives')])
+
+    # find new and changed archives
+    changed_archives = []
+    for whdload_archive in whdload_archives:
+        whdload_archive['Mtime'] = os.path.getmtime(whdload_archive['Path'])
+        indexed_archive = indexed_archives.get(os.path.abspath(whdload_archive['Path']))
+        if indexed_archive and indexed_archive[0] == whdload_archive['Size'] and \
+                indexed_archive[1] == whdload_archive['Mtime']:
+            continue
+        changed_archives.append(whdload_archive)
+    if len(changed_archives) == 0:
+        return 0
+
+    print('Indexing {0} new or changed WHDLoads'.format(len(changed_archives)))
+
+    # hash changed archives in parallel, hash is reused if already computed by caller
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        for whdload_archive, sha256 in zip(changed_archives, executor.map(
+                lambda x: x.get('Sha256') or shared.get_file_hash(x['Path']), changed_archives)):
+            whdload_archive['Sha256'] = sha256
+
+    # get entries of archives with same hash as indexed archives from index
+    sha256_paths = dict([(x[1][2], x[0]) for x in indexed_archives.items()])
+    sha256_entries = {}
+    for whdload_archive in changed_archives:
+        sha256 = whdload_archive['Sha256']
+        if sha256 in sha256_paths and not sha256 in sha256_entries:
+            sha256_entries[sha256] = get_indexed_entries(connection, sha256_paths[sha256])
+
+    # list archives not indexed in parallel, identical archives are listed once
+    unlisted_archives = dict([(x['Sha256'], x) for x in changed_archives if not x['Sha256'] in sha256_entries])
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        for sha256, entries in zip(unlisted_archives, executor.map(
+                lambda x: list_whdload_archive(hst_imager_path, x), unlisted_archives.values())):
+            sha256_entries[sha256] = entries
+
+    indexed = 0
+    for whdload_archive in changed_archives:
+        entries = sha256_entries[whdload_archive['Sha256']]
+        if entries is None:
+            remove_indexed_archives(connection, [os.path.abspath(whdload_archive['Path'])])
+            continue
+        write_indexed_archive(connection, whdload_archive, entries)
+        indexed = indexed + 1
+    return indexed
+
+# remove indexed archives in whdloads path, which are not in whdload archives. returns number of removed archives
+def remove_missing_whdload_archives(connection, whdloads_path, whdload_archives):
+    """Remove Missing WHDLoad Archives"""
+    prefix = os.path.join(os.path.abspath(whdloads_path), '')
+    archive_paths = set([os.path.abspath(x['Path']) for x in whdload_archives])
+    missing_paths = [x[0] for x in connection.execute(
+        'SELECT path FROM archives WHERE substr(path, 1, ?) = ?', (len(prefix), prefix)) if not x[0] in archive_paths]
+    remove_indexed_archives(connection, missing_paths)
+    return len(missing_paths)
+
+# get entries of whdload archives indexed by archive path. index is updated with new and changed archives first.
+# archives are listed with hst imager in parallel, if whdload index is disabled. entries are none for archives,
+# which can't be listed
+def get_whdload_archives_entries(hst_imager_path, whdload_archives, jobs):
+    """Get WHDLoad Archives Entries"""
+    if not is_whdload_index_enabled():
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            return dict(zip([x['Path'] for x in whdload_archives], executor.map(
+                lambda x: list_whdload_archive(hst_imager_path, x), whdload_archives)))
+
+    connection = open_whdload_index(get_whdload_index_path())
+    try:
+        update_whdload_index(hst_imager_path, connection, whdload_archives, jobs)
+        indexed_paths = set([x[0] for x in connection.execute('SELECT path FROM archives')])
+        return dict([(x['Path'], get_indexed_entries(connection, os.path.abspath(x['Path']))
+                      if os.path.abspath(x['Path']) in indexed_paths else None) for x in whdload_archives])
+    finally:
+        connection.close()
+
+# get indexed sizes of whdload archives by archive path without listing archives. archives not indexed or changed
+# since indexed are not included
+def get_indexed_whdload_archives_sizes(whdload_archives):
+    """Get Indexed WHDLoad Archives Sizes"""
+    index_path = get_whdload_index_path()
+    if not is_whdload_index_enabled() or not os.path.isfile(index_path):
+        return {}
+    connection = open_whdload_index(index_path)
+    try:
+        indexed_archives = dict([(x[0], x[1:]) for x in connection.execute(
+            'SELECT path, size, mtime, files, directories, uncompressed_size FROM archives')])
+    finally:
+        connection.close()
+    archives_sizes = {}
+    for whdload_archive in whdload_archives:
+        indexed_archive = indexed_archives.get(os.path.abspath(whdload_archive['Path']))
+        if indexed_archive and indexed_archive[0] == whdload_archive['Size'] and \
+                indexed_archive[1] == os.path.getmtime(whdload_archive['Path']):
+            archives_sizes[whdload_archive['Path']] = { 'Size': indexed_archive[4], 'Files': indexed_archive[2],
+                                                        'Directories': indexed_archive[3] }
+    return archives_sizes
+
+# query indexed archives in whdloads path
+def query_whdload_archives(connection, whdloads_path):
+    """Query WHDLoad Archives"""
+    prefix = os.path.join(os.path.abspath(whdloads_path), '')
+    return [{
+        'Path': x[0],
+        'Filename': x[1],
+        'IndexDir': x[2],
+        'Size': x[3],
+        'Sha256': x[4],
+        'Files': x[5],
+        'Directories': x[6],
+        'UncompressedSize': x[7],
+        'Slaves': x[8]
+    } for x in connection.execute(
+        'SELECT path, filename, index_dir, size, sha256, files, directories, uncompressed_size, '
+        '(SELECT COUNT(*) FROM slaves WHERE archive_path = path) FROM archives WHERE substr(path, 1, ?) = ? '
+        'ORDER BY index_dir, filename', (len(prefix), prefix))]
+
+# query indexed slaves in whdloads path
+def query_whdload_slaves(connection, whdloads_path):
+    """Query WHDLoad Slaves"""
+    prefix = os.path.join(os.path.abspath(whdloads_path), '')
+    return [{ 'Path': x[0], 'Filename': x[1], 'Slave': x[2] } for x in connection.execute(
+        'SELECT archives.path, archives.filename, slaves.name FROM slaves '
+        'JOIN archives ON archives.path = slaves.archive_path WHERE substr(archives.path, 1, ?) = ? '
+        'ORDER BY archives.index_dir, archives.filename, slaves.name', (len(prefix), prefix))]
+
+# query clashes in whdloads path, top level directories and files extracted to same index dir by more
+# than one archive. top level names are compared ignoring case like amiga file systems
+def query_whdload_clashes(connection, whdloads_path):
+    """Query WHDLoad Clashes"""
+    prefix = os.path.join(os.path.abspath(whdloads_path), '')
+    clashes = {}
+    for (index_dir, top, filename) in connection.execute(
+            'SELECT DISTINCT archives.index_dir, entries.top, archives.filename FROM entries '
+            'JOIN archives ON archives.path = entries.archive_path WHERE substr(archives.path, 1, ?) = ? '
+            'ORDER BY archives.index_dir, entries.top, archives.filename', (len(prefix), prefix)):
+        name = '{0}/{1}'.format(index_dir, top)
+        clash = clashes.setdefault(name.lower(), { 'Name': name, 'Filenames': [] })
+        if not filename in clash['Filenames']:
+            clash['Filenames'].append(filename)
+    return [x for x in clashes.values() if len(x['Filenames']) > 1]